@@ -0,0 +1,362 @@
+# -------------------------------------------------------------------------
+# admission.py - Token Metering and Admission Control
+# -------------------------------------------------------------------------
+# Every prompt sent upstream and every completion that comes back is
+# measured locally with history_manager.estimate_tokens(), and running
+# totals are kept per session and per endpoint.
+#
+# Before an upstream call is made, its cost (prompt tokens plus the
+# completion expected for the endpoint) has to fit into two token buckets:
+# one for the requesting session and one global budget shared by all
+# sessions. A request that does not fit waits in line for up to
+# ADMISSION_MAX_WAIT seconds while the buckets refill, and is then rejected
+# with AdmissionRejected, which the apps turn into a 429 response. A single
+# prompt above MAX_REQUEST_TOKENS (say, a pasted novel) is rejected at once
+# with a 413. Once the completion is in, the reservation is settled with
+# the actual completion size.
+#
+# The requesting session is taken from a context variable set by the apps
+# for each request; background work (pre-translation, welcome pool, rolling
+# summaries) only draws from the global budget. Requests without a session
+# cookie (e.g. a script posting straight to /api/analyze) are charged to
+# their client address instead, so they cannot bypass the session budget.
+#
+# Configuration (environment variables):
+# - ADMISSION: "0"/"false" to disable admission control (metering stays on)
+# - SESSION_TOKENS_PER_MINUTE: refill rate of each session's bucket (default 20000)
+# - SESSION_TOKEN_BURST: capacity of each session's bucket (default 20000)
+# - GLOBAL_TOKENS_PER_MINUTE: refill rate of the global bucket (default 1000000)
+# - GLOBAL_TOKEN_BURST: capacity of the global bucket (default 200000)
+# - MAX_REQUEST_TOKENS: largest prompt admitted (default 8000)
+# - ADMISSION_MAX_WAIT: seconds a request may wait for tokens (default 3)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Application-specific imports
+from history_manager import estimate_tokens
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION", "1").lower() in ("1", "true", "yes")
+SESSION_TOKENS_PER_MINUTE = float(os.environ.get("SESSION_TOKENS_PER_MINUTE", "20000"))
+SESSION_TOKEN_BURST = float(os.environ.get("SESSION_TOKEN_BURST", "20000"))
+GLOBAL_TOKENS_PER_MINUTE = float(os.environ.get("GLOBAL_TOKENS_PER_MINUTE", "1000000"))
+GLOBAL_TOKEN_BURST = float(os.environ.get("GLOBAL_TOKEN_BURST", "200000"))
+MAX_REQUEST_TOKENS = int(os.environ.get("MAX_REQUEST_TOKENS", "8000"))
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", "3"))
+
+# Completion tokens reserved per endpoint until the actual size is known
+EXPECTED_COMPLETION_TOKENS = {
+    'welcome': 40,
+    'correction': 128,
+    'conversation': 512,
+    'translation': 64,
+    'analysis': 1024,
+    'summary': 160,
+    'combined': 640,
+}
+
+# Sessions (buckets and counters) kept in memory, least recently used evicted
+MAX_TRACKED_SESSIONS = 10000
+
+
+class AdmissionRejected(Exception):
+    """
+    A request was refused before any upstream call was made.
+
+    Attributes:
+        status (int): HTTP status for the response (429 or 413)
+        retry_after (float): Seconds after which a retry may succeed, or None
+    """
+
+    def __init__(self, message, status=429, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+# The session of the current request (None for background work)
+_current_session = contextvars.ContextVar('admission_session', default=None)
+
+
+def set_session(session_id):
+    """Set the session that upstream calls in the current context are charged to."""
+    _current_session.set(session_id)
+
+
+def current_session():
+    return _current_session.get()
+
+
+def admission_key(session_id, client_address):
+    """
+    The key a request's upstream calls are charged to
+
+    Args:
+        session_id (str): The Flask session's ID, or None without a session cookie
+        client_address (str): The client's IP address, or None if unknown
+
+    Returns:
+        str: The session ID, else a key for the client address (None if neither is known)
+    """
+    if session_id:
+        return session_id
+    return f"client:{client_address}" if client_address else None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously up to its capacity.
+
+    The level may go negative when a completion turns out larger than
+    reserved; the debt is repaid by the refill.
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (float): Maximum number of tokens
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount tokens are available (0 if they are now)."""
+        self._refill(now)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate > 0 else float('inf')
+
+    def take(self, amount):
+        self.level -= amount
+
+
+class Reservation:
+    """Tokens reserved for one upstream call, settled when it completes."""
+
+    def __init__(self, endpoint, session_id, prompt_tokens, expected_completion):
+        self.endpoint = endpoint
+        self.session_id = session_id
+        self.prompt_tokens = prompt_tokens
+        self.expected_completion = expected_completion
+
+
+class AdmissionController:
+    """
+    Per-session and global token buckets with running token counters.
+
+    Args:
+        enabled (bool): Whether requests may be delayed or rejected
+        session_rate (float): Session bucket refill in tokens per minute
+        session_burst (float): Session bucket capacity
+        global_rate (float): Global bucket refill in tokens per minute
+        global_burst (float): Global bucket capacity
+        max_request_tokens (int): Largest prompt admitted
+        max_wait (float): Seconds a request may wait for tokens
+    """
+
+    def __init__(self, enabled=ADMISSION_ENABLED, session_rate=SESSION_TOKENS_PER_MINUTE,
+                 session_burst=SESSION_TOKEN_BURST, global_rate=GLOBAL_TOKENS_PER_MINUTE,
+                 global_burst=GLOBAL_TOKEN_BURST, max_request_tokens=MAX_REQUEST_TOKENS,
+                 max_wait=ADMISSION_MAX_WAIT):
+        self.enabled = enabled
+        self.session_rate = session_rate / 60.0
+        self.session_burst = session_burst
+        self.max_request_tokens = max_request_tokens
+        self.max_wait = max_wait
+        self._global = TokenBucket(global_rate / 60.0, global_burst)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        # Running totals: key -> [requests, prompt tokens, completion tokens]
+        self._by_endpoint = {}
+        self._by_session = OrderedDict()
+        self.counts = {'admitted': 0, 'queued': 0, 'rejected': 0, 'tooLarge': 0}
+
+    # Admission
+
+    def _session_bucket(self, session_id):
+        """Caller holds _lock."""
+        bucket = self._sessions.get(session_id)
+        if bucket is None:
+            bucket = self._sessions[session_id] = TokenBucket(self.session_rate, self.session_burst)
+            while len(self._sessions) > MAX_TRACKED_SESSIONS:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return bucket
+
+    def _try_reserve(self, session_id, cost):
+        """Take cost from the buckets if possible; otherwise return the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._global]
+            if session_id is not None:
+                buckets.append(self._session_bucket(session_id))
+            # A cost above a bucket's capacity only needs a full bucket
+            wait = max(bucket.wait_time(min(cost, bucket.capacity), now) for bucket in buckets)
+            if wait == 0.0:
+                for bucket in buckets:
+                    bucket.take(cost)
+            return wait
+
+    def _prepare(self, endpoint, prompt, expected_completion):
+        prompt_tokens = estimate_tokens(prompt)
+        if expected_completion is None:
+            expected_completion = EXPECTED_COMPLETION_TOKENS.get(endpoint, 256)
+        reservation = Reservation(endpoint, current_session(), prompt_tokens, expected_completion)
+        if self.enabled and prompt_tokens > self.max_request_tokens:
+            self._count('tooLarge')
+            raise AdmissionRejected(
+                f"This request is too long ({prompt_tokens} tokens, the limit is "
+                f"{self.max_request_tokens}). Please send a shorter text.", status=413
+            )
+        return reservation, prompt_tokens + expected_completion
+
+    def _reject(self, wait):
+        self._count('rejected')
+        if wait == float('inf'):
+            # A bucket that never refills (a rate of 0)
+            return AdmissionRejected("Too many requests right now. Please try again later.")
+        return AdmissionRejected(
+            f"Too many requests right now. Please try again in {max(1, round(wait))} seconds.",
+            retry_after=max(1, round(wait))
+        )
+
+    def admit(self, endpoint, prompt, expected_completion=None):
+        """
+        Reserve tokens for an upstream call, waiting for them if necessary
+
+        Args:
+            endpoint (str): Upstream endpoint name (e.g. "analysis")
+            prompt (str): The full prompt text
+            expected_completion (int, optional): Completion tokens to reserve
+                                                 (default: per-endpoint estimate)
+
+        Returns:
+            Reservation: To be passed to settle() once the completion is in
+
+        Raises:
+            AdmissionRejected: If the prompt is too large or no tokens became
+                               available within the maximum wait
+        """
+        reservation, cost = self._prepare(endpoint, prompt, expected_completion)
+        if not self.enabled:
+            return reservation
+        deadline = time.monotonic() + self.max_wait
+        queued = False
+        while True:
+            wait = self._try_reserve(reservation.session_id, cost)
+            if wait == 0.0:
+                self._count('admitted')
+                return reservation
+            if time.monotonic() + wait > deadline:
+                raise self._reject(wait)
+            if not queued:
+                queued = True
+                self._count('queued')
+            time.sleep(min(wait, 0.25))
+
+    async def admit_async(self, endpoint, prompt, expected_completion=None):
+        """Async variant of admit() that waits without blocking the event loop."""
+        reservation, cost = self._prepare(endpoint, prompt, expected_completion)
+        if not self.enabled:
+            return reservation
+        deadline = time.monotonic() + self.max_wait
+        queued = False
+        while True:
+            wait = self._try_reserve(reservation.session_id, cost)
+            if wait == 0.0:
+                self._count('admitted')
+                return reservation
+            if time.monotonic() + wait > deadline:
+                raise self._reject(wait)
+            if not queued:
+                queued = True
+                self._count('queued')
+            await asyncio.sleep(min(wait, 0.25))
+
+    def settle(self, reservation, completion):
+        """
+        Record the token usage of a completed upstream call
+
+        The difference between the reserved and the actual completion size
+        is charged to (or refunded from) the buckets.
+
+        Args:
+            reservation (Reservation): The reservation returned by admit()
+            completion (str): The completion text ("" if the call failed)
+        """
+        completion_tokens = estimate_tokens(completion)
+        with self._lock:
+            if self.enabled:
+                difference = completion_tokens - reservation.expected_completion
+                self._global.take(difference)
+                bucket = self._sessions.get(reservation.session_id)
+                if bucket is not None:
+                    bucket.take(difference)
+            totals = [self._by_endpoint.setdefault(reservation.endpoint, [0, 0, 0])]
+            if reservation.session_id is not None:
+                session_totals = self._by_session.get(reservation.session_id)
+                if session_totals is None:
+                    session_totals = self._by_session[reservation.session_id] = [0, 0, 0]
+                    while len(self._by_session) > MAX_TRACKED_SESSIONS:
+                        self._by_session.popitem(last=False)
+                else:
+                    self._by_session.move_to_end(reservation.session_id)
+                totals.append(session_totals)
+            for counters in totals:
+                counters[0] += 1
+                counters[1] += reservation.prompt_tokens
+                counters[2] += completion_tokens
+
+    # Reporting
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def session_usage(self, session_id):
+        """Running token totals of one session."""
+        with self._lock:
+            requests, prompt, completion = self._by_session.get(session_id, (0, 0, 0))
+        return {'requests': requests, 'promptTokens': prompt, 'completionTokens': completion}
+
+    def stats(self, top_sessions=10):
+        with self._lock:
+            now = time.monotonic()
+            self._global._refill(now)
+            by_endpoint = {
+                endpoint: {'requests': r, 'promptTokens': p, 'completionTokens': c}
+                for endpoint, (r, p, c) in self._by_endpoint.items()
+            }
+            heaviest = sorted(self._by_session.items(), key=lambda item: item[1][1] + item[1][2],
+                              reverse=True)[:top_sessions]
+            return dict(
+                self.counts,
+                enabled=self.enabled,
+                globalTokensAvailable=round(self._global.level),
+                trackedSessions=len(self._by_session),
+                byEndpoint=by_endpoint,
+                # Session IDs are shortened; they are bearer identifiers
+                topSessions=[{'session': session_id[:8], 'promptTokens': p, 'completionTokens': c}
+                             for session_id, (_, p, c) in heaviest]
+            )
+
+
+# Shared by the WSGI and ASGI apps
+admission = AdmissionController()
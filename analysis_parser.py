@@ -0,0 +1,191 @@
+# -------------------------------------------------------------------------
+# analysis_parser.py - Linguistic Analysis Parsing Utilities
+# -------------------------------------------------------------------------
+# The "Analyze" feature returns markdown with a fixed structure: an overall
+# "Translation:" line followed by one "## sentence" section per sentence,
+# each with its own translation and word bullets. This module splits
+# messages into sentences and splits analyses into per-sentence sections
+# so they can be cached and reassembled independently. Analyses that are
+# streamed from the model are split on the fly by AnalysisStreamParser.
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import hashlib
+import re
+import unicodedata
+
+# A sentence runs up to (and includes) its terminal punctuation; line
+# breaks also end a sentence. Inverted marks (¿ ¡) stay with their sentence.
+_SENTENCE_RE = re.compile(r'[^.!?。！？\n]+[.!?。！？…]*[»"\'”’)]*')
+
+TRANSLATION_PREFIX = 'Translation:'
+HEADING_PREFIX = '## '
+
+
+def split_sentences(text):
+    """
+    Split a message into sentences.
+
+    Args:
+        text (str): The message to split
+
+    Returns:
+        list: The sentences, stripped, in order (fragments with no letters are dropped)
+    """
+    sentences = []
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = match.group().strip()
+        if any(ch.isalnum() for ch in sentence):
+            sentences.append(sentence)
+    return sentences
+
+
+def _comparable(text):
+    """Reduce a sentence to its letters and digits for fuzzy matching."""
+    text = unicodedata.normalize('NFC', text).casefold()
+    return ''.join(ch for ch in text if ch.isalnum())
+
+
+def sentence_hash(sentence):
+    """Content hash of a sentence, insensitive to surrounding whitespace."""
+    normalized = ' '.join(unicodedata.normalize('NFC', sentence).split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class AnalysisStreamParser:
+    """
+    Incremental parse_analysis() for an analysis that arrives in chunks.
+
+    Complete lines are parsed as they arrive: the overall translation is
+    reported as soon as its line is complete, and each section once the
+    next "## " heading begins (the last one when the stream is closed).
+    """
+
+    def __init__(self):
+        self._pending = ''
+        self._current = None
+        self._translation_seen = False
+
+    def feed(self, text):
+        """
+        Parse the next chunk of the analysis.
+
+        Args:
+            text (str): The chunk, split anywhere (even inside a line)
+
+        Returns:
+            list: ("translation", text) and ("section", markdown) events
+                  completed by this chunk, in order
+        """
+        lines = (self._pending + text).splitlines(keepends=True)
+        # A trailing line without its line break may still grow (and a "\r"
+        # may be the first half of a "\r\n")
+        if lines and (lines[-1].splitlines() == [lines[-1]] or lines[-1].endswith('\r')):
+            self._pending = lines.pop()
+        else:
+            self._pending = ''
+        events = []
+        for line in lines:
+            self._parse_line(line, events)
+        return events
+
+    def close(self):
+        """Parse the rest of the analysis once the stream has ended; returns the final events."""
+        events = []
+        if self._pending:
+            self._parse_line(self._pending, events)
+            self._pending = ''
+        if self._current is not None:
+            events.append(('section', '\n'.join(self._current).strip()))
+            self._current = None
+        return events
+
+    def _parse_line(self, line, events):
+        stripped = line.strip()
+        if stripped.startswith(HEADING_PREFIX):
+            if self._current is not None:
+                events.append(('section', '\n'.join(self._current).strip()))
+            self._current = [stripped]
+        elif self._current is not None:
+            self._current.append(line.rstrip())
+        elif not self._translation_seen and stripped.startswith(TRANSLATION_PREFIX):
+            self._translation_seen = True
+            events.append(('translation', stripped[len(TRANSLATION_PREFIX):].strip()))
+
+
+def parse_analysis(analysis):
+    """
+    Split an analysis into its overall translation and sentence sections.
+
+    Args:
+        analysis (str): Markdown analysis as produced by the model
+
+    Returns:
+        tuple: (overall translation or None, list of section markdown strings,
+                each starting with its "## " heading)
+    """
+    parser = AnalysisStreamParser()
+    translation = None
+    sections = []
+    for event, value in parser.feed(analysis) + parser.close():
+        if event == 'translation':
+            translation = value
+        else:
+            sections.append(value)
+    return translation, sections
+
+
+def section_heading(section):
+    """Return the sentence used as a section's heading."""
+    return section.splitlines()[0][len(HEADING_PREFIX):].strip()
+
+
+def section_translation(section):
+    """Return the English translation line of a section, or None."""
+    for line in section.splitlines()[1:]:
+        stripped = line.strip()
+        if stripped.startswith(TRANSLATION_PREFIX):
+            return stripped[len(TRANSLATION_PREFIX):].strip()
+    return None
+
+
+def match_sections(sentences, sections):
+    """
+    Map analysis sections back to the sentences they describe.
+
+    Sections are matched by heading text; if the model split or merged
+    sentences differently but produced the same number of sections they
+    are matched by position.
+
+    Args:
+        sentences (list): The sentences that were analyzed
+        sections (list): Section markdown strings from parse_analysis()
+
+    Returns:
+        list: One section per sentence (None where no section matched)
+    """
+    by_heading = {}
+    for section in sections:
+        by_heading.setdefault(_comparable(section_heading(section)), section)
+    matched = [by_heading.get(_comparable(sentence)) for sentence in sentences]
+    if None in matched and len(sections) == len(sentences):
+        return list(sections)
+    return matched
+
+
+def assemble_analysis(sections, translation=None):
+    """
+    Stitch per-sentence sections back into a full analysis.
+
+    Args:
+        sections (list): Section markdown strings in message order
+        translation (str, optional): Overall translation; composed from the
+                                     section translations when omitted
+
+    Returns:
+        str: The full analysis markdown
+    """
+    if translation is None:
+        parts = [section_translation(section) for section in sections]
+        translation = ' '.join(part for part in parts if part)
+    return f"{TRANSLATION_PREFIX} {translation}\n\n" + '\n\n'.join(sections)
@@ -16,6 +16,7 @@
 
 # Standard library imports
 import os
+import json
 import logging
 import time
 import uuid
@@ -23,27 +24,52 @@ import uuid
 # Flask and related imports
 from flask import (
     Flask, 
+    Response, 
     flash, 
+    g, 
     jsonify, 
     redirect, 
     render_template, 
     request, 
     send_from_directory, 
     session, 
+    stream_with_context, 
     url_for
 )
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Application-specific imports
+from chat_pipeline import combined_stats, run_chat_turn, speculation_stats
 from gemini_service import (
     clear_conversation_memory,  # Reset conversation history
+    conversation_memories,      # Bounded store of conversation histories
+    correction_filter,          # Local fast path for messages needing no correction
     correct_user_message,       # Correct grammar and word choice
     generate_analysis,          # Create linguistic analysis of messages
-    generate_response,          # Generate AI conversation responses
+    stream_analysis,            # Stream linguistic analysis section by section
     get_welcome_message,        # Get initial greeting in target language
-    translate_single_word       # Translate individual words
+    is_translation_error,       # Whether a translation result is an error message
+    lexicon,                    # Local lexicon harvested from model output
+    pretranslator,              # Background translation of tutor replies
+    prewarm_translations,       # Fill the translation cache in the background
+    start_welcome_pool,         # Pre-generate greetings for new chats
+    stream_response,            # Stream AI conversation responses
+    translate_single_word,      # Translate individual words
+    translate_words,            # Translate several words in one request
+    translation_cache,          # Cache of word translations
+    vocabulary_selector,        # Per-turn subsets of large vocabulary lists
+    welcome_pool                # Pre-generated greetings per language
 )
-from vocabulary_service import parse_vocabulary_text
+from admission import AdmissionRejected, admission, admission_key, set_session
+from cache_service import DEFAULT_DB_PATH, LRUCache
+from pretranslation import foreground_load
+import lazy_imports
+from llm_backends import backend as llm_backend
+import metrics
+import resilience
+from scheduler import scheduler
+import singleflight
+from vocabulary_service import VocabularyStore, get_example_vocabulary, parse_vocabulary_text
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -53,7 +79,48 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
 # ProxyFix middleware enables proper URL generation with https when behind a proxy
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# (and gives admission control the client's address rather than the proxy's)
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
+
+# Available languages for practice and vocabulary lists
+LANGUAGES = ["Spanish", "French", "German", "Italian", "Portuguese", 
+             "Russian", "Japanese", "Chinese", "Korean"]
+
+# Server-side vocabulary list storage; the session only carries an owner key
+vocabulary_store = VocabularyStore(os.environ.get("VOCABULARY_DB_PATH", DEFAULT_DB_PATH))
+
+# Pre-warm the translation cache with the example vocabulary so the most
+# common words are answered from cache (disk hits after the first run).
+# The users' own lists are warmed when they are saved or first loaded.
+if os.environ.get("TRANSLATION_CACHE_PREWARM", "1").lower() in ("1", "true", "yes"):
+    for _language in LANGUAGES:
+        prewarm_translations(get_example_vocabulary(_language), _language)
+
+# Stored vocabulary lists this worker has already warmed, keyed by (owner, list ID)
+_warmed_lists = LRUCache(max_entries=10000)
+
+# Generate greetings ahead of time so new chats start instantly
+start_welcome_pool(LANGUAGES)
+
+def get_vocabulary_owner():
+    """
+    Get the key that owns this user's vocabulary lists in the server-side store
+    
+    Lists created before vocabulary moved out of the cookie session are
+    migrated into the store the first time they are seen.
+    """
+    if 'vocabulary_owner' not in session:
+        session['vocabulary_owner'] = str(uuid.uuid4())
+    owner = session['vocabulary_owner']
+    
+    if 'vocabulary_lists' in session:
+        for vocab in session.pop('vocabulary_lists'):
+            words = vocab['words']
+            if isinstance(words, str):
+                words = words.split(', ')
+            vocabulary_store.create(owner, vocab['name'], vocab['language'], words, list_id=vocab['id'])
+        logger.debug(f"Migrated session vocabulary lists for owner {owner}")
+    return owner
 
 # Cache-busting mechanism: add timestamp to all templates 
 # This ensures that browser always loads the latest CSS/JS when changes are made
@@ -62,6 +129,49 @@ def inject_now():
     """Add current timestamp to all templates for cache busting"""
     return {'now': int(time.time())}
 
+# Count in-flight API requests so background work can back off under load
+@app.before_request
+def track_foreground_start():
+    if request.path.startswith('/api/'):
+        foreground_load.enter()
+        g.foreground_tracked = True
+
+@app.teardown_request
+def track_foreground_end(exc=None):
+    if g.pop('foreground_tracked', False):
+        foreground_load.exit()
+
+# Per-request latency metrics (exposed at /metrics) and Server-Timing headers
+@app.before_request
+def start_request_metrics():
+    metrics.start_request(request.url_rule.rule if request.url_rule else 'unmatched')
+
+@app.after_request
+def add_server_timing(response):
+    # Streamed responses only include the stages finished before the first byte
+    timing = metrics.server_timing()
+    if timing:
+        response.headers['Server-Timing'] = timing
+    # Closing happens after a streamed body is sent, unlike request teardown
+    status = response.status_code
+    response.call_on_close(lambda: metrics.finish_request(status))
+    return response
+
+# Upstream token usage is charged to the learner's session, or to the client
+# address for requests without a session cookie (see admission.py)
+@app.before_request
+def set_admission_session():
+    set_session(admission_key(session.get('session_id'), request.remote_addr))
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    """Turn a request refused by admission control into a JSON error"""
+    response = jsonify({'error': str(error), 'retryAfter': error.retry_after})
+    response.status_code = error.status
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 # -------------------------------------------------------------------------
 # Web Page Routes
 # -------------------------------------------------------------------------
@@ -86,12 +196,12 @@ def chat():
     if 'session_id' not in session:
         session['session_id'] = str(uuid.uuid4())
     
-    # Get vocabulary lists from the session for the dropdown menu
-    vocabulary_lists = session.get('vocabulary_lists', [])
+    # Get vocabulary list names from the store for the dropdown menu
+    vocabulary_lists, _ = vocabulary_store.list_page(get_vocabulary_owner(), limit=1000,
+                                                     include_words=False)
     
     # Available languages for practice
-    languages = ["Spanish", "French", "German", "Italian", "Portuguese", 
-                 "Russian", "Japanese", "Chinese", "Korean"]
+    languages = LANGUAGES
     
     # Add timestamp for cache busting to ensure latest JS/CSS loads
     timestamp = int(time.time())
@@ -114,12 +224,12 @@ def vocabulary():
     3. Practice with specific vocabulary lists
     4. Edit or delete existing lists
     
-    The vocabulary lists are stored in the session and can be used
-    to restrict the AI responses to only use those words.
+    The vocabulary lists are stored server-side (keyed by an owner ID in
+    the session) and can be used to restrict the AI responses to only use
+    those words.
     """
     # Available languages for vocabulary lists
-    languages = ["Spanish", "French", "German", "Italian", "Portuguese", 
-                "Russian", "Japanese", "Chinese", "Korean"]
+    languages = LANGUAGES
     
     # Handle form submission for creating a new vocabulary list
     if request.method == 'POST':
@@ -137,22 +247,13 @@ def vocabulary():
             flash('Please provide valid vocabulary data')
             return redirect(url_for('vocabulary'))
         
-        # Initialize vocabulary lists in session if not present
-        if 'vocabulary_lists' not in session:
-            session['vocabulary_lists'] = []
-        
         # Create and store the new vocabulary list
-        session['vocabulary_lists'].append({
-            'id': int(time.time()),  # Use timestamp as unique ID
-            'name': name,
-            'language': language,
-            'words': words
-        })
-        
-        # Mark session as modified to ensure it's saved
-        session.modified = True
+        vocabulary_store.create(get_vocabulary_owner(), name, language, words)
         flash('Vocabulary list saved successfully!')
         
+        # Translate the new words in the background before they are clicked
+        warm_vocabulary(words, language)
+        
         # Redirect to chat page to practice with the new vocabulary
         timestamp = int(time.time())
         return redirect(url_for('chat', _t=timestamp))
@@ -169,19 +270,14 @@ def edit_vocabulary(id):
     1. Displaying the edit form (GET request)
     2. Processing the form submission (POST request)
     
-    The vocabulary list is updated in the session storage.
+    The vocabulary list is updated in the server-side store.
     """
     # Available languages for vocabulary lists
-    languages = ["Spanish", "French", "German", "Italian", "Portuguese", 
-                "Russian", "Japanese", "Chinese", "Korean"]
+    languages = LANGUAGES
     
     # Find the requested vocabulary list by ID
-    vocabulary = None
-    if 'vocabulary_lists' in session:
-        for vocab in session['vocabulary_lists']:
-            if vocab['id'] == id:
-                vocabulary = vocab
-                break
+    owner = get_vocabulary_owner()
+    vocabulary = vocabulary_store.get(owner, id)
     
     # Handle case where vocabulary list is not found
     if not vocabulary:
@@ -203,17 +299,12 @@ def edit_vocabulary(id):
             flash('Please provide valid vocabulary data', 'danger')
             return render_template('edit_vocabulary.html', vocabulary=vocabulary, languages=languages)
         
-        # Update the vocabulary list in session
-        for vocab in session['vocabulary_lists']:
-            if vocab['id'] == id:
-                vocab['name'] = name
-                vocab['language'] = language
-                vocab['words'] = words
-                break
-        
-        # Mark session as modified to ensure changes are saved
-        session.modified = True
+        # Update the vocabulary list in the store
+        vocabulary_store.update(owner, id, name, language, words)
         flash('Vocabulary list updated successfully!', 'success')
+        
+        # Translate any new words in the background before they are clicked
+        warm_vocabulary(words, language)
         return redirect(url_for('vocabulary'))
     
     # Prepare vocabulary words for display in text area (GET request)
@@ -230,6 +321,50 @@ def edit_vocabulary(id):
                           words_text=words_text, 
                           languages=languages)
 
+# -------------------------------------------------------------------------
+# API Helpers
+# -------------------------------------------------------------------------
+
+def warm_vocabulary(words, language):
+    """
+    Translate a vocabulary list's words in the background and let the
+    correction fast path count them as known words
+    """
+    prewarm_translations(words, language)
+    correction_filter.add_words(words, language)
+
+def warm_loaded_vocabulary(owner, vocab):
+    """warm_vocabulary() for a stored list the first time this worker loads it."""
+    key = (owner, vocab['id'])
+    if _warmed_lists.get(key) is None:
+        _warmed_lists.set(key, True)
+        warm_vocabulary(vocab['words'], vocab['language'])
+
+def get_vocabulary_words(vocabulary_id):
+    """
+    Get the words of the selected vocabulary list from the store
+    
+    Returns an empty list if no list is selected or it cannot be found.
+    """
+    if vocabulary_id:
+        owner = get_vocabulary_owner()
+        vocab = vocabulary_store.get(owner, int(vocabulary_id))
+        if vocab:
+            warm_loaded_vocabulary(owner, vocab)
+            return vocab['words']
+    return []
+
+def sse_event(event, data):
+    """Format a single Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Payload key of each event of gemini_service.stream_analysis()
+ANALYSIS_EVENT_KEYS = {'translation': 'translation', 'section': 'section', 'done': 'analysis', 'error': 'error'}
+
+def analysis_sse_event(event, value):
+    """Format an event of stream_analysis() as a Server-Sent Event"""
+    return sse_event(event, {ANALYSIS_EVENT_KEYS[event]: value})
+
 # -------------------------------------------------------------------------
 # API Routes
 # -------------------------------------------------------------------------
@@ -239,18 +374,12 @@ def delete_vocabulary(id):
     """
     Delete a vocabulary list by ID
     
-    This endpoint removes a vocabulary list from the session storage.
+    This endpoint removes a vocabulary list from the server-side store.
     It's called via AJAX from the vocabulary management page.
     """
-    # Find and remove vocabulary list from session
-    if 'vocabulary_lists' in session:
-        for i, vocab in enumerate(session['vocabulary_lists']):
-            if vocab['id'] == id:
-                # Remove the item at the found index
-                session['vocabulary_lists'].pop(i)
-                # Mark session as modified to ensure changes are saved
-                session.modified = True
-                return jsonify({'success': True})
+    # Remove the vocabulary list from the store
+    if vocabulary_store.delete(get_vocabulary_owner(), id):
+        return jsonify({'success': True})
     
     # Return 404 if list not found
     return jsonify({'success': False, 'error': 'Vocabulary list not found'}), 404
@@ -299,21 +428,14 @@ def api_chat():
         return jsonify({'error': 'Missing required parameters'}), 400
     
     # Get vocabulary words if a vocabulary list was selected
-    vocabulary = []
-    if vocabulary_id:
-        if 'vocabulary_lists' in session:
-            for vocab in session['vocabulary_lists']:
-                if vocab['id'] == int(vocabulary_id):
-                    vocabulary = vocab['words']
-                    break
+    vocabulary = get_vocabulary_words(vocabulary_id)
     
-    # Correct grammar and word choice in user's message
+    # Correct grammar and word choice in user's message, then generate the
+    # AI response with optional vocabulary restrictions. In speculative mode
+    # the two run in parallel (see chat_pipeline.py)
     original_message = message
-    corrected_message = correct_user_message(message, language)
-    
-    # Generate AI response with optional vocabulary restrictions
-    # Note: We use the corrected message for generation to ensure proper context
-    response = generate_response(corrected_message, language, vocabulary)
+    conversation_id = session.get('session_id', 'guest')
+    corrected_message, response = run_chat_turn(message, language, vocabulary, conversation_id)
     
     # Return all components for the frontend to display
     return jsonify({
@@ -322,6 +444,62 @@ def api_chat():
         'correctedMessage': corrected_message
     })
 
+@app.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    """
+    Streaming chat API endpoint (Server-Sent Events)
+    
+    Accepts the same request body as /api/chat (without isInitial) but
+    streams the reply as it is generated, so the first words reach the
+    learner long before the full completion is done.
+    
+    Events:
+        correction: {"originalMessage": ..., "correctedMessage": ...}
+        chunk:      {"text": "next piece of the reply"}
+        done:       {"response": "full reply text"}
+        error:      {"error": ..., "retryAfter": ...} if admission control
+                    refused the request
+    """
+    # Extract data from request
+    data = request.json or {}
+    message = data.get('message')
+    language = data.get('language')
+    vocabulary_id = data.get('vocabularyId')
+    
+    # Validate required parameters
+    if not message or not language:
+        return jsonify({'error': 'Missing required parameters'}), 400
+    
+    vocabulary = get_vocabulary_words(vocabulary_id)
+    conversation_id = session.get('session_id', 'guest')
+    
+    def generate():
+        try:
+            # Send the correction as its own early event
+            with metrics.stage('correction'):
+                corrected_message = correct_user_message(message, language)
+            yield sse_event('correction', {
+                'originalMessage': message,
+                'correctedMessage': corrected_message
+            })
+            
+            # Stream the reply; memory is committed once the reply is complete
+            parts = []
+            for chunk in stream_response(corrected_message, language, vocabulary,
+                                         conversation_id=conversation_id):
+                parts.append(chunk)
+                yield sse_event('chunk', {'text': chunk})
+        except AdmissionRejected as e:
+            # The response has already started, so the refusal is sent as an event
+            yield sse_event('error', {'error': str(e), 'retryAfter': e.retry_after})
+            return
+        
+        yield sse_event('done', {'response': ''.join(parts).strip()})
+    
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/chat/reset', methods=['POST'])
 def api_chat_reset():
     """
@@ -364,6 +542,42 @@ def api_analyze():
     analysis = generate_analysis(message, language)
     
     return jsonify({'analysis': analysis})
+
+@app.route('/api/analyze/stream', methods=['POST'])
+def api_analyze_stream():
+    """
+    Streaming analysis endpoint (Server-Sent Events)
+    
+    Accepts the same request body as /api/analyze but sends the analysis
+    in pieces as the model writes it, so the first sentence can be read
+    while the rest is still being generated.
+    
+    Events:
+        translation: {"translation": "overall English translation"}
+        section:     {"section": "## sentence ..."}, one per sentence in order
+        done:        {"analysis": "complete analysis markdown"}
+        error:       {"error": ..., "retryAfter": ...} if the analysis failed
+                     or admission control refused the request
+    """
+    # Extract data from request
+    data = request.json or {}
+    message = data.get('message')
+    language = data.get('language')
+    
+    # Validate required parameters
+    if not message or not language:
+        return jsonify({'error': 'Missing required parameters'}), 400
+    
+    def generate():
+        try:
+            for event, value in stream_analysis(message, language):
+                yield analysis_sse_event(event, value)
+        except AdmissionRejected as e:
+            yield sse_event('error', {'error': str(e), 'retryAfter': e.retry_after})
+    
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
     
 @app.route('/api/translate-word', methods=['POST'])
 def translate_word():
@@ -394,35 +608,148 @@ def translate_word():
         'language': language
     })
 
+# Maximum number of words accepted by /api/translate-words
+MAX_TRANSLATE_WORDS = 200
+
+def parse_translate_words_request(data):
+    """
+    Validate a /api/translate-words request body
+    
+    Returns:
+        tuple: (words, language, error message or None)
+    """
+    words = data.get('words')
+    language = data.get('language')
+    if not isinstance(words, list) or not words or not language:
+        return None, None, 'Missing required parameters'
+    words = [word.strip() for word in words if isinstance(word, str) and word.strip()]
+    if not words:
+        return None, None, 'Missing required parameters'
+    if len(words) > MAX_TRANSLATE_WORDS:
+        return None, None, f'At most {MAX_TRANSLATE_WORDS} words can be translated at once'
+    return words, language, None
+
+def translate_words_response(translations, language):
+    """
+    Build the /api/translate-words response body
+    
+    Words whose translation failed are listed under "failed", so the client
+    shows the error message but asks again on the next click.
+    """
+    return {
+        'translations': translations,
+        'failed': [word for word, translation in translations.items() if is_translation_error(translation)],
+        'language': language
+    }
+
+@app.route('/api/translate-words', methods=['POST'])
+def translate_words_endpoint():
+    """
+    API endpoint to translate several words in one round trip
+    
+    Lets the client translate all words of a message at once. Cached words
+    are answered immediately and the rest are translated with one
+    structured model call.
+    
+    Request format:
+    {
+        "words": ["word", "another", ...],
+        "language": "Spanish"
+    }
+    
+    Response format:
+    {
+        "translations": {"word": "Translation: ... - ...", ...},
+        "failed": ["word whose translation is an error message", ...],
+        "language": "Spanish"
+    }
+    """
+    words, language, error = parse_translate_words_request(request.json or {})
+    if error:
+        return jsonify({'error': error}), 400
+    
+    return jsonify(translate_words_response(translate_words(words, language), language))
+
 @app.route('/api/vocabulary', methods=['GET'])
 def api_vocabulary():
     """
-    API endpoint to retrieve all vocabulary lists
+    API endpoint to page through the user's vocabulary lists
     
-    This endpoint returns all vocabulary lists stored in the session.
-    It's used by the frontend to populate the vocabulary selection dropdown
-    and display the lists in the vocabulary management page.
+    Lists are sorted by name. It's used by the frontend to populate the
+    vocabulary selection dropdown and display the lists in the vocabulary
+    management page.
+    
+    Query parameters:
+        page: 1-based page number (default 1)
+        per_page: Lists per page (default 20, at most 100)
+        include_words: "0" to return only id, name and language
+    
+    Response format:
+    {
+        "lists": [{"id": ..., "name": ..., "language": ..., "words": [...]}],
+        "page": 1,
+        "perPage": 20,
+        "total": 42,
+        "hasMore": true
+    }
     """
-    # Return vocabulary lists from session
-    if 'vocabulary_lists' in session:
-        result = []
-        for vocab in session['vocabulary_lists']:
-            # Ensure words is an array (compatibility with older entries)
-            words = vocab['words']
-            if isinstance(words, str):
-                words = words.split(', ')
-            
-            # Create a standardized response for each vocabulary list
-            result.append({
-                'id': vocab['id'],
-                'name': vocab['name'],
-                'language': vocab['language'],
-                'words': words
-            })
-        return jsonify(result)
-    else:
-        # Return empty array if no vocabulary lists exist
-        return jsonify([])
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    include_words = request.args.get('include_words', '1') != '0'
+    
+    lists, total = vocabulary_store.list_page(get_vocabulary_owner(),
+                                              offset=(page - 1) * per_page,
+                                              limit=per_page,
+                                              include_words=include_words)
+    return jsonify({
+        'lists': lists,
+        'page': page,
+        'perPage': per_page,
+        'total': total,
+        'hasMore': page * per_page < total
+    })
+
+@app.route('/api/stats', methods=['GET'])
+def api_stats():
+    """
+    API endpoint exposing performance counters
+    
+    Returns runtime statistics such as the speculative chat hit rate,
+    the latency it saved, translation cache hits/misses, the size
+    of the conversation store, how many upstream calls were collapsed and
+    the state of the upstream circuit breakers and LLM backend, the
+    token usage per endpoint and heaviest sessions with admission counters,
+    the upstream scheduler's queues, the correction fast path, the
+    combined chat mode and which deferred imports have been loaded.
+    """
+    return jsonify({
+        'speculation': speculation_stats.snapshot(),
+        'translationCache': translation_cache.stats(),
+        'conversations': conversation_memories.stats(),
+        'vocabularySelector': vocabulary_selector.stats(),
+        'singleFlight': singleflight.stats(),
+        'pretranslation': pretranslator.stats(),
+        'lexicon': lexicon.stats(),
+        'welcomePool': welcome_pool.stats(),
+        'resilience': resilience.stats(),
+        'llmBackend': llm_backend.stats(),
+        'admission': admission.stats(),
+        'scheduler': scheduler.stats(),
+        'correctionFastPath': correction_filter.stats(),
+        'combinedChat': combined_stats.snapshot(),
+        'lazyImports': lazy_imports.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Prometheus scrape endpoint
+    
+    Exposes request and stage latency histograms, upstream attempts and
+    the path that served each upstream request, and prompt/response sizes
+    in the Prometheus text format.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 # -------------------------------------------------------------------------
 # Progressive Web App (PWA) Support Routes
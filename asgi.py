@@ -0,0 +1,350 @@
+# -------------------------------------------------------------------------
+# asgi.py - Async (ASGI) Serving Mode
+# -------------------------------------------------------------------------
+# Under WSGI every /api request holds a worker thread for the whole model
+# round trip (seconds), so concurrency is bounded by the number of workers.
+# This module serves the model-bound endpoints natively on an event loop,
+# using the async twins in gemini_service, so one process can hold hundreds
+# of in-flight tutor turns. Every other route (pages, vocabulary
+# management, PWA files, ...) is handed to the unchanged Flask app through
+# asgiref's WSGI adapter.
+#
+# Run with an ASGI server (asgiref and uvicorn are in the requirements):
+#     uvicorn asgi:application --host 0.0.0.0 --port 5000
+#
+# On lifespan startup the deferred SDK imports are warmed up in the
+# background (see lazy_imports.py).
+#
+# The native endpoints only read the Flask session cookie; the session is
+# always created by the Flask pages (e.g. /chat) before they are called.
+# Requests without one are charged to the client address (see admission.py);
+# behind a proxy, run uvicorn with --proxy-headers so that is the client's.
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import asyncio
+import json
+import logging
+
+# Third-party imports
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import parse_cookie
+
+# Application-specific imports
+from admission import AdmissionRejected, admission_key, set_session
+from app import (
+    analysis_sse_event,
+    app,
+    parse_translate_words_request,
+    sse_event,
+    translate_words_response,
+    vocabulary_store,
+    warm_loaded_vocabulary
+)
+from chat_pipeline import run_chat_turn_async
+from pretranslation import foreground_load
+from lazy_imports import IMPORT_WARMUP, warm_up
+import metrics
+from gemini_service import (
+    correct_user_message_async,
+    generate_analysis_async,
+    get_welcome_message_async,
+    stream_analysis_async,
+    stream_response_async,
+    translate_single_word_async,
+    translate_words_async
+)
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+# Everything that is not served natively goes through Flask
+flask_application = WsgiToAsgi(app)
+
+
+# -------------------------------------------------------------------------
+# Request / Response Helpers
+# -------------------------------------------------------------------------
+
+class Request:
+    """The parts of an ASGI HTTP request the native endpoints need."""
+
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+
+    def json(self):
+        """Parse the body as JSON, returning an empty dict if it is not valid JSON."""
+        try:
+            data = json.loads(self.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def session(self):
+        """
+        Decode the Flask session cookie (read-only)
+
+        Returns:
+            dict: The session contents, empty if missing, tampered with or expired
+        """
+        cookies = parse_cookie(self.headers.get('cookie', ''))
+        value = cookies.get(app.config['SESSION_COOKIE_NAME'])
+        serializer = app.session_interface.get_signing_serializer(app)
+        if not value or serializer is None:
+            return {}
+        try:
+            max_age = int(app.permanent_session_lifetime.total_seconds())
+            return serializer.loads(value, max_age=max_age)
+        except Exception:
+            return {}
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            break
+    return body
+
+
+async def send_json(send, payload, status=200, headers=()):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode('latin-1'))] + list(headers)
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def get_vocabulary_words(session, vocabulary_id):
+    """
+    Get the words of the selected vocabulary list from the store
+
+    Same as app.get_vocabulary_words(), but with an explicitly passed,
+    read-only session; the store is read in a worker thread.
+    """
+    owner = session.get('vocabulary_owner')
+    if vocabulary_id and owner:
+        vocab = await asyncio.to_thread(vocabulary_store.get, owner, int(vocabulary_id))
+        if vocab:
+            warm_loaded_vocabulary(owner, vocab)
+            return vocab['words']
+    return []
+
+
+# -------------------------------------------------------------------------
+# Native Async Endpoints
+# -------------------------------------------------------------------------
+
+async def api_chat(request, send):
+    """Async version of POST /api/chat (same request and response format)."""
+    data = request.json()
+    message = data.get('message')
+    language = data.get('language')
+
+    if data.get('isInitial', False):
+        await send_json(send, {'response': await get_welcome_message_async(language)})
+        return
+
+    if not message or not language:
+        await send_json(send, {'error': 'Missing required parameters'}, 400)
+        return
+
+    session = request.session()
+    vocabulary = await get_vocabulary_words(session, data.get('vocabularyId'))
+    conversation_id = session.get('session_id', 'guest')
+    corrected_message, response = await run_chat_turn_async(message, language, vocabulary,
+                                                            conversation_id)
+    await send_json(send, {
+        'response': response,
+        'originalMessage': message,
+        'correctedMessage': corrected_message
+    })
+
+
+async def api_chat_stream(request, send):
+    """Async version of POST /api/chat/stream (Server-Sent Events)."""
+    data = request.json()
+    message = data.get('message')
+    language = data.get('language')
+
+    if not message or not language:
+        await send_json(send, {'error': 'Missing required parameters'}, 400)
+        return
+
+    session = request.session()
+    vocabulary = await get_vocabulary_words(session, data.get('vocabularyId'))
+    conversation_id = session.get('session_id', 'guest')
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no')]
+    })
+
+    async def emit(event, payload):
+        await send({'type': 'http.response.body',
+                    'body': sse_event(event, payload).encode('utf-8'),
+                    'more_body': True})
+
+    try:
+        with metrics.stage('correction'):
+            corrected_message = await correct_user_message_async(message, language)
+        await emit('correction', {'originalMessage': message, 'correctedMessage': corrected_message})
+
+        parts = []
+        async for chunk in stream_response_async(corrected_message, language, vocabulary,
+                                                 conversation_id=conversation_id):
+            parts.append(chunk)
+            await emit('chunk', {'text': chunk})
+    except AdmissionRejected as e:
+        await emit('error', {'error': str(e), 'retryAfter': e.retry_after})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    await emit('done', {'response': ''.join(parts).strip()})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def api_analyze(request, send):
+    """Async version of POST /api/analyze."""
+    data = request.json()
+    message = data.get('message')
+    language = data.get('language')
+
+    if not message or not language:
+        await send_json(send, {'error': 'Missing required parameters'}, 400)
+        return
+
+    await send_json(send, {'analysis': await generate_analysis_async(message, language)})
+
+
+async def api_analyze_stream(request, send):
+    """Async version of POST /api/analyze/stream (Server-Sent Events)."""
+    data = request.json()
+    message = data.get('message')
+    language = data.get('language')
+
+    if not message or not language:
+        await send_json(send, {'error': 'Missing required parameters'}, 400)
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no')]
+    })
+
+    async def emit(body):
+        await send({'type': 'http.response.body', 'body': body.encode('utf-8'), 'more_body': True})
+
+    try:
+        async for event, value in stream_analysis_async(message, language):
+            await emit(analysis_sse_event(event, value))
+    except AdmissionRejected as e:
+        await emit(sse_event('error', {'error': str(e), 'retryAfter': e.retry_after}))
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def api_translate_word(request, send):
+    """Async version of POST /api/translate-word."""
+    data = request.json()
+    word = data.get('word')
+    language = data.get('language')
+
+    if not word or not language:
+        await send_json(send, {'error': 'Missing required parameters'}, 400)
+        return
+
+    translation = await translate_single_word_async(word, language)
+    await send_json(send, {'word': word, 'translation': translation, 'language': language})
+
+
+async def api_translate_words(request, send):
+    """Async version of POST /api/translate-words."""
+    words, language, error = parse_translate_words_request(request.json())
+    if error:
+        await send_json(send, {'error': error}, 400)
+        return
+
+    translations = await translate_words_async(words, language)
+    await send_json(send, translate_words_response(translations, language))
+
+
+# (method, path) -> native handler
+ROUTES = {
+    ('POST', '/api/chat'): api_chat,
+    ('POST', '/api/chat/stream'): api_chat_stream,
+    ('POST', '/api/analyze'): api_analyze,
+    ('POST', '/api/analyze/stream'): api_analyze_stream,
+    ('POST', '/api/translate-word'): api_translate_word,
+    ('POST', '/api/translate-words'): api_translate_words,
+}
+
+
+async def application(scope, receive, send):
+    """ASGI entry point: native async endpoints, everything else via Flask."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Each server worker imports the deferred SDKs in the background
+                if IMPORT_WARMUP:
+                    warm_up()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    handler = ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if handler is None:
+        await flask_application(scope, receive, send)
+        return
+
+    request = Request(scope, await read_body(receive))
+    metrics.start_request(scope['path'])
+    client = scope.get('client')
+    set_session(admission_key(request.session().get('session_id'), client[0] if client else None))
+    status = 500
+
+    async def send_with_timing(message):
+        # Record the status and add the Server-Timing header to the response start
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            timing = metrics.server_timing()
+            if timing:
+                message = dict(message, headers=list(message.get('headers', [])) +
+                               [(b'server-timing', timing.encode('latin-1'))])
+        await send(message)
+
+    foreground_load.enter()
+    try:
+        await handler(request, send_with_timing)
+    except AdmissionRejected as e:
+        headers = [(b'retry-after', str(e.retry_after).encode('latin-1'))] if e.retry_after else []
+        await send_json(send_with_timing, {'error': str(e), 'retryAfter': e.retry_after},
+                        e.status, headers)
+    except Exception as e:
+        logger.error(f"Error in async endpoint {scope['path']}: {str(e)}")
+        try:
+            await send_json(send_with_timing, {'error': str(e)}, 500)
+        except Exception:
+            # The response had already started; the client sees a truncated stream
+            pass
+    finally:
+        foreground_load.exit()
+        metrics.finish_request(status)
@@ -0,0 +1,66 @@
+# -------------------------------------------------------------------------
+# bench_client_pool.py - Gemini Client Construction Micro-benchmark
+# -------------------------------------------------------------------------
+# Compares the per-call overhead of the old pattern (genai.configure plus a
+# fresh GenerativeModel / ChatGoogleGenerativeAI on every request) with
+# borrowing from the shared registry in gemini_clients.py. No network calls
+# are made; only client setup is timed.
+#
+# Usage:
+#   python benchmarks/bench_client_pool.py [iterations]
+# -------------------------------------------------------------------------
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import google.generativeai as genai  # noqa: E402
+from langchain_google_genai import ChatGoogleGenerativeAI  # noqa: E402
+
+from gemini_clients import DEFAULT_MODEL, get_chat_model, get_generative_model  # noqa: E402
+
+API_KEY = os.environ.get("GEMINI_API_KEY") or "benchmark-dummy-key"
+
+
+def per_call_direct():
+    genai.configure(api_key=API_KEY)
+    return genai.GenerativeModel(DEFAULT_MODEL)
+
+
+def per_call_langchain():
+    return ChatGoogleGenerativeAI(model=DEFAULT_MODEL, api_key=API_KEY, temperature=0.1)
+
+
+def pooled_direct():
+    return get_generative_model(API_KEY)
+
+
+def pooled_langchain():
+    return get_chat_model(API_KEY, purpose="benchmark", temperature=0.1)
+
+
+def time_per_call(fn, iterations):
+    fn()  # Warm up imports and lazy SDK state
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rows = [
+        ("direct: configure + GenerativeModel", per_call_direct, pooled_direct),
+        ("langchain: ChatGoogleGenerativeAI", per_call_langchain, pooled_langchain),
+    ]
+    print(f"{'path':40} {'per-call (us)':>15} {'pooled (us)':>15} {'speedup':>10}")
+    for name, before, after in rows:
+        before_us = time_per_call(before, iterations)
+        after_us = time_per_call(after, iterations)
+        print(f"{name:40} {before_us:15.1f} {after_us:15.1f} {before_us / after_us:9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# -------------------------------------------------------------------------
+# bench_resilience.py - Upstream Brownout Simulation
+# -------------------------------------------------------------------------
+# Runs the direct -> LangChain fallback chain against a local fake backend
+# during a simulated brownout, in which the direct path fails after a slow
+# timeout, and compares sequential fallback with the resilience policy
+# (circuit breaker, optionally hedging). No network calls are made.
+#
+# Usage:
+#   python benchmarks/bench_resilience.py [requests]
+# -------------------------------------------------------------------------
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import resilience  # noqa: E402
+from resilience import UpstreamPolicy  # noqa: E402
+
+HEALTHY_LATENCY = 0.02
+FAILURE_LATENCY = 0.2
+
+
+def browned_out_direct():
+    time.sleep(FAILURE_LATENCY)
+    raise RuntimeError("503 Service Unavailable")
+
+
+def langchain():
+    time.sleep(HEALTHY_LATENCY * random.uniform(0.8, 1.5))
+    return "ok"
+
+
+def sequential_fallback():
+    # The pattern the service functions used before resilience.py
+    try:
+        return browned_out_direct()
+    except Exception:
+        return langchain()
+
+
+def measure(fn, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.mean(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    policy = UpstreamPolicy("bench", deadline=5.0)
+    rows = [
+        ("sequential fallback", sequential_fallback),
+        ("policy (circuit breaker)",
+         lambda: policy.call([('bench-direct', browned_out_direct), ('bench-langchain', langchain)])),
+    ]
+    print(f"{'strategy':30} {'mean (ms)':>10} {'p95 (ms)':>10}")
+    for name, fn in rows:
+        mean, p95 = measure(fn, requests)
+        print(f"{name:30} {mean:>10.1f} {p95:>10.1f}")
+    print(resilience.stats()['breakers']['bench/bench-direct'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+# -------------------------------------------------------------------------
+# load_test.py - Offline Capacity Test of the Whole App
+# -------------------------------------------------------------------------
+# Simulates learners who open a chat, send messages, click words of the
+# replies and analyze their own messages, and reports throughput and
+# latency percentiles per endpoint.
+#
+# By default the Flask app runs in-process on the fake LLM backend
+# (LLM_BACKEND=fake, see llm_backends.py) with its databases in a
+# temporary directory, so no key or network is needed. With --url the
+# requests go to a running server instead, e.g. one started with
+#   LLM_BACKEND=fake gunicorn -w 4 main:app
+#
+# Usage:
+#   python benchmarks/load_test.py [--users 20] [--duration 30] [--url http://localhost:5000]
+# -------------------------------------------------------------------------
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+MESSAGES = [
+    "Hola, ¿cómo estás?",
+    "Me llamo Ana y vivo en Madrid.",
+    "Quiero aprender a cocinar. ¿Tienes una receta fácil?",
+    "Ayer fui al mercado con mi hermana.",
+    "¿Qué te gusta hacer los fines de semana?",
+]
+LANGUAGE = "Spanish"
+
+
+class InProcessClient:
+    """A learner talking to the in-process app through Flask's test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_data()
+
+    def post(self, path, payload):
+        response = self.client.post(path, json=payload)
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """A learner talking to a running server, with its own session cookie."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def _send(self, request):
+        try:
+            with self.opener.open(request, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def get(self, path):
+        return self._send(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, payload):
+        return self._send(urllib.request.Request(
+            self.base_url + path, data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        ))
+
+
+def learner(client, stop_at, results, lock):
+    """One simulated learner: chat, click a word of the reply, analyze."""
+    rng = random.Random(threading.get_ident())
+
+    def timed(endpoint, call):
+        start = time.perf_counter()
+        status, body = call()
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            results[endpoint].append((elapsed, status < 400))
+        return body
+
+    timed('GET /chat', lambda: client.get(f'/chat?language={LANGUAGE}'))
+    while time.monotonic() < stop_at:
+        message = rng.choice(MESSAGES)
+        body = timed('POST /api/chat', lambda: client.post('/api/chat', {'message': message, 'language': LANGUAGE}))
+        try:
+            reply = json.loads(body).get('response', '')
+        except ValueError:
+            reply = ''
+        words = re.findall(r'\w+', reply) or ['hola']
+        word = rng.choice(words)
+        timed('POST /api/translate-word',
+              lambda: client.post('/api/translate-word', {'word': word, 'language': LANGUAGE}))
+        if rng.random() < 0.3:
+            timed('POST /api/analyze', lambda: client.post('/api/analyze', {'message': message, 'language': LANGUAGE}))
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline capacity test of the language app")
+    parser.add_argument('--users', type=int, default=20, help="concurrent simulated learners")
+    parser.add_argument('--duration', type=float, default=30, help="test duration in seconds")
+    parser.add_argument('--url', help="base URL of a running server (default: in-process app)")
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)  # noqa: E731
+    else:
+        # Offline defaults, before the app (and its backend) is imported
+        os.environ.setdefault("LLM_BACKEND", "fake")
+        data_dir = tempfile.mkdtemp(prefix="load-test-")
+        os.environ.setdefault("CACHE_DB_PATH", os.path.join(data_dir, "cache.db"))
+        os.environ.setdefault("TRANSLATION_CACHE_PREWARM", "0")
+        # Measure capacity rather than the per-session token budgets
+        os.environ.setdefault("ADMISSION", "0")
+        from app import app
+        make_client = lambda: InProcessClient(app)  # noqa: E731
+
+    results = defaultdict(list)
+    lock = threading.Lock()
+    stop_at = time.monotonic() + args.duration
+    threads = [threading.Thread(target=learner, args=(make_client(), stop_at, results, lock))
+               for _ in range(args.users)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    total = sum(len(samples) for samples in results.values())
+    print(f"{args.users} learners, {elapsed:.1f}s, {total} requests, {total / elapsed:.1f} req/s")
+    print(f"{'endpoint':28} {'count':>7} {'errors':>7} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for endpoint, samples in sorted(results.items()):
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        print(f"{endpoint:28} {len(samples):>7} {errors:>7} {statistics.mean(latencies):>8.1f} "
+              f"{percentile(latencies, 0.5):>8.1f} {percentile(latencies, 0.95):>8.1f} "
+              f"{percentile(latencies, 0.99):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# -------------------------------------------------------------------------
+# startup_benchmark.py - Import-Time Budget for Worker Boot
+# -------------------------------------------------------------------------
+# Imports the app in fresh interpreters with `python -X importtime`, as a
+# gunicorn worker does when it boots, and reports the import time of the
+# app and of its slowest direct imports. The run fails (exit status 1) if
+# the median import time exceeds the budget, or if a dependency that is
+# supposed to be imported lazily (see lazy_imports.py) is imported while
+# the app loads.
+#
+# The app is loaded without network access or side effects: databases in
+# a temporary directory, and translation pre-warming and the welcome pool
+# disabled, so only the imports themselves are measured. No API key is
+# needed.
+#
+# Usage:
+#   python benchmarks/startup_benchmark.py [--runs 5] [--budget-ms 800] [--top 12] [--module app]
+# -------------------------------------------------------------------------
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Dependencies that must not be imported while the app loads
+DEFERRED = ('google.generativeai', 'langchain', 'langchain_core', 'langchain_google_genai')
+
+# "import time: <self us> | <cumulative us> | <indentation><module>"
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_once(module, env):
+    """
+    Import a module in a fresh interpreter
+
+    Returns:
+        list: (depth, module name, self us, cumulative us) in import order
+    """
+    # os._exit skips waiting for background threads the app may have started
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import os, {module}; os._exit(0)'],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((len(indent) // 2, name, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def report(module, entries, top):
+    """Import time of the module (ms) and its slowest direct imports."""
+    total = next((cumulative for depth, name, _, cumulative in entries
+                  if depth == 0 and name == module), None)
+    if total is None:
+        sys.exit(f"No import time reported for {module}")
+    # A module's children are listed (deeper) right before it
+    index = next(i for i, (depth, name, _, _) in enumerate(entries) if depth == 0 and name == module)
+    # Imports done by earlier top-level statements are not the module's
+    start = max((i for i, (depth, _, _, _) in enumerate(entries[:index]) if depth == 0), default=-1) + 1
+    children = [(name, cumulative) for depth, name, _, cumulative in entries[start:index] if depth == 1]
+    return total / 1000, sorted(children, key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget of the app")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters to measure")
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get("STARTUP_BUDGET_MS", "800")),
+                        help="maximum median import time in milliseconds (default 800)")
+    parser.add_argument('--top', type=int, default=12, help="slowest direct imports to list")
+    parser.add_argument('--module', default='app', help="module to import (default: app)")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="startup-benchmark-")
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        CACHE_DB_PATH=os.path.join(data_dir, "cache.db"),
+        TRANSLATION_CACHE_PREWARM="0",
+        WELCOME_POOL="0",
+    )
+
+    # The first run also warms the OS file cache and bytecode caches
+    import_once(args.module, env)
+    timings = []
+    for _ in range(args.runs):
+        entries = import_once(args.module, env)
+        total, slowest = report(args.module, entries, args.top)
+        timings.append(total)
+    median = statistics.median(timings)
+
+    print(f"import {args.module}: median {median:.0f}ms, min {min(timings):.0f}ms, "
+          f"max {max(timings):.0f}ms over {args.runs} runs (budget {args.budget_ms:.0f}ms)")
+    print("slowest direct imports (last run):")
+    for name, cumulative in slowest:
+        print(f"  {cumulative / 1000:8.1f}ms  {name}")
+
+    eager = sorted({name for _, name, _, _ in entries
+                    if any(name == d or name.startswith(d + '.') for d in DEFERRED)})
+    failed = False
+    if eager:
+        roots = sorted({d for d in DEFERRED for name in eager if name == d or name.startswith(d + '.')})
+        print(f"FAIL: deferred dependencies imported at load time: {', '.join(roots)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: median import time {median:.0f}ms exceeds the budget of {args.budget_ms:.0f}ms")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
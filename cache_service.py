@@ -0,0 +1,272 @@
+# -------------------------------------------------------------------------
+# cache_service.py - Result Caching Utilities
+# -------------------------------------------------------------------------
+# This module provides the caches used to avoid repeating identical LLM
+# calls. A two-tier cache combines a fast in-process LRU (bounded by size
+# and TTL) with a persistent SQLite tier stored in the instance/ directory,
+# so results survive restarts and are shared by every worker on the host.
+# Writes periodically sweep expired rows out of the SQLite tier and trim
+# each table to a maximum number of rows (oldest first).
+#
+# Configuration (environment variables):
+# - CACHE_DB_PATH: database file (default instance/language_app.db)
+# - CACHE_DISK_MAX_ROWS: rows kept per SQLite cache table (default 100000)
+# - CACHE_SWEEP_INTERVAL: seconds between sweeps of a table (default 600)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+# Default location of the persistent cache database
+DEFAULT_DB_PATH = os.environ.get(
+    "CACHE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "language_app.db")
+)
+CACHE_DISK_MAX_ROWS = int(os.environ.get("CACHE_DISK_MAX_ROWS", "100000"))
+CACHE_SWEEP_INTERVAL = float(os.environ.get("CACHE_SWEEP_INTERVAL", "600"))
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with a maximum size and per-entry TTL.
+    """
+
+    def __init__(self, max_entries=10000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            expires_at = time.time() + self.ttl if self.ttl else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """Remove an entry if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache stored in a SQLite table.
+
+    A single connection is shared by all threads and guarded by a lock;
+    WAL mode lets several worker processes read and write the same file.
+    Every sweep_interval seconds a write deletes expired rows and the
+    oldest rows beyond max_rows.
+    """
+
+    def __init__(self, table, db_path=DEFAULT_DB_PATH, ttl=None, max_rows=CACHE_DISK_MAX_ROWS,
+                 sweep_interval=CACHE_SWEEP_INTERVAL):
+        self.table = table
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.sweep_interval = sweep_interval
+        self._swept_at = time.time()
+        self.swept = 0
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_created_at ON {table} (created_at)")
+
+    def get(self, key):
+        """Return the stored value, or None if missing or expired."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache read failed for {self.table}: {str(e)}")
+            return None
+        if row is None:
+            return None
+        value, created_at = row
+        if self.ttl and created_at + self.ttl < time.time():
+            return None
+        return value
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        """Store several (key, value) pairs in one transaction."""
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                    [(key, value, now) for key, value in items]
+                )
+                if now - self._swept_at >= self.sweep_interval:
+                    self._sweep(now)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed for {self.table}: {str(e)}")
+
+    def _sweep(self, now):
+        """Delete expired rows and the oldest rows beyond max_rows. Caller holds _lock."""
+        self._swept_at = now
+        deleted = 0
+        if self.ttl:
+            deleted += self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl,)
+            ).rowcount
+        if self.max_rows:
+            deleted += self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,)
+            ).rowcount
+        self.swept += deleted
+        if deleted:
+            logger.debug(f"Swept {deleted} rows from {self.table}")
+
+
+class TwoTierCache:
+    """
+    In-memory LRU in front of a persistent SQLite tier.
+
+    Reads check memory first, then disk (promoting disk hits into memory).
+    Writes go to both tiers. Values must be strings. On an event loop, use
+    the *_async() methods, which only touch the memory tier on the loop and
+    read or write the disk tier in a worker thread.
+    """
+
+    def __init__(self, table, max_entries=10000, memory_ttl=None, disk_ttl=None,
+                 db_path=DEFAULT_DB_PATH, max_disk_rows=CACHE_DISK_MAX_ROWS):
+        self.memory = LRUCache(max_entries=max_entries, ttl=memory_ttl)
+        self.disk = SQLiteCache(table, db_path=db_path, ttl=disk_ttl, max_rows=max_disk_rows)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return value
+        return self._get_disk(key)
+
+    async def get_async(self, key):
+        """get() for callers on an event loop."""
+        return (await self.get_many_async([key]))[0]
+
+    async def get_many_async(self, keys):
+        """
+        Look up several keys from an event loop
+
+        Memory hits are answered on the loop; the disk tier is read for the
+        memory misses only, all of them in one worker thread call.
+
+        Returns:
+            list: The value (or None) of each key
+        """
+        values = [self.memory.get(key) for key in keys]
+        misses = [i for i, value in enumerate(values) if value is None]
+        with self._lock:
+            self.memory_hits += len(keys) - len(misses)
+        if misses:
+            found = await asyncio.to_thread(lambda: [self._get_disk(keys[i]) for i in misses])
+            for i, value in zip(misses, found):
+                values[i] = value
+        return values
+
+    def _get_disk(self, key):
+        """Read a memory miss from the disk tier, promoting a hit into memory."""
+        value = self.disk.get(key)
+        if value is not None:
+            self.memory.set(key, value)
+            with self._lock:
+                self.disk_hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def set_many(self, items):
+        """Store several (key, value) pairs, writing the disk tier in one transaction."""
+        items = list(items)
+        for key, value in items:
+            self.memory.set(key, value)
+        if items:
+            self.disk.set_many(items)
+
+    async def set_async(self, key, value):
+        """set() for callers on an event loop."""
+        await self.set_many_async([(key, value)])
+
+    async def set_many_async(self, items):
+        """set_many() for callers on an event loop; the disk tier is written in a worker thread."""
+        items = list(items)
+        for key, value in items:
+            self.memory.set(key, value)
+        if items:
+            await asyncio.to_thread(self.disk.set_many, items)
+
+    def contains(self, key):
+        """Check both tiers without counting a lookup (promotes disk hits)."""
+        if self.memory.get(key) is not None:
+            return True
+        value = self.disk.get(key)
+        if value is not None:
+            self.memory.set(key, value)
+            return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memoryHits': self.memory_hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'hitRate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memoryEntries': len(self.memory),
+                'diskRowsSwept': self.disk.swept
+            }
@@ -0,0 +1,302 @@
+# -------------------------------------------------------------------------
+# chat_pipeline.py - Chat Turn Orchestration
+# -------------------------------------------------------------------------
+# This module runs a single chat turn (correction followed by a tutor
+# reply). In the default mode the two LLM calls happen one after the
+# other. In speculative mode the reply is generated from the original
+# message while the correction runs in parallel; if the correction comes
+# back unchanged (or close enough) the speculative reply is used,
+# otherwise it is discarded and the reply is regenerated. Latency saved is
+# measured on hits only; the upstream time of discarded speculative replies
+# is counted separately as wasted ("speculation" in /api/stats).
+#
+# In combined mode a single structured-output call returns both the
+# correction and the reply, halving upstream round trips and input tokens
+# per turn; if that call fails or its JSON is malformed the turn falls back
+# to the separate calls above. The mode is chosen per deployment so the
+# two can be compared (stage "upstream-combined" in /metrics versus
+# "upstream-correction" plus "upstream-conversation").
+#
+# Configuration (environment variables):
+# - CHAT_MODE: "separate" (default) or "combined"
+# - SPECULATIVE_CHAT: "1"/"true" to enable speculative mode
+# - SPECULATIVE_SIMILARITY: similarity ratio (0-1) at which a correction
+#   still counts as unchanged (default 0.9)
+# - SPECULATIVE_WORKERS: size of the speculative thread pool (default 8)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import asyncio
+import contextvars
+import difflib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Application-specific imports
+from gemini_service import (
+    correct_user_message,
+    correct_user_message_async,
+    generate_combined_response,
+    generate_combined_response_async,
+    generate_response,
+    generate_response_async,
+    pretranslate_reply,
+    save_exchange,
+    save_exchange_async
+)
+import metrics
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+CHAT_MODE = os.environ.get("CHAT_MODE", "separate").lower()
+SPECULATIVE_CHAT_ENABLED = os.environ.get("SPECULATIVE_CHAT", "").lower() in ("1", "true", "yes")
+SPECULATIVE_SIMILARITY = float(os.environ.get("SPECULATIVE_SIMILARITY", "0.9"))
+
+# Worker pool for speculative reply generation
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SPECULATIVE_WORKERS", "8")),
+    thread_name_prefix="speculative-reply"
+)
+
+
+class SpeculationStats:
+    """Thread-safe counters for speculative chat turns."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self.wasted = 0.0
+
+    def record_hit(self, saved_seconds):
+        """A speculative reply was used, saving saved_seconds over running the calls back to back."""
+        with self._lock:
+            self.hits += 1
+            self.latency_saved += saved_seconds
+
+    def record_miss(self):
+        """A speculative reply was discarded."""
+        with self._lock:
+            self.misses += 1
+
+    def record_wasted(self, seconds):
+        """Upstream time spent on a discarded speculative reply."""
+        with self._lock:
+            self.wasted += seconds
+
+    def snapshot(self):
+        with self._lock:
+            attempts = self.hits + self.misses
+            return {
+                'enabled': SPECULATIVE_CHAT_ENABLED,
+                'attempts': attempts,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / attempts if attempts else 0.0,
+                'latencySavedMs': round(self.latency_saved * 1000, 1),
+                'avgLatencySavedMs': round(self.latency_saved * 1000 / self.hits, 1) if self.hits else 0.0,
+                'wastedSpeculativeMs': round(self.wasted * 1000, 1)
+            }
+
+
+speculation_stats = SpeculationStats()
+
+
+class CombinedStats:
+    """Thread-safe counters for combined correction + reply turns."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.combined = 0
+        self.fallbacks = 0
+
+    def record(self, succeeded):
+        with self._lock:
+            if succeeded:
+                self.combined += 1
+            else:
+                self.fallbacks += 1
+
+    def snapshot(self):
+        with self._lock:
+            turns = self.combined + self.fallbacks
+            return {
+                'mode': CHAT_MODE,
+                'turns': turns,
+                'combined': self.combined,
+                'fallbacks': self.fallbacks,
+                'fallbackRate': self.fallbacks / turns if turns else 0.0
+            }
+
+
+combined_stats = CombinedStats()
+
+
+def _normalize(text):
+    return " ".join(text.split()).casefold()
+
+
+def messages_similar(original, corrected, threshold=SPECULATIVE_SIMILARITY):
+    """
+    Check whether a correction is close enough to the original message
+    for a reply generated from the original to still be valid.
+
+    Args:
+        original (str): The user's message as typed
+        corrected (str): The corrected message
+        threshold (float): Minimum similarity ratio (1.0 means identical)
+
+    Returns:
+        bool: True if the messages are similar enough
+    """
+    a, b = _normalize(original), _normalize(corrected)
+    if a == b:
+        return True
+    return difflib.SequenceMatcher(None, a, b).ratio() >= threshold
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _correct(message, language):
+    with metrics.stage('correction'):
+        return correct_user_message(message, language)
+
+
+async def _correct_async(message, language):
+    with metrics.stage('correction'):
+        return await correct_user_message_async(message, language)
+
+
+def run_chat_turn(message, language, vocabulary, conversation_id):
+    """
+    Correct a user message and generate the tutor's reply.
+
+    Args:
+        message (str): The user's message
+        language (str): The target language
+        vocabulary (list): Optional vocabulary restriction for the reply
+        conversation_id (str): Conversation to continue
+
+    Returns:
+        tuple: (corrected_message, response)
+    """
+    if CHAT_MODE == 'combined':
+        result = generate_combined_response(message, language, vocabulary,
+                                            conversation_id=conversation_id)
+        combined_stats.record(result is not None)
+        if result is not None:
+            return result
+
+    if not SPECULATIVE_CHAT_ENABLED:
+        corrected_message = _correct(message, language)
+        # Note: We use the corrected message for generation to ensure proper context
+        response = generate_response(corrected_message, language, vocabulary,
+                                     conversation_id=conversation_id)
+        return corrected_message, response
+
+    start = time.perf_counter()
+    # Start the reply from the original message; memory is only committed
+    # once we know the speculative reply will actually be used. The job runs
+    # in a copy of this context so its stages count towards this request.
+    speculative = _executor.submit(
+        contextvars.copy_context().run, _timed, generate_response, message, language, vocabulary,
+        conversation_id=conversation_id, save_to_memory=False
+    )
+    try:
+        corrected_message, correction_time = _timed(_correct, message, language)
+    except BaseException:
+        # e.g. the correction was refused by admission control; a job that
+        # has not started yet is dropped, a running one is discarded
+        speculative.cancel()
+        raise
+
+    if not messages_similar(message, corrected_message):
+        # The in-flight upstream call cannot be interrupted, but its result is
+        # discarded; a job that had not started yet wasted nothing
+        if not speculative.cancel():
+            speculative.add_done_callback(
+                lambda discarded: speculation_stats.record_wasted(time.perf_counter() - start)
+            )
+        speculation_stats.record_miss()
+        logger.debug("Speculative reply missed, regenerating from the corrected message")
+        response = generate_response(corrected_message, language, vocabulary,
+                                     conversation_id=conversation_id)
+        return corrected_message, response
+
+    response, reply_time = speculative.result()
+    save_exchange(conversation_id, corrected_message, response)
+    pretranslate_reply(response, language)
+    # Latency saved relative to running correction and reply back to back
+    saved = correction_time + reply_time - (time.perf_counter() - start)
+    speculation_stats.record_hit(saved)
+    logger.debug(f"Speculative reply hit, saved {saved * 1000:.0f} ms")
+    return corrected_message, response
+
+
+async def _timed_async(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+
+async def run_chat_turn_async(message, language, vocabulary, conversation_id):
+    """
+    Async twin of run_chat_turn(), used by the ASGI app.
+
+    In speculative mode the reply is a concurrent task on the event loop
+    instead of a job on the thread pool.
+    """
+    if CHAT_MODE == 'combined':
+        result = await generate_combined_response_async(message, language, vocabulary,
+                                                        conversation_id=conversation_id)
+        combined_stats.record(result is not None)
+        if result is not None:
+            return result
+
+    if not SPECULATIVE_CHAT_ENABLED:
+        corrected_message = await _correct_async(message, language)
+        response = await generate_response_async(corrected_message, language, vocabulary,
+                                                 conversation_id=conversation_id)
+        return corrected_message, response
+
+    start = time.perf_counter()
+    speculative = asyncio.create_task(_timed_async(generate_response_async(
+        message, language, vocabulary, conversation_id=conversation_id, save_to_memory=False
+    )))
+    try:
+        corrected_message, correction_time = await _timed_async(_correct_async(message, language))
+    except BaseException:
+        # e.g. the correction was refused by admission control
+        speculative.cancel()
+        raise
+
+    if not messages_similar(message, corrected_message):
+        # Unlike a thread pool job, the in-flight call is actually cancelled,
+        # so it has wasted the time until now (or until it finished)
+        if speculative.done() and not speculative.cancelled() and speculative.exception() is None:
+            speculation_stats.record_wasted(speculative.result()[1])
+        else:
+            speculative.cancel()
+            speculation_stats.record_wasted(time.perf_counter() - start)
+        speculation_stats.record_miss()
+        logger.debug("Speculative reply missed, regenerating from the corrected message")
+        response = await generate_response_async(corrected_message, language, vocabulary,
+                                                  conversation_id=conversation_id)
+        return corrected_message, response
+
+    response, reply_time = await speculative
+    await save_exchange_async(conversation_id, corrected_message, response)
+    pretranslate_reply(response, language)
+    saved = correction_time + reply_time - (time.perf_counter() - start)
+    speculation_stats.record_hit(saved)
+    logger.debug(f"Speculative reply hit, saved {saved * 1000:.0f} ms")
+    return corrected_message, response
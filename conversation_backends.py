@@ -0,0 +1,392 @@
+# -------------------------------------------------------------------------
+# conversation_backends.py - Shared Conversation Storage Backends
+# -------------------------------------------------------------------------
+# Conversation memories normally live only in the worker process that
+# created them, so with several gunicorn workers consecutive turns of the
+# same session can land on a worker that has never seen the conversation.
+# The backends in this module store conversation turns outside the
+# process so every worker (and node) sees the same history.
+#
+# Writes are appended incrementally and batched: turns are queued and a
+# background thread flushes them in one transaction / round trip. Every
+# conversation has a version that changes on each write, which lets the
+# in-process ConversationStore act as a read-through cache and only
+# reload a conversation when another worker has changed it.
+#
+# Only the most recent turns of a conversation are kept and loaded; the
+# history manager sends a summary plus the last few turns anyway. A
+# conversation expires after a period without writes.
+#
+# Backends:
+# - SQLiteConversationBackend: a table in a shared SQLite file (one host)
+# - RedisConversationBackend: Redis lists (several hosts). Any client with
+#   the redis-py command interface can be passed in, so a local stand-in
+#   can replace a real server in tests.
+#
+# Configuration (environment variables):
+# - CONVERSATION_BACKEND: "memory" (default), "sqlite" or "redis"
+# - CONVERSATION_DB_PATH: SQLite file of the sqlite backend (default: the app database)
+# - REDIS_URL: server of the redis backend (default redis://localhost:6379/0)
+# - CONVERSATION_FLUSH_INTERVAL: seconds between batched writes (default 0.05)
+# - CONVERSATION_TTL: seconds without writes before a conversation expires (default 86400)
+# - CONVERSATION_MAX_MESSAGES: most recent messages kept per conversation (default 200)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+
+class ConversationBackend(abc.ABC):
+    """
+    Base class for shared conversation storage with batched writes.
+
+    Subclasses implement _write_batch(), _delete(), _load() and _version().
+
+    Args:
+        flush_interval (float): Seconds between batched writes
+        max_batch (int): Queued messages that trigger a write at once
+        ttl (float): Seconds without writes before a conversation expires
+        max_messages (int): Most recent messages kept and loaded per conversation
+    """
+
+    def __init__(self, flush_interval=0.05, max_batch=100, ttl=24 * 3600, max_messages=200):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.ttl = ttl
+        self.max_messages = max_messages
+        # conversation_id -> list of (role, content) waiting to be written
+        self._pending = defaultdict(list)
+        # conversation_id -> version produced by this process's last write
+        self._written_versions = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._owner_pid = None
+        self._check_process()
+
+    def _check_process(self):
+        """Start the flusher in this process; a forked worker drops its parent's state."""
+        # Threads do not survive a fork, and the parent flushes its own queued writes
+        with self._lock:
+            pid = os.getpid()
+            if self._owner_pid == pid:
+                return
+            forked = self._owner_pid is not None
+            if forked:
+                logger.debug(f"Resetting conversation backend after fork (pid {self._owner_pid} -> {pid})")
+                self._pending.clear()
+                self._written_versions.clear()
+                self._after_fork()
+            self._owner_pid = pid
+            self._flusher = threading.Thread(target=self._flush_loop, name="conversation-flush", daemon=True)
+            self._flusher.start()
+
+    def _after_fork(self):
+        """Replace connections inherited from the parent process (called with the lock held)."""
+
+    def append(self, conversation_id, messages):
+        """
+        Queue messages to be appended to a conversation.
+
+        Args:
+            conversation_id: The conversation's identifier
+            messages (list): (role, content) tuples, role being "human" or "ai"
+        """
+        self._check_process()
+        with self._lock:
+            self._pending[conversation_id].extend(messages)
+            queued = sum(len(items) for items in self._pending.values())
+        if queued >= self.max_batch:
+            self._wakeup.set()
+
+    def has_pending(self, conversation_id):
+        """Whether this process has unflushed writes for a conversation."""
+        with self._lock:
+            return bool(self._pending.get(conversation_id))
+
+    def written_version(self, conversation_id):
+        """The version this process's last flushed write produced, if any."""
+        with self._lock:
+            return self._written_versions.get(conversation_id)
+
+    def flush(self):
+        """Write all queued messages now."""
+        with self._flush_lock:
+            with self._lock:
+                batch = dict(self._pending)
+                self._pending.clear()
+            if not batch:
+                return
+            try:
+                versions = self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"Failed to write conversation batch: {str(e)}")
+                # Put the batch back in front of anything queued meanwhile
+                with self._lock:
+                    for conversation_id, messages in batch.items():
+                        self._pending[conversation_id][:0] = messages
+                return
+            with self._lock:
+                self._written_versions.update(versions)
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def clear(self, conversation_id):
+        """Delete a conversation, including any queued writes."""
+        self._check_process()
+        with self._flush_lock:
+            with self._lock:
+                self._pending.pop(conversation_id, None)
+                self._written_versions.pop(conversation_id, None)
+            self._delete(conversation_id)
+
+    def load(self, conversation_id):
+        """
+        Load the most recent max_messages messages of a conversation.
+
+        Returns:
+            tuple: (version, list of (role, content) in order)
+        """
+        self._check_process()
+        return self._load(conversation_id)
+
+    def version(self, conversation_id):
+        """Return the conversation's current version (0 if it does not exist)."""
+        self._check_process()
+        return self._version(conversation_id)
+
+    @abc.abstractmethod
+    def _write_batch(self, batch):
+        """
+        Persist queued messages.
+
+        Args:
+            batch (dict): conversation_id -> list of (role, content)
+
+        Returns:
+            dict: conversation_id -> version after the write
+        """
+
+    @abc.abstractmethod
+    def _delete(self, conversation_id):
+        """Delete a conversation's messages."""
+
+    @abc.abstractmethod
+    def _load(self, conversation_id):
+        """Read the version and the most recent messages of a conversation."""
+
+    @abc.abstractmethod
+    def _version(self, conversation_id):
+        """Read the conversation's current version."""
+
+
+class SQLiteConversationBackend(ConversationBackend):
+    """
+    Conversation turns stored in a SQLite table shared by all workers on a host.
+
+    The version of a conversation is the row id of its latest turn, which only
+    ever increases, so a conversation that was cleared and restarted never
+    reuses an old version.
+
+    Writes trim a conversation to its max_messages most recent turns, and
+    every prune_interval seconds conversations without a write for ttl
+    seconds are deleted.
+
+    Args:
+        db_path (str): SQLite database file
+        prune_interval (float): Seconds between sweeps of expired conversations
+    """
+
+    def __init__(self, db_path, prune_interval=300, **kwargs):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.prune_interval = prune_interval
+        self._pruned_at = 0.0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        self._db_lock = threading.Lock()
+        with self._db_lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_turn ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "conversation_id TEXT NOT NULL, "
+                "role TEXT NOT NULL, "
+                "content TEXT NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_conversation_turn_conversation "
+                "ON conversation_turn (conversation_id, id)"
+            )
+        super().__init__(**kwargs)
+
+    def _after_fork(self):
+        # A SQLite connection must not be used across a fork
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+        self._db_lock = threading.Lock()
+
+    def _write_batch(self, batch):
+        now = time.time()
+        rows = [
+            (conversation_id, role, content, now)
+            for conversation_id, messages in batch.items()
+            for role, content in messages
+        ]
+        with self._db_lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO conversation_turn (conversation_id, role, content, created_at) "
+                "VALUES (?, ?, ?, ?)", rows
+            )
+            # Keep only the turns a conversation can still use
+            self._conn.executemany(
+                "DELETE FROM conversation_turn WHERE conversation_id = ? AND id < ("
+                "SELECT MIN(id) FROM (SELECT id FROM conversation_turn WHERE conversation_id = ? "
+                "ORDER BY id DESC LIMIT ?))",
+                [(conversation_id, conversation_id, self.max_messages) for conversation_id in batch]
+            )
+            if now - self._pruned_at >= self.prune_interval:
+                self._prune(now)
+            return {conversation_id: self._max_id(conversation_id) for conversation_id in batch}
+
+    def _prune(self, now):
+        """Delete conversations without a write for ttl seconds. Caller holds _db_lock."""
+        self._pruned_at = now
+        deleted = self._conn.execute(
+            "DELETE FROM conversation_turn WHERE conversation_id IN ("
+            "SELECT conversation_id FROM conversation_turn GROUP BY conversation_id "
+            "HAVING MAX(created_at) < ?)", (now - self.ttl,)
+        ).rowcount
+        if deleted:
+            logger.debug(f"Pruned {deleted} expired conversation turns")
+
+    def _max_id(self, conversation_id):
+        row = self._conn.execute(
+            "SELECT MAX(id) FROM conversation_turn WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+        return row[0] or 0
+
+    def _delete(self, conversation_id):
+        with self._db_lock, self._conn:
+            self._conn.execute("DELETE FROM conversation_turn WHERE conversation_id = ?", (conversation_id,))
+
+    def _load(self, conversation_id):
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content FROM conversation_turn WHERE conversation_id = ? "
+                "ORDER BY id DESC LIMIT ?", (conversation_id, self.max_messages)
+            ).fetchall()
+        rows.reverse()
+        version = rows[-1][0] if rows else 0
+        return version, [(role, content) for _, role, content in rows]
+
+    def _version(self, conversation_id):
+        with self._db_lock:
+            return self._max_id(conversation_id)
+
+
+class RedisConversationBackend(ConversationBackend):
+    """
+    Conversation turns stored in Redis, shared across hosts.
+
+    Each conversation is a list of JSON-encoded turns plus a version counter
+    that is incremented on every write. Lists are trimmed to max_messages
+    and keys expire after ttl seconds without writes. Writes and loads run
+    as MULTI/EXEC transactions, one round trip each.
+
+    Args:
+        client: A redis-py compatible client (pipeline(transaction=True) with
+                rpush, ltrim, lrange, incrby, get, delete, expire), or a
+                local stand-in with the same methods
+        prefix (str): Key prefix
+    """
+
+    def __init__(self, client, prefix="languagepal:conversation:", **kwargs):
+        self.client = client
+        self.prefix = prefix
+        super().__init__(**kwargs)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """Create a backend connected to a Redis server (requires the redis package)."""
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _keys(self, conversation_id):
+        base = f"{self.prefix}{conversation_id}"
+        return base, base + ":version"
+
+    def _write_batch(self, batch):
+        ttl = int(self.ttl)
+        pipe = self.client.pipeline(transaction=True)
+        for conversation_id, messages in batch.items():
+            turns_key, version_key = self._keys(conversation_id)
+            pipe.rpush(turns_key, *[json.dumps([role, content]) for role, content in messages])
+            pipe.ltrim(turns_key, -self.max_messages, -1)
+            pipe.incrby(version_key, len(messages))
+            pipe.expire(turns_key, ttl)
+            pipe.expire(version_key, ttl)
+        results = pipe.execute()
+        # Five replies per conversation, the third being the new version
+        return {conversation_id: int(results[index * 5 + 2]) for index, conversation_id in enumerate(batch)}
+
+    def _delete(self, conversation_id):
+        # The version key is kept (and bumped) so other workers notice the reset
+        turns_key, version_key = self._keys(conversation_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(turns_key)
+        pipe.incrby(version_key, 1)
+        pipe.execute()
+
+    def _load(self, conversation_id):
+        turns_key, version_key = self._keys(conversation_id)
+        # Read both in one transaction so the version matches the turns
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(version_key)
+        pipe.lrange(turns_key, -self.max_messages, -1)
+        version, items = pipe.execute()
+        return int(version) if version is not None else 0, [tuple(json.loads(item)) for item in items]
+
+    def _version(self, conversation_id):
+        _, version_key = self._keys(conversation_id)
+        value = self.client.get(version_key)
+        return int(value) if value is not None else 0
+
+
+def create_backend_from_env(default_db_path):
+    """
+    Create the conversation backend selected by CONVERSATION_BACKEND.
+
+    Values: "memory" (default, no shared backend), "sqlite" (uses
+    CONVERSATION_DB_PATH or the default database), "redis" (uses REDIS_URL).
+
+    Returns:
+        ConversationBackend or None
+    """
+    kind = os.environ.get("CONVERSATION_BACKEND", "memory").lower()
+    options = {
+        'flush_interval': float(os.environ.get("CONVERSATION_FLUSH_INTERVAL", "0.05")),
+        'ttl': float(os.environ.get("CONVERSATION_TTL", str(24 * 3600))),
+        'max_messages': int(os.environ.get("CONVERSATION_MAX_MESSAGES", "200")),
+    }
+    if kind == "sqlite":
+        db_path = os.environ.get("CONVERSATION_DB_PATH", default_db_path)
+        return SQLiteConversationBackend(db_path, **options)
+    if kind == "redis":
+        url = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+        return RedisConversationBackend.from_url(url, **options)
+    return None
@@ -0,0 +1,193 @@
+# -------------------------------------------------------------------------
+# conversation_store.py - Bounded Conversation Memory Store
+# -------------------------------------------------------------------------
+# This module keeps the per-session conversation memories used by the
+# tutor. Unlike a plain dict it cannot grow without bound in a
+# long-running worker: conversations expire after an idle TTL, the least
+# recently used conversations are evicted beyond a maximum count, and a
+# global memory ceiling (approximate bytes of stored messages) is enforced.
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+# Approximate per-message overhead of a LangChain message object in bytes
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+def estimate_memory_bytes(memory):
+    """
+    Approximate the memory used by a conversation's messages.
+
+    Args:
+        memory: A LangChain memory object with a chat_memory.messages list
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    total = 0
+    for message in memory.chat_memory.messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        total += len(content.encode('utf-8')) + MESSAGE_OVERHEAD_BYTES
+    return total
+
+
+class ConversationStore:
+    """
+    Thread-safe, bounded map of conversation ID -> conversation memory.
+
+    Args:
+        factory (callable): Creates an empty memory for a new conversation
+        max_conversations (int): Maximum number of conversations kept (LRU eviction)
+        idle_ttl (float): Seconds of inactivity after which a conversation expires
+        max_bytes (int): Global ceiling on the approximate size of all conversations
+        on_evict (callable, optional): on_evict(conversation_id), called when a
+                                       conversation expires or is evicted, so state
+                                       kept elsewhere (e.g. its history summary) goes
+                                       with it. Called with the store's lock held.
+    """
+
+    def __init__(self, factory, max_conversations=1000, idle_ttl=3600, max_bytes=64 * 1024 * 1024,
+                 on_evict=None):
+        self.factory = factory
+        self.on_evict = on_evict
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        # conversation_id -> [memory, last_access, approx_bytes, version], in LRU order
+        # (version is the shared backend's version the memory was loaded at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self._last_sweep = time.monotonic()
+        self.evictions = {'expired': 0, 'capacity': 0, 'memory': 0}
+
+    def _remove(self, conversation_id, reason=None):
+        """Remove an entry. Caller holds _lock."""
+        entry = self._entries.pop(conversation_id)
+        self._total_bytes -= entry[2]
+        if reason:
+            self.evictions[reason] += 1
+            logger.debug(f"Evicted conversation {conversation_id} ({reason})")
+            if self.on_evict is not None:
+                self.on_evict(conversation_id)
+
+    def _sweep_expired(self, now):
+        """Drop idle conversations, at most once per second. Caller holds _lock."""
+        if now - self._last_sweep < 1:
+            return
+        self._last_sweep = now
+        # Entries are in access order, so expired ones are at the front
+        while self._entries:
+            conversation_id, entry = next(iter(self._entries.items()))
+            if now - entry[1] < self.idle_ttl:
+                break
+            self._remove(conversation_id, 'expired')
+
+    def _enforce_limits(self, keep=None):
+        """Evict least recently used conversations over the limits. Caller holds _lock."""
+        while len(self._entries) > self.max_conversations:
+            self._remove(next(iter(self._entries)), 'capacity')
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest, 'memory')
+
+    def get(self, conversation_id):
+        """Return the memory for a conversation, or None if absent or expired."""
+        now = time.monotonic()
+        with self._lock:
+            self._sweep_expired(now)
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return None
+            if now - entry[1] >= self.idle_ttl:
+                self._remove(conversation_id, 'expired')
+                return None
+            entry[1] = now
+            self._entries.move_to_end(conversation_id)
+            return entry[0]
+
+    def get_or_create(self, conversation_id):
+        """Return the memory for a conversation, creating an empty one if needed."""
+        memory = self.get(conversation_id)
+        if memory is not None:
+            return memory
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                entry = [self.factory(), time.monotonic(), 0, 0]
+                self._entries[conversation_id] = entry
+                self._enforce_limits(keep=conversation_id)
+            return entry[0]
+
+    def touch(self, conversation_id):
+        """
+        Re-measure a conversation after new messages were added to it and
+        enforce the memory ceiling.
+        """
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            size = estimate_memory_bytes(entry[0])
+            self._total_bytes += size - entry[2]
+            entry[2] = size
+            entry[1] = time.monotonic()
+            self._entries.move_to_end(conversation_id)
+            self._enforce_limits(keep=conversation_id)
+
+    def replace(self, conversation_id, memory, version):
+        """Store a memory loaded from a shared backend at the given version."""
+        with self._lock:
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+            size = estimate_memory_bytes(memory)
+            self._entries[conversation_id] = [memory, time.monotonic(), size, version]
+            self._total_bytes += size
+            self._enforce_limits(keep=conversation_id)
+
+    def version(self, conversation_id):
+        """The backend version a conversation was last synchronized at, or None."""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            return entry[3] if entry is not None else None
+
+    def set_version(self, conversation_id, version):
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is not None:
+                entry[3] = version
+
+    def pop(self, conversation_id):
+        """Remove a conversation. Returns True if it existed."""
+        with self._lock:
+            if conversation_id not in self._entries:
+                return False
+            self._remove(conversation_id)
+            return True
+
+    def __contains__(self, conversation_id):
+        return self.get(conversation_id) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            count = len(self._entries)
+            return {
+                'conversations': count,
+                'maxConversations': self.max_conversations,
+                'totalBytes': self._total_bytes,
+                'maxBytes': self.max_bytes,
+                'bytesPerConversation': self._total_bytes // count if count else 0,
+                'evictions': dict(self.evictions)
+            }
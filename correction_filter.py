@@ -0,0 +1,215 @@
+# -------------------------------------------------------------------------
+# correction_filter.py - Local Fast Path for Message Correction
+# -------------------------------------------------------------------------
+# correct_user_message() spends a full model round trip on every message,
+# including "hola", "sí", "gracias" or a sentence the model has already
+# confirmed. This pre-filter judges such messages correct locally:
+#
+# - verified sentences: messages the model returned unchanged and the
+#   corrections it produced are kept in a two-tier cache, so repeating a
+#   sentence that is known to be correct skips the model
+# - known words: per-language sets seeded from the example vocabulary, the
+#   users' vocabulary lists and the words of past corrections; a message of
+#   at most CORRECTION_FAST_PATH_MAX_WORDS words that are all known (or a
+#   message equal to a known phrase such as "por favor") is accepted
+# - cheap heuristics: messages without any letters (numbers, emoji,
+#   punctuation) have nothing to correct
+#
+# Everything else goes to the model as before. Differences in case or
+# surrounding punctuation are not treated as corrections.
+#
+# In shadow mode the model is still called for every message and its
+# answer is compared with the filter's verdict, so the disagreement rate
+# can be measured before the fast path is switched on.
+#
+# Configuration (environment variables):
+# - CORRECTION_FAST_PATH: "on" (default), "shadow" or "off"
+# - CORRECTION_FAST_PATH_MAX_WORDS: longest message accepted on known words alone (default 1)
+# - CORRECTION_KNOWN_WORDS_MAX: known words kept per language (default 50000)
+# - VERIFIED_SENTENCE_CACHE_SIZE: in-memory verified sentences (default 10000)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import logging
+import os
+import threading
+
+# Application-specific imports
+from cache_service import DEFAULT_DB_PATH, TwoTierCache
+from lexicon_service import normalize_word
+from vocabulary_service import get_example_vocabulary
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+CORRECTION_FAST_PATH = os.environ.get("CORRECTION_FAST_PATH", "on").lower()
+CORRECTION_FAST_PATH_MAX_WORDS = int(os.environ.get("CORRECTION_FAST_PATH_MAX_WORDS", "1"))
+CORRECTION_KNOWN_WORDS_MAX = int(os.environ.get("CORRECTION_KNOWN_WORDS_MAX", "50000"))
+
+
+def _language_key(language):
+    return language.strip().casefold()
+
+
+def normalize_sentence(text):
+    """Normalize a message for comparison: case, whitespace and surrounding punctuation are ignored."""
+    return " ".join(word for word in (normalize_word(token) for token in text.split()) if word)
+
+
+class CorrectionFilter:
+    """
+    Judges messages that need no correction without calling the model.
+
+    Args:
+        mode (str): "on", "shadow" or "off"
+        max_words (int): Longest message accepted on known words alone
+        db_path (str): Database of the verified sentence cache
+    """
+
+    def __init__(self, mode=CORRECTION_FAST_PATH, max_words=CORRECTION_FAST_PATH_MAX_WORDS,
+                 db_path=DEFAULT_DB_PATH):
+        self.mode = mode if mode in ("on", "shadow", "off") else "on"
+        self.max_words = max_words
+        self.verified = TwoTierCache(
+            'verified_sentences',
+            max_entries=int(os.environ.get("VERIFIED_SENTENCE_CACHE_SIZE", "10000")),
+            db_path=db_path
+        )
+        self._known = {}
+        self._lock = threading.Lock()
+        self.counts = {'checked': 0, 'verified': 0, 'knownWords': 0, 'noLetters': 0,
+                       'shadowAgreed': 0, 'shadowDisagreed': 0}
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    @property
+    def active(self):
+        """Whether a positive verdict skips the model (as opposed to shadow mode)."""
+        return self.mode == "on"
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    # Known words
+
+    def _known_words(self, language):
+        """Caller holds _lock; seeds the language from the example vocabulary on first use."""
+        key = _language_key(language)
+        known = self._known.get(key)
+        if known is None:
+            known = self._known[key] = set()
+            examples = get_example_vocabulary(language.strip().title())
+            # Languages without examples get English ones, which must not count as known
+            if examples != get_example_vocabulary(None):
+                self._add(known, examples)
+        return known
+
+    @staticmethod
+    def _add(known, entries):
+        for entry in entries:
+            if len(known) >= CORRECTION_KNOWN_WORDS_MAX:
+                return
+            phrase = normalize_sentence(entry)
+            if phrase:
+                # Phrases count as a whole and word by word
+                known.add(phrase)
+                known.update(phrase.split())
+
+    def add_words(self, words, language):
+        """
+        Add vocabulary (words or phrases) to a language's known words
+
+        Args:
+            words (list): Words or phrases, e.g. a user's vocabulary list
+            language (str): Their language (e.g., "Spanish")
+        """
+        if not self.enabled or not words:
+            return
+        with self._lock:
+            self._add(self._known_words(language), words)
+
+    # Verdicts
+
+    def check(self, message, language):
+        """
+        Judge whether a message needs no correction
+
+        Args:
+            message (str): The learner's message
+            language (str): The target language
+
+        Returns:
+            str: The reason the message is judged correct ("verified",
+                 "knownWords" or "noLetters"), or None if the model should decide
+        """
+        if not self.enabled:
+            return None
+        self._count('checked')
+        reason = self._verdict(message, language)
+        if reason is not None:
+            self._count(reason)
+        return reason
+
+    def _verdict(self, message, language):
+        if not any(ch.isalpha() for ch in message):
+            return 'noLetters'
+        sentence = normalize_sentence(message)
+        if self.verified.get(f"{_language_key(language)}|{sentence}") is not None:
+            return 'verified'
+        words = sentence.split()
+        with self._lock:
+            known = self._known_words(language)
+            if sentence in known or (len(words) <= self.max_words and all(word in known for word in words)):
+                return 'knownWords'
+        return None
+
+    def learn(self, message, corrected, language, verdict=None):
+        """
+        Learn from a correction the model made
+
+        The correction is stored as a verified sentence (and the message too
+        if the model left it unchanged) and its words become known words.
+        In shadow mode the filter's verdict for the message is compared with
+        the model's answer.
+
+        Args:
+            message (str): The learner's message
+            corrected (str): The model's correction
+            language (str): The target language
+            verdict (str, optional): What check() returned for the message
+        """
+        if not self.enabled or not corrected:
+            return
+        original, result = normalize_sentence(message), normalize_sentence(corrected)
+        unchanged = original == result
+        if verdict is not None:
+            self._count('shadowAgreed' if unchanged else 'shadowDisagreed')
+            if not unchanged:
+                logger.info(f"Correction fast path ({verdict}) disagreed with the model for {language}")
+        if result:
+            self.verified.set(f"{_language_key(language)}|{result}", corrected)
+        with self._lock:
+            known = self._known_words(language)
+            for word in result.split():
+                if len(known) >= CORRECTION_KNOWN_WORDS_MAX:
+                    break
+                known.add(word)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            known_words = {language: len(words) for language, words in self._known.items()}
+        fired = counts['verified'] + counts['knownWords'] + counts['noLetters']
+        compared = counts['shadowAgreed'] + counts['shadowDisagreed']
+        return dict(
+            counts,
+            mode=self.mode,
+            fired=fired,
+            fireRate=fired / counts['checked'] if counts['checked'] else 0.0,
+            disagreementRate=counts['shadowDisagreed'] / compared if compared else 0.0,
+            knownWordsByLanguage=known_words,
+            verifiedCache=self.verified.stats()
+        )
@@ -0,0 +1,125 @@
+# -------------------------------------------------------------------------
+# gemini_clients.py - Shared Gemini Client Registry
+# -------------------------------------------------------------------------
+# This module keeps one process-wide set of Gemini clients so that the
+# service functions in gemini_service.py do not reconfigure the SDK and
+# rebuild model objects on every request. The direct SDK keeps a single
+# configured client (and its pooled transport) for the whole process, and
+# LangChain chat models are created once per (model, temperature, purpose).
+# The SDKs themselves are only imported when the first client is built (see
+# lazy_imports.py).
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import logging
+import os
+import threading
+
+# Application-specific imports
+from lazy_imports import lazy_import
+
+# Google Generative AI and LangChain SDKs, imported on first use
+genai = lazy_import('google.generativeai')
+langchain_google_genai = lazy_import('langchain_google_genai')
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+# Default model used by every service function
+DEFAULT_MODEL = 'gemini-1.5-flash'
+
+# Registry state, guarded by _lock
+# Clients hold network channels that must not be shared across a fork,
+# so the registry remembers which process built them and starts over
+# when it finds itself in a new one (e.g. a freshly forked gunicorn worker)
+_lock = threading.Lock()
+_owner_pid = None
+_configured_key = None
+_generative_models = {}
+_chat_models = {}
+
+
+def _check_process():
+    """Drop clients inherited from a parent process. Caller holds _lock."""
+    global _owner_pid, _configured_key
+    pid = os.getpid()
+    if _owner_pid != pid:
+        if _owner_pid is not None:
+            logger.debug(f"Resetting Gemini clients after fork (pid {_owner_pid} -> {pid})")
+        _owner_pid = pid
+        _configured_key = None
+        _generative_models.clear()
+        _chat_models.clear()
+
+
+def _configure(api_key):
+    """Configure the SDK once per process and key. Caller holds _lock."""
+    global _configured_key
+    if _configured_key != api_key:
+        genai.configure(api_key=api_key)
+        _configured_key = api_key
+        # Models built against the previous key are no longer valid
+        _generative_models.clear()
+        _chat_models.clear()
+        logger.debug("Configured Gemini SDK client")
+
+
+def get_generative_model(api_key, model_name=DEFAULT_MODEL):
+    """
+    Get the shared direct-SDK model for the given model name.
+
+    Args:
+        api_key (str): The Gemini API key
+        model_name (str): The Gemini model to use
+
+    Returns:
+        genai.GenerativeModel: A model instance reused across requests
+    """
+    with _lock:
+        _check_process()
+        _configure(api_key)
+        model = _generative_models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            _generative_models[model_name] = model
+        return model
+
+
+def get_chat_model(api_key, purpose, temperature, model_name=DEFAULT_MODEL, **kwargs):
+    """
+    Get the shared LangChain chat model for a purpose and temperature.
+
+    Args:
+        api_key (str): The Gemini API key
+        purpose (str): What the model is used for (e.g. "welcome", "correction")
+        temperature (float): Sampling temperature
+        model_name (str): The Gemini model to use
+        **kwargs: Extra ChatGoogleGenerativeAI parameters (top_p, max_tokens, ...)
+
+    Returns:
+        ChatGoogleGenerativeAI: A chat model instance reused across requests
+    """
+    key = (model_name, temperature, purpose, tuple(sorted(kwargs.items())))
+    with _lock:
+        _check_process()
+        _configure(api_key)
+        llm = _chat_models.get(key)
+        if llm is None:
+            llm = langchain_google_genai.ChatGoogleGenerativeAI(
+                model=model_name,
+                api_key=api_key,
+                temperature=temperature,
+                **kwargs
+            )
+            _chat_models[key] = llm
+            logger.debug(f"Created chat model for purpose '{purpose}' (temperature={temperature})")
+        return llm
+
+
+def reset_clients():
+    """Forget every cached client so the next call builds fresh ones."""
+    global _configured_key
+    with _lock:
+        _configured_key = None
+        _generative_models.clear()
+        _chat_models.clear()
@@ -7,19 +7,49 @@
 # -------------------------------------------------------------------------
 
 # Standard library imports
+import asyncio
+import contextvars
+import json
 import logging
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 
 # Flask imports
 from flask import session
 
-# Google Generative AI imports
-import google.generativeai as genai
+# Application-specific imports
+from analysis_parser import (
+    AnalysisStreamParser,
+    assemble_analysis,
+    match_sections,
+    parse_analysis,
+    sentence_hash,
+    split_sentences
+)
+from cache_service import DEFAULT_DB_PATH, TwoTierCache
+from correction_filter import CorrectionFilter
+from conversation_backends import create_backend_from_env
+from conversation_store import ConversationStore
+from history_manager import HistoryManager, estimate_tokens
+from admission import AdmissionRejected, admission
+from lazy_imports import lazy_import
+from lexicon_service import LEXICON_ENABLED, Lexicon, format_entry, normalize_word
+import metrics
+from pretranslation import PRETRANSLATE_ENABLED, Pretranslator
+from resilience import breaker, policy
+from scheduler import scheduler
+from singleflight import SingleFlight
+from vocabulary_selector import VocabularySelector
+from welcome_pool import WELCOME_POOL_ENABLED, WelcomePool
+from llm_backends import OFFLINE_API_KEY, backend as llm_backend, get_chat_model, get_generative_model
 
-# LangChain imports
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import HumanMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
+# LangChain, imported on first use (see lazy_imports.py)
+langchain_memory = lazy_import('langchain.memory')
+langchain_schema = lazy_import('langchain.schema')
 
 # Configure module logger
 logger = logging.getLogger(__name__)
@@ -33,16 +63,210 @@ def _load_gemini_api_key():
             return f.read().strip()
     return os.environ.get("GEMINI_API_KEY", "")
 
-GEMINI_API_KEY = _load_gemini_api_key()
+# Offline LLM backends (LLM_BACKEND=fake|replay) run without a real key
+GEMINI_API_KEY = _load_gemini_api_key() or (OFFLINE_API_KEY if llm_backend.offline else "")
 
 # Ensure compatibility with libraries expecting GOOGLE_API_KEY env variable
-if GEMINI_API_KEY:
+if GEMINI_API_KEY and GEMINI_API_KEY != OFFLINE_API_KEY:
     os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
 
-# Dictionary to store conversation memories for each user/guest session
+# Bounded store of conversation memories for each user/guest session
 # Keys are session IDs, values are ConversationBufferMemory instances
-# This maintains conversation history between API calls without a database
-conversation_memories = {}
+# This maintains conversation history between API calls without a database;
+# idle conversations expire and the least recently used are evicted when the
+# conversation count or approximate memory ceiling is exceeded
+conversation_memories = ConversationStore(
+    # LangChain's ConversationBufferMemory stores conversation history as message objects
+    factory=lambda: langchain_memory.ConversationBufferMemory(return_messages=True),
+    max_conversations=int(os.environ.get("CONVERSATION_MAX", "1000")),
+    idle_ttl=float(os.environ.get("CONVERSATION_IDLE_TTL", str(2 * 3600))),
+    max_bytes=int(os.environ.get("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024))),
+    # The history summary of an expired or evicted conversation goes with it
+    on_evict=lambda conversation_id: history_manager.forget(conversation_id)
+)
+
+# Optional shared backend (CONVERSATION_BACKEND=sqlite|redis) so that every
+# gunicorn worker and node sees the same conversations. When configured, the
+# store above acts as a read-through cache in front of it.
+conversation_backend = create_backend_from_env(DEFAULT_DB_PATH)
+
+# Two-tier cache of click-to-translate results (memory LRU + SQLite)
+# Keys are normalized (language, word) pairs, values are translation strings
+translation_cache = TwoTierCache(
+    'translation_cache',
+    max_entries=int(os.environ.get("TRANSLATION_CACHE_SIZE", "10000")),
+    memory_ttl=float(os.environ.get("TRANSLATION_CACHE_TTL", str(24 * 3600))),
+    disk_ttl=float(os.environ.get("TRANSLATION_CACHE_DISK_TTL", str(30 * 24 * 3600)))
+)
+
+# Two-tier cache of per-sentence analysis sections
+# Keys are (language, sentence content hash), values are "## sentence" sections
+analysis_cache = TwoTierCache(
+    'analysis_cache',
+    max_entries=int(os.environ.get("ANALYSIS_CACHE_SIZE", "5000")),
+    memory_ttl=float(os.environ.get("ANALYSIS_CACHE_TTL", str(24 * 3600))),
+    disk_ttl=float(os.environ.get("ANALYSIS_CACHE_DISK_TTL", str(30 * 24 * 3600)))
+)
+
+# Local lexicon harvested from analyses and translations; confident entries
+# answer click-to-translate without a model call
+lexicon = Lexicon(os.environ.get("LEXICON_DB_PATH", DEFAULT_DB_PATH))
+
+# Local pre-filter that accepts messages needing no correction (known words,
+# verified sentences) without a model call, or only compares in shadow mode
+correction_filter = CorrectionFilter()
+
+# Single background worker used to pre-warm the translation cache
+_prewarm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="translation-prewarm")
+
+def _flight_timeout(endpoint):
+    """
+    How long a coalesced request waits for the leader: as long as the
+    leader's own call may take (admission wait, scheduler queue wait and
+    the endpoint's deadline), plus a second of slack
+    """
+    return admission.max_wait + scheduler.max_wait(endpoint) + policy(endpoint).deadline + 1.0
+
+# Concurrent identical upstream requests (e.g. a whole class opening the same
+# lesson) wait for one call and share its result
+welcome_flight = SingleFlight('welcome', timeout=_flight_timeout('welcome'))
+translation_flight = SingleFlight('translation', timeout=_flight_timeout('translation'))
+analysis_flight = SingleFlight('analysis', timeout=_flight_timeout('analysis'))
+
+# Translates the words of tutor replies in the background before they are
+# clicked (bounded queue, backs off while foreground requests are busy)
+pretranslator = Pretranslator(
+    translate=lambda words, language: translate_words(words, language),
+    is_cached=lambda word, language: translation_cache.contains(translation_cache_key(word, language))
+)
+
+# Upstream model calls run under per-endpoint resilience policies: a deadline
+# budget, a circuit breaker per path ("direct" Gemini API, "langchain"),
+# optional hedging and retries of rate-limited calls (see resilience.py)
+def _response_text(result):
+    # Different LangChain versions may return different response formats
+    return result.content if hasattr(result, 'content') else str(result)
+
+def _direct_call(api_key, prompt, **kwargs):
+    """Direct Gemini API call returning the stripped response text."""
+    return get_generative_model(api_key).generate_content(prompt, **kwargs).text.strip()
+
+def _langchain_call(api_key, messages, **model_kwargs):
+    """LangChain call returning the stripped response text."""
+    return _response_text(get_chat_model(api_key, **model_kwargs).invoke(messages)).strip()
+
+def _extract_json_object(text, description):
+    """
+    Parse the JSON object in a structured model response
+    
+    Markdown code fences or text around the object are tolerated.
+    
+    Raises:
+        ValueError: If the response does not contain a JSON object
+    """
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError(f"No JSON object in {description} response")
+    data = json.loads(text[start:end + 1])
+    if not isinstance(data, dict):
+        raise ValueError(f"{description.capitalize()} response is not a JSON object")
+    return data
+
+def _ask_model(endpoint, prompt, api_key, temperature, generation_config=None,
+               expected_completion=None):
+    """
+    Send a single prompt to the model under the endpoint's resilience policy
+    
+    The direct API is preferred and LangChain is the fallback path; a path
+    whose circuit breaker is open is skipped. The call is admitted against
+    the session and global token budgets first (see admission.py).
+    
+    Args:
+        endpoint (str): Endpoint name, also the LangChain client pool purpose
+        prompt (str): The prompt to send
+        api_key (str): Gemini API key
+        temperature (float): Sampling temperature for the LangChain path
+        generation_config (dict, optional): Generation config for the direct API call
+        expected_completion (int, optional): Completion tokens to reserve
+                                             (default: the endpoint's estimate)
+        
+    Returns:
+        str: The stripped response text
+        
+    Raises:
+        AdmissionRejected: If the token budget does not admit the call
+        Exception: If every path failed, or the endpoint's deadline passed
+    """
+    direct_kwargs = {'generation_config': generation_config} if generation_config else {}
+    reservation = admission.admit(endpoint, prompt, expected_completion)
+    response = ""
+    try:
+        response = policy(endpoint).call([
+            ('direct', lambda: _direct_call(api_key, prompt, **direct_kwargs)),
+            ('langchain', lambda: _langchain_call(api_key, [langchain_schema.SystemMessage(content=prompt)],
+                                                  purpose=endpoint, temperature=temperature)),
+        ])
+    finally:
+        admission.settle(reservation, response)
+    metrics.record_sizes(endpoint, len(prompt), len(response))
+    return response
+
+def get_conversation_memory(conversation_id):
+    """
+    Get the conversation memory for a user or session, creating it if needed
+    
+    Args:
+        conversation_id: The unique identifier for the conversation
+        
+    Returns:
+        ConversationBufferMemory: The memory holding this conversation's history
+    """
+    # Initialize a new memory instance for first-time users
+    memory = conversation_memories.get_or_create(conversation_id)
+    
+    # Without a shared backend the in-process memory is authoritative, and it
+    # also is while this process has writes for the conversation in flight
+    if conversation_backend is None or conversation_backend.has_pending(conversation_id):
+        return memory
+    
+    # Read-through cache: only reload when the shared copy has changed
+    current = conversation_backend.version(conversation_id)
+    if current == conversation_memories.version(conversation_id):
+        return memory
+    if current == conversation_backend.written_version(conversation_id) and memory.chat_memory.messages:
+        # The change is our own flushed write, which the cached memory already holds
+        conversation_memories.set_version(conversation_id, current)
+        return memory
+    
+    # Another worker changed the conversation (or we have never seen it)
+    version, turns = conversation_backend.load(conversation_id)
+    memory = langchain_memory.ConversationBufferMemory(return_messages=True)
+    for role, content in turns:
+        if role == "human":
+            memory.chat_memory.add_user_message(content)
+        else:
+            memory.chat_memory.add_ai_message(content)
+    conversation_memories.replace(conversation_id, memory, version)
+    logger.debug(f"Loaded {len(turns)} messages for {conversation_id} from shared backend")
+    return memory
+
+def save_exchange(conversation_id, message, response):
+    """
+    Commit one user message and tutor reply to a conversation's memory
+    
+    Args:
+        conversation_id: The unique identifier for the conversation
+        message (str): The user's message
+        response (str): The tutor's reply
+    """
+    with metrics.stage('save'):
+        get_conversation_memory(conversation_id).save_context({"input": message}, {"output": response})
+        # Re-measure the conversation so the store can enforce its memory ceiling
+        conversation_memories.touch(conversation_id)
+        
+        # Append the new turn to the shared backend (written in batches)
+        if conversation_backend is not None:
+            conversation_backend.append(conversation_id, [("human", message), ("ai", response)])
 
 def clear_conversation_memory(conversation_id):
     """
@@ -54,15 +278,72 @@ def clear_conversation_memory(conversation_id):
     Returns:
         bool: True if memory was cleared, False if conversation_id not found
     """
-    if conversation_id in conversation_memories:
-        # Remove the conversation memory
-        del conversation_memories[conversation_id]
+    history_manager.forget(conversation_id)
+    if conversation_backend is not None:
+        conversation_backend.clear(conversation_id)
+    if conversation_memories.pop(conversation_id):
+        # Removed the conversation memory
         logger.debug(f"Cleared conversation memory for conversation_id: {conversation_id}")
         return True
     else:
         logger.debug(f"No conversation memory found for conversation_id: {conversation_id}")
         return False
 
+# Predefined welcome messages used when the model cannot be reached
+_FALLBACK_WELCOME_MESSAGES = {
+    "Spanish": "¡Hola! Soy tu tutor de español. ¿Cómo estás hoy?",
+    "French": "Bonjour! Je suis votre tuteur de français. Comment allez-vous aujourd'hui?",
+    "German": "Hallo! Ich bin dein Deutschlehrer. Wie geht es dir heute?",
+    "Italian": "Ciao! Sono il tuo tutor di italiano. Come stai oggi?",
+    "Portuguese": "Olá! Sou seu tutor de português. Como você está hoje?",
+    "Russian": "Привет! Я твой репетитор по русскому языку. Как дела сегодня?",
+    "Japanese": "こんにちは！私はあなたの日本語チューターです。今日の調子はどうですか？",
+    "Chinese": "你好！我是你的中文导师。今天感觉如何？",
+    "Korean": "안녕하세요! 저는 당신의 한국어 튜터입니다. 오늘 기분이 어떠세요?"
+}
+
+def _fallback_welcome_message(language):
+    metrics.record_served("welcome", "fallback")
+    return _FALLBACK_WELCOME_MESSAGES.get(language, f"Hello! I'm your {language} tutor. How are you today?")
+
+def _welcome_prompt(language):
+    # Generate a different welcome message each time using the LLM
+    # This prompt is carefully constructed to:
+    # 1. Create a natural, native-sounding greeting
+    # 2. Keep the output simple for beginners to understand
+    # 3. Ensure consistent formatting of the response
+    return f"""You are a friendly language tutor.
+        Generate a short, friendly greeting in {language}.
+        Keep it simple and casual - something a native speaker would say when meeting someone.
+        The response should ONLY be the greeting in {language}, nothing else.
+        Maximum 15 words."""
+
+def _request_welcome_message(language, api_key):
+    """
+    Request a welcome message from the model
+    
+    Raises:
+        Exception: If the model could not be reached within the deadline
+    """
+    # Slightly randomized to get varied greetings
+    return _ask_model("welcome", _welcome_prompt(language), api_key, temperature=0.7)
+
+# Greetings generated ahead of time per language, topped up in the background
+welcome_pool = WelcomePool(lambda language: _request_welcome_message(language, GEMINI_API_KEY))
+
+def start_welcome_pool(languages):
+    """Fill the welcome pools of the given languages in the background."""
+    if WELCOME_POOL_ENABLED and GEMINI_API_KEY:
+        welcome_pool.start(languages)
+
+def _pooled_welcome_message(language):
+    greeting = welcome_pool.take(language)
+    if greeting is None:
+        logger.debug(f"Welcome pool for {language} is empty, using fallback welcome message")
+        return _fallback_welcome_message(language)
+    metrics.record_served("welcome", "pool")
+    return greeting
+
 def get_welcome_message(language):
     """
     Generate a welcome message in the specified language to start the conversation.
@@ -75,6 +356,10 @@ def get_welcome_message(language):
     1. Direct API call to Gemini (preferred for better results)
     2. LangChain integration as a fallback
     
+    When the welcome pool is enabled, greetings are generated ahead of time
+    in the background and a new chat just takes one from the pool; the
+    predefined messages are then only used while the pool is empty.
+    
     Args:
         language (str): The target language (e.g., "Spanish", "French")
     
@@ -87,86 +372,49 @@ def get_welcome_message(language):
     if not api_key:
         logger.warning("API key not found, using fallback welcome message")
         # Fallback welcome messages if API key not available
-        welcome_messages = {
-            "Spanish": "¡Hola! Soy tu tutor de español. ¿Cómo estás hoy?",
-            "French": "Bonjour! Je suis votre tuteur de français. Comment allez-vous aujourd'hui?",
-            "German": "Hallo! Ich bin dein Deutschlehrer. Wie geht es dir heute?",
-            "Italian": "Ciao! Sono il tuo tutor di italiano. Come stai oggi?",
-            "Portuguese": "Olá! Sou seu tutor de português. Como você está hoje?",
-            "Russian": "Привет! Я твой репетитор по русскому языку. Как дела сегодня?",
-            "Japanese": "こんにちは！私はあなたの日本語チューターです。今日の調子はどうですか？",
-            "Chinese": "你好！我是你的中文导师。今天感觉如何？",
-            "Korean": "안녕하세요! 저는 당신의 한국어 튜터입니다. 오늘 기분이 어떠세요?"
-        }
-        
-        return welcome_messages.get(language, f"Hello! I'm your {language} tutor. How are you today?")
+        return _fallback_welcome_message(language)
+    
+    # Serve a pre-generated greeting instantly
+    if WELCOME_POOL_ENABLED:
+        return _pooled_welcome_message(language)
     
     try:
-        # Generate a different welcome message each time using the LLM
-        # This prompt is carefully constructed to:
-        # 1. Create a natural, native-sounding greeting
-        # 2. Keep the output simple for beginners to understand
-        # 3. Ensure consistent formatting of the response
-        system_message = f"""You are a friendly language tutor.
-        Generate a short, friendly greeting in {language}.
-        Keep it simple and casual - something a native speaker would say when meeting someone.
-        The response should ONLY be the greeting in {language}, nothing else.
-        Maximum 15 words."""
-        
-        # IMPLEMENTATION APPROACH 1: Direct API call to Gemini
-        # This is the preferred method for simplicity and reliability
-        try:
-            # Configure the Gemini API with the user's API key
-            genai.configure(api_key=api_key)
-            # Use the newer Gemini 1.5 Flash model for faster responses
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            # Generate content and extract text from the response
-            response = model.generate_content(system_message).text
-            logger.info("Used direct API call for welcome message")
-            # Clean up the response by removing extra whitespace
-            return response.strip()
-            
-        except Exception as e:
-            # Log failure for debugging purposes
-            logger.warning(f"Direct API failed for welcome message: {str(e)}")
-            
-            # IMPLEMENTATION APPROACH 2: LangChain integration
-            # This is used as a fallback if the direct API call fails
-            # LangChain provides more structured handling of prompts and responses
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash", 
-                api_key=api_key,
-                temperature=0.7  # Slightly randomized to get varied greetings
-            )
-            
-            # Create a system message that the model will respond to
-            result = llm.invoke([SystemMessage(content=system_message)])
-            
-            # LangChain response handling: extract content from the response object
-            # Different LangChain versions may return different response formats
-            if hasattr(result, 'content'):
-                return result.content.strip()
-            else:
-                # Fallback to string representation if content attribute isn't available
-                return str(result).strip()
+        # Students starting a lesson at the same time share one greeting request
+        return welcome_flight.do(language.strip().casefold(), _request_welcome_message,
+                                 language, api_key)
             
     except Exception as e:
         logger.error(f"Error generating welcome message: {str(e)}")
         # Fallback to default messages on error
-        welcome_messages = {
-            "Spanish": "¡Hola! Soy tu tutor de español. ¿Cómo estás hoy?",
-            "French": "Bonjour! Je suis votre tuteur de français. Comment allez-vous aujourd'hui?",
-            "German": "Hallo! Ich bin dein Deutschlehrer. Wie geht es dir heute?",
-            "Italian": "Ciao! Sono il tuo tutor di italiano. Come stai oggi?",
-            "Portuguese": "Olá! Sou seu tutor de português. Como você está hoje?",
-            "Russian": "Привет! Я твой репетитор по русскому языку. Как дела сегодня?",
-            "Japanese": "こんにちは！私はあなたの日本語チューターです。今日の調子はどうですか？",
-            "Chinese": "你好！我是你的中文导师。今天感觉如何？",
-            "Korean": "안녕하세요! 저는 당신의 한국어 튜터입니다. 오늘 기분이 어떠세요?"
-        }
+        return _fallback_welcome_message(language)
+
+
+def _correction_prompt(message, language):
+    return f"""You are a language tutor. Correct this {language} message from a learner: "{message}"
+        
+        If the message is in English but should be in {language}, translate it.
+        If the message is in {language} but has errors, correct them.
+        Provide ONLY the corrected text with no explanations.
+        If the message is already perfect, return the exact same message.
         
-        return welcome_messages.get(language, f"Hello! I'm your {language} tutor. How are you today?")
+        For example:
+        - Input: "Yo soy un estudiante de español y quero aprender"
+        - Output: "Yo soy un estudiante de español y quiero aprender"
+        """
+
+def _accepted_correction(message, corrected):
+    """The model's correction, or the original message if it is empty or suspiciously long."""
+    if not corrected or len(corrected) > len(message) * 2:
+        return message
+    return corrected
 
+def _fast_path_verdict(message, language):
+    """Pre-filter verdict for a message (None: ask the model)."""
+    verdict = correction_filter.check(message, language)
+    if verdict is not None and correction_filter.active:
+        logger.debug(f"Correction fast path accepted message ({verdict})")
+        metrics.record_served("correction", "fast-path")
+    return verdict
 
 def correct_user_message(message, language):
     """
@@ -184,6 +432,9 @@ def correct_user_message(message, language):
     - Direct API call to Gemini (primary method)
     - LangChain integration (fallback method)
     
+    Messages the local pre-filter judges correct with high confidence are
+    returned as-is without a model call (see correction_filter.py).
+    
     NOTE: This function is critical for the language learning experience as it provides
     immediate feedback on the user's message quality.
     
@@ -200,61 +451,255 @@ def correct_user_message(message, language):
     if not api_key or not message:
         return message
     
+    verdict = _fast_path_verdict(message, language)
+    if verdict is not None and correction_filter.active:
+        return message
+    
     try:
         # Prompt for correcting user input
-        system_message = f"""You are a language tutor. Correct this {language} message from a learner: "{message}"
+        system_message = _correction_prompt(message, language)
         
-        If the message is in English but should be in {language}, translate it.
-        If the message is in {language} but has errors, correct them.
-        Provide ONLY the corrected text with no explanations.
-        If the message is already perfect, return the exact same message.
+        # Low temperature for more predictable corrections
+        corrected = _ask_model("correction", system_message, api_key, temperature=0.1)
         
-        For example:
-        - Input: "Yo soy un estudiante de español y quero aprender"
-        - Output: "Yo soy un estudiante de español y quiero aprender"
-        """
+        # If the result is empty or too long, return the original
+        if _accepted_correction(message, corrected) is message:
+            return message
         
-        # Try direct API call first
-        try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            result = model.generate_content(system_message).text
-            logger.info("Used direct API call for message correction")
-            
-            # If the result is empty or too long, return the original
-            if not result or len(result) > len(message) * 2:
-                return message
-                
-            return result.strip()
-            
-        except Exception as e:
-            logger.warning(f"Direct API failed for message correction: {str(e)}")
-            
-            # Fallback to LangChain
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash", 
-                api_key=api_key,
-                temperature=0.1  # Low temperature for more predictable corrections
-            )
-            
-            result = llm.invoke([SystemMessage(content=system_message)])
-            
-            if hasattr(result, 'content'):
-                corrected = result.content.strip()
-            else:
-                corrected = str(result).strip()
-                
-            # If the result is empty or too long, return the original
-            if not corrected or len(corrected) > len(message) * 2:
-                return message
-                
-            return corrected
+        correction_filter.learn(message, corrected, language, verdict)
+        return corrected
             
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error correcting message: {str(e)}")
+        metrics.record_served("correction", "fallback")
         return message  # Return original message on error
 
-def generate_response(message, language, vocabulary=None):
+def _build_tutor_system_message(language, vocabulary=None):
+    """
+    Build the tutor system prompt, restricted to a vocabulary list when one is given
+    
+    Args:
+        language (str): The target language for conversation (e.g., "Spanish")
+        vocabulary (list, optional): List of words/phrases to restrict responses to
+        
+    Returns:
+        str: The system prompt for the tutor conversation
+    """
+    # PROMPT ENGINEERING FOR LANGUAGE TUTORING
+    # =======================================
+    # Two different system prompts are used based on whether a vocabulary list is provided:
+    # 1. Restricted vocabulary mode: Forces the AI to use only words from the user's vocabulary list
+    # 2. General beginner mode: Uses simpler language but without specific word restrictions
+    
+    if vocabulary and len(vocabulary) > 0:
+        # VOCABULARY-RESTRICTED MODE
+        # This specialized prompt restricts the AI to using only words from the user's vocabulary list
+        # This is a key feature that allows users to practice with specific word sets they're learning
+        system_message = f"""You are an engaging, conversational language tutor helping someone learn {language}.
+        
+        CRITICAL VOCABULARY RESTRICTIONS:
+        1. STRICTLY limit your vocabulary to ONLY these words/phrases: {', '.join(vocabulary)}.
+        2. If you absolutely need words outside this list, use only the most basic, common words a beginner would know.
+        3. Prioritize simple sentence structures over complex ones.
+        4. Use extremely basic grammar patterns that beginner students would understand.
+        5. Repeat vocabulary from the list frequently to reinforce learning.
+        
+        IMPORTANT CONVERSATION INSTRUCTIONS:
+        1. Always respond in {language}.
+        2. Keep responses very short (2-3 sentences only).
+        3. Use natural but extremely simplified language.
+        4. Always end with a simple question to keep the conversation going.
+        5. Avoid idiomatic expressions or complex conjugations.
+        
+        Your goal is to create a comfortable, basic conversation that builds confidence with limited vocabulary.
+        """
+    else:
+        # GENERAL BEGINNER MODE
+        # This prompt doesn't restrict specific vocabulary but ensures language is kept simple
+        # and appropriate for beginning language learners (A1-A2 level)
+        system_message = f"""You are an engaging, conversational language tutor helping someone learn {language}.
+        
+        IMPORTANT INSTRUCTIONS:
+        1. Always respond in {language}.
+        2. Use only basic, common vocabulary suitable for beginners (A1-A2 level).
+        3. Keep responses very short (2-3 sentences only).
+        4. Use simple sentence structures with basic grammar patterns.
+        5. Always end with a question to maintain conversation.
+        6. Avoid complex conjugations, idioms, or advanced vocabulary.
+        
+        Your goal is to make the conversation accessible for beginners while being engaging.
+        """
+    
+    return system_message
+
+def _summarize_conversation(previous_summary, messages):
+    """
+    Fold older conversation turns into the running summary of a conversation
+    
+    Called on a background thread by the history manager.
+    
+    Args:
+        previous_summary (str): The current summary (may be empty)
+        messages (list): Message objects not yet covered by the summary
+        
+    Returns:
+        str: The updated summary
+    """
+    transcript = "\n".join(
+        f"{'Learner' if msg.type == 'human' else 'Tutor'}: {msg.content}" for msg in messages
+    )
+    prompt = f"""You keep a running summary of a language tutoring conversation.
+    
+    Current summary: {previous_summary or "(none)"}
+    
+    New messages:
+    {transcript}
+    
+    Write an updated summary of at most 80 words in English. Keep the topics discussed,
+    facts the learner shared about themselves, and any recurring mistakes.
+    Provide ONLY the summary."""
+    
+    reservation = admission.admit("summary", prompt)
+    summary = ""
+    try:
+        summary = policy("summary").call([('direct', lambda: _direct_call(GEMINI_API_KEY, prompt))])
+    finally:
+        admission.settle(reservation, summary)
+    return summary
+
+# Keeps each prompt's history within a token budget by folding older turns
+# into a rolling summary that is updated in the background
+history_manager = HistoryManager(_summarize_conversation)
+
+# Picks a bounded, per-turn subset of large vocabulary lists for restricted mode
+vocabulary_selector = VocabularySelector()
+
+def _select_vocabulary(vocabulary, message, memory, conversation_id):
+    """
+    Reduce a vocabulary list to this turn's subset
+    
+    Words related to the message and the last few turns are kept, the rest of
+    the budget rotates through the list.
+    
+    Args:
+        vocabulary (list): The full vocabulary list (may be None)
+        message (str): The user's new message
+        memory (ConversationBufferMemory): The conversation's memory
+        conversation_id: The conversation's identifier
+        
+    Returns:
+        list: The words to put in the prompt (the list itself if it fits the budget)
+    """
+    if not vocabulary:
+        return vocabulary
+    recent = [str(msg.content) for msg in memory.chat_memory.messages[-4:]]
+    return vocabulary_selector.select(conversation_id, vocabulary, message, recent)
+
+def _build_chat_messages(system_message, memory, message, conversation_id):
+    """
+    Assemble the system prompt, conversation history and new user message
+    into LangChain message objects
+    
+    The history is windowed to the configured token budget: recent turns are
+    sent verbatim and older turns are represented by a running summary that
+    is appended to the system prompt.
+    
+    Args:
+        system_message (str): The tutor system prompt
+        memory (ConversationBufferMemory): The conversation's memory
+        message (str): The user's new message
+        conversation_id: The conversation's identifier
+        
+    Returns:
+        list: Message objects ready to send to the chat model
+    """
+    # Get chat history and select what fits the token budget
+    full_history = memory.load_memory_variables({}).get("history", [])
+    summary, history = history_manager.window(conversation_id, full_history)
+    if summary:
+        system_message = f"{system_message}\n\nSummary of the earlier conversation: {summary}"
+    
+    # Log the prompt size with and without windowing
+    base_tokens = estimate_tokens(system_message) + estimate_tokens(message)
+    full_tokens = base_tokens + sum(estimate_tokens(str(msg.content)) for msg in full_history)
+    sent_tokens = base_tokens + sum(estimate_tokens(str(msg.content)) for msg in history)
+    logger.info(f"Prompt tokens for {conversation_id}: {full_tokens} with full history, {sent_tokens} sent")
+    
+    # Create proper message objects for the API
+    proper_messages = []
+    
+    # Add system message
+    proper_messages.append(langchain_schema.SystemMessage(content=system_message))
+    
+    # Add history messages if any
+    if history:
+        proper_messages.extend(history)
+    
+    # Add the current user message
+    proper_messages.append(langchain_schema.HumanMessage(content=message))
+    
+    return proper_messages
+
+def _prepare_chat_turn(message, language, vocabulary, conversation_id):
+    """
+    Load a conversation's memory and assemble the prompt of its next turn
+    
+    Returns:
+        list: Message objects (system prompt, selected history, new message)
+    """
+    with metrics.stage('memory'):
+        memory = get_conversation_memory(conversation_id)
+    
+    # Build the tutor prompt (restricted to the vocabulary list if provided)
+    # together with the conversation history and the new message
+    with metrics.stage('prompt'):
+        vocabulary = _select_vocabulary(vocabulary, message, memory, conversation_id)
+        system_message = _build_tutor_system_message(language, vocabulary)
+        return _build_chat_messages(system_message, memory, message, conversation_id)
+
+def _prompt_size(messages):
+    return sum(len(msg.content) for msg in messages)
+
+def _prompt_text(messages):
+    return "\n".join(str(msg.content) for msg in messages)
+
+def _transcript_prompt(system_message, history, message):
+    """
+    Flatten a chat turn into a single prompt string for the direct API
+    
+    Args:
+        system_message (str): The system prompt
+        history (list): Message objects of the conversation so far
+        message (str): The learner's new message
+        
+    Returns:
+        str: The system prompt, a transcript of the history and the new message
+    """
+    transcript = "\n".join(
+        f"{'Learner' if msg.type == 'human' else 'Tutor'}: {msg.content}" for msg in history
+    )
+    prompt = system_message
+    if transcript:
+        prompt += f"\n\nConversation so far:\n{transcript}"
+    return prompt + f'\n\nNew message from the learner: "{message}"'
+
+def _direct_chat_prompt(proper_messages):
+    """The prompt of a prepared chat turn, history included, as one string for the direct API."""
+    return _transcript_prompt(proper_messages[0].content, proper_messages[1:-1], proper_messages[-1].content)
+
+def _get_conversation_llm(api_key):
+    """Borrow the shared chat model used for tutor conversations."""
+    return get_chat_model(
+        api_key,
+        purpose="conversation",
+        temperature=0.7,
+        top_p=0.95,
+        max_tokens=1024,
+    )
+
+def generate_response(message, language, vocabulary=None, conversation_id=None, save_to_memory=True):
     """
     Generate a response from Gemini based on the user's message
     in the specified language, restricted to the provided vocabulary.
@@ -279,6 +724,12 @@ def generate_response(message, language, vocabulary=None):
         language (str): The target language for conversation (e.g., "Spanish")
         vocabulary (list, optional): List of words/phrases to restrict responses to.
                                     If provided, the AI will only use these words.
+        conversation_id (str, optional): Conversation to continue. Defaults to the
+                                         current session's ID, so pass it explicitly
+                                         when calling outside a request context.
+        save_to_memory (bool): Whether to commit this exchange to conversation memory.
+                               Callers that may discard the reply (e.g. speculative
+                               generation) pass False and use save_exchange() later.
     
     Returns:
         str: AI-generated conversational response in the target language
@@ -300,131 +751,35 @@ def generate_response(message, language, vocabulary=None):
         
         # Get a unique conversation ID from session
         # If no session ID exists, use 'guest' as a fallback identifier
-        conversation_id = session.get('session_id', 'guest')
-        
-        # Create or retrieve conversation memory for this user
-        # Each conversation gets its own memory instance to maintain separate chat contexts
-        if conversation_id not in conversation_memories:
-            # Initialize a new memory instance for first-time users
-            # LangChain's ConversationBufferMemory stores conversation history as message objects
-            conversation_memories[conversation_id] = ConversationBufferMemory(return_messages=True)
-        
-        # Get the memory object for this conversation to use later
-        memory = conversation_memories[conversation_id]
-        
-        # PROMPT ENGINEERING FOR LANGUAGE TUTORING
-        # =======================================
-        # Two different system prompts are used based on whether a vocabulary list is provided:
-        # 1. Restricted vocabulary mode: Forces the AI to use only words from the user's vocabulary list
-        # 2. General beginner mode: Uses simpler language but without specific word restrictions
-        
-        if vocabulary and len(vocabulary) > 0:
-            # VOCABULARY-RESTRICTED MODE
-            # This specialized prompt restricts the AI to using only words from the user's vocabulary list
-            # This is a key feature that allows users to practice with specific word sets they're learning
-            system_message = f"""You are an engaging, conversational language tutor helping someone learn {language}.
-            
-            CRITICAL VOCABULARY RESTRICTIONS:
-            1. STRICTLY limit your vocabulary to ONLY these words/phrases: {', '.join(vocabulary)}.
-            2. If you absolutely need words outside this list, use only the most basic, common words a beginner would know.
-            3. Prioritize simple sentence structures over complex ones.
-            4. Use extremely basic grammar patterns that beginner students would understand.
-            5. Repeat vocabulary from the list frequently to reinforce learning.
-            
-            IMPORTANT CONVERSATION INSTRUCTIONS:
-            1. Always respond in {language}.
-            2. Keep responses very short (2-3 sentences only).
-            3. Use natural but extremely simplified language.
-            4. Always end with a simple question to keep the conversation going.
-            5. Avoid idiomatic expressions or complex conjugations.
-            
-            Your goal is to create a comfortable, basic conversation that builds confidence with limited vocabulary.
-            """
-        else:
-            # GENERAL BEGINNER MODE
-            # This prompt doesn't restrict specific vocabulary but ensures language is kept simple
-            # and appropriate for beginning language learners (A1-A2 level)
-            system_message = f"""You are an engaging, conversational language tutor helping someone learn {language}.
-            
-            IMPORTANT INSTRUCTIONS:
-            1. Always respond in {language}.
-            2. Use only basic, common vocabulary suitable for beginners (A1-A2 level).
-            3. Keep responses very short (2-3 sentences only).
-            4. Use simple sentence structures with basic grammar patterns.
-            5. Always end with a question to maintain conversation.
-            6. Avoid complex conjugations, idioms, or advanced vocabulary.
-            
-            Your goal is to make the conversation accessible for beginners while being engaging.
-            """
-        
-        # Initialize the language model with appropriate parameters
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash", 
-            api_key=api_key,
-            temperature=0.7,
-            top_p=0.95,
-            max_tokens=1024,
-        )
-        
-        # Get chat history
-        history = memory.load_memory_variables({}).get("history", [])
-        
-        # Instead of using message objects directly, we'll build a simple list
-        # Create a list of message dictionaries for the API
-        messages = [
-            {"role": "system", "content": system_message}
-        ]
-        
-        # Add history messages if any
-        if history:
-            for msg in history:
-                if hasattr(msg, 'type') and hasattr(msg, 'content'):
-                    role = "user" if msg.type == "human" else "assistant"
-                    messages.append({"role": role, "content": msg.content})
+        if conversation_id is None:
+            conversation_id = session.get('session_id', 'guest')
         
-        # Add the current user message
-        messages.append({"role": "user", "content": message})
+        # Create or retrieve conversation memory for this user (each conversation
+        # keeps its own context) and build the prompt from it
+        proper_messages = _prepare_chat_turn(message, language, vocabulary, conversation_id)
         
         logger.debug(f"Sending direct message to Gemini for language: {language}")
         
-        # Create proper message objects for the API
-        proper_messages = []
-        
-        # Add system message
-        proper_messages.append(SystemMessage(content=system_message))
-        
-        # Add history messages if any
-        if history:
-            proper_messages.extend(history)
-        
-        # Add the current user message
-        proper_messages.append(HumanMessage(content=message))
-        
-        # Make a direct call to the model with the proper message objects
+        # The shared conversation model with the full message objects is preferred;
+        # the backup sends the same turn flattened into one prompt through the direct API
+        reservation = admission.admit("conversation", _prompt_text(proper_messages))
         try:
-            result = llm.invoke(proper_messages)
-            
-            # Extract the content from the result
-            if hasattr(result, 'content'):
-                response = result.content
-            else:
-                response = str(result)
-                
+            response = policy("conversation").call([
+                ('langchain', lambda: _response_text(_get_conversation_llm(api_key).invoke(proper_messages))),
+                ('direct', lambda: _direct_call(api_key, _direct_chat_prompt(proper_messages))),
+            ])
+            admission.settle(reservation, response)
+            metrics.record_sizes("conversation", _prompt_size(proper_messages), len(response))
         except Exception as e:
-            logger.error(f"Error in direct API call: {str(e)}")
-            # Try backup approach with simplified parameters
-            try:
-                # Simplified approach without using message objects
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel('gemini-1.5-flash')
-                response = model.generate_content(message).text
-                logger.info("Used fallback direct API call method")
-            except Exception as e2:
-                logger.error(f"Both API approaches failed: {str(e2)}")
-                response = f"Error: Could not generate response. {str(e)}"
-        
-        # Save current exchange to memory
-        memory.save_context({"input": message}, {"output": response})
+            logger.error(f"Both API approaches failed: {str(e)}")
+            admission.settle(reservation, "")
+            metrics.record_served("conversation", "fallback")
+            response = f"Error: Could not generate response. {str(e)}"
+        
+        # Save current exchange to memory and translate the reply's words ahead of clicks
+        if save_to_memory:
+            save_exchange(conversation_id, message, response)
+            pretranslate_reply(response, language)
         
         # Log and return the response
         if response:
@@ -439,82 +794,683 @@ def generate_response(message, language, vocabulary=None):
             logger.error("Empty response received from language model")
             return "Sorry, I couldn't generate a response. Please try again."
     
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error generating response with LangChain: {str(e)}")
         if "invalid api key" in str(e).lower():
             return "Error: The API key appears to be invalid. Please contact the administrator."
         return f"Error: {str(e)}"
 
-def translate_single_word(word, language):
+# Marks the end of a stream read ahead of the client
+_END_OF_STREAM = object()
+
+def _read_ahead(endpoint, chunks):
     """
-    Translate a single word or short phrase from the specified language to English.
+    Read a streamed model response ahead of the client
     
-    This function is used for the click-to-translate feature that allows users
-    to get instant translations of individual words within chat messages. It provides
-    not just the translation but also a brief grammatical explanation.
+    The chunks are read in a worker thread that holds the endpoint's upstream
+    slot (see scheduler.py) only until the model has finished, and are
+    buffered for the caller, so a client that reads slowly does not keep
+    the slot from other requests. Closing the returned generator stops the
+    read at the next chunk.
     
-    The response format is specifically designed to be concise and educational,
-    containing the English translation and a very brief explanation of the word's 
-    meaning or grammatical role.
+    Args:
+        endpoint (str): Endpoint name, which selects the scheduler class
+        chunks (generator): The model's output, consumed in the worker thread
+        
+    Yields:
+        Consecutive chunks, as the worker has read them
+        
+    Raises:
+        Exception: Whatever waiting for the slot or reading the chunks raised
+    """
+    buffer = queue.Queue()
+    stopped = threading.Event()
     
-    Two implementation methods are used:
-    1. Direct Gemini API call (primary method)
-    2. LangChain-based call (fallback method)
+    def read():
+        try:
+            with scheduler.slot(endpoint), closing(chunks):
+                for chunk in chunks:
+                    if stopped.is_set():
+                        break
+                    buffer.put((chunk, None))
+        except Exception as e:
+            buffer.put((_END_OF_STREAM, e))
+        else:
+            buffer.put((_END_OF_STREAM, None))
+    
+    # The copied context carries the request's metrics and admission session
+    threading.Thread(target=contextvars.copy_context().run, args=(read,),
+                     name=f"{endpoint}-stream", daemon=True).start()
+    try:
+        while True:
+            chunk, error = buffer.get()
+            if chunk is _END_OF_STREAM:
+                if error is not None:
+                    raise error
+                return
+            yield chunk
+    finally:
+        stopped.set()
+
+def stream_response(message, language, vocabulary=None, conversation_id=None):
+    """
+    Stream a tutor response chunk by chunk as the model generates it.
+    
+    This is the streaming counterpart of generate_response(). It uses the same
+    prompt and conversation memory, but yields text as soon as the model produces
+    it so the client can render the reply progressively. The exchange is only
+    committed to conversation memory once the full reply has been received.
+    
+    The LangChain .stream() path is tried first, falling back to the direct
+    generate_content(stream=True) call (with the same history, flattened into one
+    prompt) if it fails before producing any output. The model's output is read
+    ahead of the client (see _read_ahead()), so the upstream slot is released as
+    soon as the model has finished, however slowly the client reads.
     
     Args:
-        word (str): The word or short phrase to translate (in the target language)
-        language (str): The source language (e.g., "Spanish")
+        message (str): The user's message in the target language
+        language (str): The target language for conversation (e.g., "Spanish")
+        vocabulary (list, optional): List of words/phrases to restrict responses to
+        conversation_id (str, optional): Conversation to continue. Defaults to the
+                                         current session's ID.
     
-    Returns:
-        str: The English translation with brief explanation in the format:
-             "Translation: [english] - [brief explanation]"
+    Yields:
+        str: Consecutive chunks of the response text (or a single error message)
     """
     api_key = GEMINI_API_KEY
     if not api_key:
         logger.error("Gemini API key not found")
-        return "Error: API key not configured. Please contact the administrator."
+        yield "Error: API key not configured. Please contact the administrator."
+        return
+    
+    if conversation_id is None:
+        conversation_id = session.get('session_id', 'guest')
+    proper_messages = _prepare_chat_turn(message, language, vocabulary, conversation_id)
+    reservation = admission.admit("conversation", _prompt_text(proper_messages))
+    
+    received = []
+    started = time.perf_counter()
+    
+    def upstream():
+        # IMPLEMENTATION APPROACH 1: LangChain streaming with full history
+        # (skipped while its circuit breaker is open)
+        try:
+            if not breaker("conversation", 'langchain').allow():
+                raise RuntimeError("LangChain circuit breaker is open")
+            metrics.record_attempt("conversation", "langchain")
+            try:
+                for chunk in _get_conversation_llm(api_key).stream(proper_messages):
+                    text = _response_text(chunk)
+                    if text:
+                        if not received:
+                            metrics.observe_stage('first-chunk', time.perf_counter() - started)
+                        received.append(text)
+                        yield text
+            except Exception:
+                breaker("conversation", 'langchain').failure()
+                raise
+            breaker("conversation", 'langchain').success()
+            metrics.record_served("conversation", "langchain")
+            logger.info("Used LangChain streaming for response")
+        except Exception as e:
+            # Once text has been passed on we cannot switch paths
+            if received:
+                raise
+            logger.error(f"Error in streaming API call: {str(e)}")
+        
+            # IMPLEMENTATION APPROACH 2: Direct streaming call with the history
+            # flattened into one prompt (skipped while its circuit breaker is open)
+            if not breaker("conversation", 'direct').allow():
+                raise RuntimeError("Direct circuit breaker is open")
+            metrics.record_attempt("conversation", "direct")
+            try:
+                model = get_generative_model(api_key)
+                for chunk in model.generate_content(_direct_chat_prompt(proper_messages), stream=True):
+                    text = chunk.text
+                    if text:
+                        if not received:
+                            metrics.observe_stage('first-chunk', time.perf_counter() - started)
+                        received.append(text)
+                        yield text
+            except Exception:
+                breaker("conversation", 'direct').failure()
+                raise
+            breaker("conversation", 'direct').success()
+            metrics.record_served("conversation", "direct")
+            logger.info("Used fallback direct streaming method")
     
+    parts = []
     try:
-        # Create a direct and simple prompt for translation
-        system_message = f"""Translate this {language} word or phrase to English: '{word}'
+        for text in _read_ahead("conversation", upstream()):
+            parts.append(text)
+            yield text
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        if not parts:
+            metrics.record_served("conversation", "fallback")
+            yield f"Error: Could not generate response. {str(e)}"
+        return
+    finally:
+        # Also meters a stream the client stopped reading early
+        admission.settle(reservation, ''.join(received))
+    metrics.observe_stage('upstream-conversation', time.perf_counter() - started)
+    
+    response = ''.join(parts).strip()
+    if not response:
+        logger.error("Empty response received from language model")
+        yield "Sorry, I couldn't generate a response. Please try again."
+        return
+    
+    # Commit the completed exchange to memory
+    save_exchange(conversation_id, message, response)
+    pretranslate_reply(response, language)
+
+# -------------------------------------------------------------------------
+# Combined Correction + Reply
+# -------------------------------------------------------------------------
+# One structured-output call returns both the corrected message and the
+# tutor's reply, instead of a correction call followed by a reply call with
+# two full prompts. Used by chat_pipeline.py when CHAT_MODE=combined; any
+# failure (including malformed JSON) returns None so the caller falls back
+# to the two-call path.
+# -------------------------------------------------------------------------
+
+def _combined_instructions(language):
+    return f"""
         
-        Provide only:
-        1. The English translation (1-3 words)
-        2. A very brief explanation (5-10 words)
+        Before replying, correct the learner's new message:
+        If it is in English but should be in {language}, translate it.
+        If it is in {language} but has errors, correct them.
+        If it is already perfect, keep the exact same message.
+        Then reply to the corrected message as instructed above.
         
-        Format: "Translation: [english] - [brief explanation]"
-        Example: "Translation: house - a building for human habitation"
-        Keep it very concise."""
+        Respond with ONLY a JSON object with the keys "corrected" and "reply":
+        {{"corrected": "the corrected message", "reply": "your reply"}}
+        """
+
+def _combined_request(proper_messages, message, language):
+    """
+    Build the combined request from the prompt of a chat turn
+    
+    Returns:
+        tuple: (prompt string for the direct API, message objects for LangChain)
+    """
+    system_message = proper_messages[0].content + _combined_instructions(language)
+    history = proper_messages[1:-1]
+    prompt = _transcript_prompt(system_message, history, message)
+    return prompt, ([langchain_schema.SystemMessage(content=system_message)] + history +
+                    [langchain_schema.HumanMessage(content=message)])
+
+def _parse_combined_response(text):
+    """
+    Parse a combined correction + reply response
+    
+    Returns:
+        tuple: (corrected message, possibly empty; tutor reply)
         
-        # Try using direct API first for fast response
-        try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(system_message).text
-            logger.info("Used direct API call for word translation")
-            return response.strip()
-            
-        except Exception as direct_err:
-            logger.warning(f"Direct API call failed for translation: {str(direct_err)}")
-            
-            # Fall back to LangChain implementation
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash", 
-                api_key=api_key,
-                temperature=0.1  # Lower temperature for more predictable translation
-            )
-            
-            result = llm.invoke([SystemMessage(content=system_message)])
-            
-            # Extract the result from the response
-            if hasattr(result, 'content'):
-                return result.content.strip()
-            else:
-                return str(result).strip()
+    Raises:
+        ValueError: If the response has no JSON object or no reply
+    """
+    data = _extract_json_object(text, "combined correction")
+    reply = data.get('reply')
+    if not isinstance(reply, str) or not reply.strip():
+        raise ValueError("Combined correction response has no reply")
+    corrected = data.get('corrected')
+    return (corrected.strip() if isinstance(corrected, str) else ''), reply.strip()
+
+def _finish_combined_turn(message, corrected, response, language, conversation_id, save_to_memory, verdict):
+    """Apply the correction safety rule, learn from the correction and commit the exchange."""
+    accepted = _accepted_correction(message, corrected)
+    if accepted is not message:
+        correction_filter.learn(message, accepted, language, verdict)
+    if save_to_memory:
+        save_exchange(conversation_id, accepted, response)
+        pretranslate_reply(response, language)
+    return accepted, response
+
+def generate_combined_response(message, language, vocabulary=None, conversation_id=None, save_to_memory=True):
+    """
+    Correct a message and generate the tutor's reply with a single model call
+    
+    The model returns JSON with the corrected message and the reply. The
+    correction is subject to the same rules as correct_user_message(): the
+    local fast path may accept the message without asking the model (then
+    only the reply is generated), and corrections more than twice as long
+    as the message are discarded.
+    
+    Args:
+        message (str): The user's message in the target language
+        language (str): The target language for conversation (e.g., "Spanish")
+        vocabulary (list, optional): List of words/phrases to restrict the reply to
+        conversation_id (str, optional): Conversation to continue. Defaults to the
+                                         current session's ID.
+        save_to_memory (bool): Whether to commit this exchange to conversation memory
+        
+    Returns:
+        tuple: (corrected message, reply), or None if the combined call failed
+               and the caller should use separate calls
+        
+    Raises:
+        AdmissionRejected: If the token budget does not admit the call
+    """
+    api_key = GEMINI_API_KEY
+    if not api_key or not message:
+        return None
+    if conversation_id is None:
+        conversation_id = session.get('session_id', 'guest')
+    
+    verdict = _fast_path_verdict(message, language)
+    if verdict is not None and correction_filter.active:
+        return message, generate_response(message, language, vocabulary, conversation_id=conversation_id,
+                                          save_to_memory=save_to_memory)
+    
+    proper_messages = _prepare_chat_turn(message, language, vocabulary, conversation_id)
+    prompt, messages = _combined_request(proper_messages, message, language)
+    
+    reservation = admission.admit("combined", prompt)
+    text = ""
+    try:
+        text = policy("combined").call([
+            ('direct', lambda: _direct_call(api_key, prompt,
+                                            generation_config={"response_mime_type": "application/json"})),
+            ('langchain', lambda: _response_text(_get_conversation_llm(api_key).invoke(messages)).strip()),
+        ])
+        corrected, response = _parse_combined_response(text)
+    except Exception as e:
+        logger.warning(f"Combined correction and reply failed, falling back to separate calls: {str(e)}")
+        return None
+    finally:
+        admission.settle(reservation, text)
+    metrics.record_sizes("combined", len(prompt), len(text))
+    
+    return _finish_combined_turn(message, corrected, response, language, conversation_id,
+                                 save_to_memory, verdict)
+
+def _translation_prompt(word, language):
+    return f"""Translate this {language} word or phrase to English: '{word}'
+        
+        Provide only:
+        1. The English translation (1-3 words)
+        2. A very brief explanation (5-10 words)
+        
+        Format: "Translation: [english] - [brief explanation]"
+        Example: "Translation: house - a building for human habitation"
+        Keep it very concise."""
+
+def _lexicon_translation(word, language):
+    """Answer a word translation from the lexicon, or None if it has no confident entry."""
+    if not LEXICON_ENABLED:
+        return None
+    entry = lexicon.lookup(word, language)
+    if entry is None:
+        return None
+    logger.debug(f"Answered '{word}' from the lexicon ({entry['source']}, confidence {entry['confidence']:.2f})")
+    metrics.record_served("translation", "lexicon")
+    return format_entry(entry)
+
+def _store_translations(results, language):
+    """Cache and harvest (cache key, word, translation) results, writing each store once."""
+    results = [(key, word, translation) for key, word, translation in results if translation]
+    translation_cache.set_many((key, translation) for key, _, translation in results)
+    if LEXICON_ENABLED and results:
+        lexicon.harvest_translations([(word, translation) for _, word, translation in results], language)
+
+def _harvest_analysis(analysis, language):
+    if LEXICON_ENABLED and analysis:
+        lexicon.harvest_analysis(analysis, language)
+
+def _request_translation(word, language, api_key, cache_key):
+    """
+    Request a word translation from the model and cache it
+    
+    Raises:
+        Exception: If the model could not be reached within the deadline
+    """
+    # Create a direct and simple prompt for translation
+    system_message = _translation_prompt(word, language)
+    
+    # Lower temperature for more predictable translation
+    translation = _ask_model("translation", system_message, api_key, temperature=0.1)
+    
+    # Only successful translations are cached
+    _store_translations([(cache_key, word, translation)], language)
+    return translation
+
+def _translation_error(word):
+    return f"Error translating '{word}'. Please try again."
+
+def is_translation_error(translation):
+    """Whether a translation result is an error message (which callers must not keep)."""
+    return not translation or translation.startswith("Error")
+
+def translate_single_word(word, language):
+    """
+    Translate a single word or short phrase from the specified language to English.
+    
+    This function is used for the click-to-translate feature that allows users
+    to get instant translations of individual words within chat messages. It provides
+    not just the translation but also a brief grammatical explanation.
+    
+    The response format is specifically designed to be concise and educational,
+    containing the English translation and a very brief explanation of the word's 
+    meaning or grammatical role.
+    
+    Two implementation methods are used:
+    1. Direct Gemini API call (primary method)
+    2. LangChain-based call (fallback method)
+    
+    Args:
+        word (str): The word or short phrase to translate (in the target language)
+        language (str): The source language (e.g., "Spanish")
+    
+    Returns:
+        str: The English translation with brief explanation in the format:
+             "Translation: [english] - [brief explanation]"
+    """
+    # Serve repeated lookups from the translation cache, then from the lexicon
+    cache_key = translation_cache_key(word, language)
+    cached = translation_cache.get(cache_key)
+    if cached is not None:
+        metrics.record_served("translation", "cache")
+        return cached
+    local = _lexicon_translation(word, language)
+    if local is not None:
+        return local
+    
+    api_key = GEMINI_API_KEY
+    if not api_key:
+        logger.error("Gemini API key not found")
+        return "Error: API key not configured. Please contact the administrator."
+    
+    try:
+        # Concurrent lookups of the same word share one upstream request
+        return translation_flight.do(cache_key, _request_translation, word, language,
+                                     api_key, cache_key)
             
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error translating word: {str(e)}")
-        return f"Error translating '{word}'. Please try again."
+        return _translation_error(word)
+
+def pretranslate_reply(reply, language):
+    """
+    Queue the distinct words of a tutor reply for background translation
+    
+    Skipped for error replies and when the pre-translation queue is full.
+    
+    Args:
+        reply (str): The tutor's reply
+        language (str): The reply's language (e.g., "Spanish")
+    """
+    if not PRETRANSLATE_ENABLED or not GEMINI_API_KEY or not reply or reply.startswith("Error"):
+        return
+    # Words as the click-to-translate client splits them, deduplicated by cache key
+    words = {}
+    for token in reply.split():
+        key = translation_cache_key(token, language)
+        word = key.split('|', 1)[1]
+        if any(ch.isalpha() for ch in word):
+            words.setdefault(key, word)
+    pretranslator.submit(list(words.values())[:TRANSLATION_BATCH_SIZE], language)
+
+def translation_cache_key(word, language):
+    """
+    Build the normalized translation cache key for a word
+    
+    Case, Unicode composition and surrounding punctuation (e.g. "¿Cómo" or
+    "estás?") are ignored so every click on the same word shares one entry.
+    """
+    return f"{language.strip().casefold()}|{normalize_word(word)}"
+
+def prewarm_translations(words, language):
+    """
+    Queue background translation of any words not already in the cache
+    
+    Args:
+        words (list): Words or short phrases to translate
+        language (str): The source language (e.g., "Spanish")
+    """
+    if not GEMINI_API_KEY or not words:
+        return
+    _prewarm_executor.submit(_prewarm_translations, list(words), language)
+
+def _prewarm_translations(words, language):
+    missing = [word for word in words if not translation_cache.contains(translation_cache_key(word, language))]
+    if missing:
+        translate_words(missing, language)
+    logger.debug(f"Pre-warmed translation cache for {language}: {len(missing)} of {len(words)} words translated")
+
+# Maximum number of words translated by a single batch request
+TRANSLATION_BATCH_SIZE = int(os.environ.get("TRANSLATION_BATCH_SIZE", "40"))
+
+# Maximum number of words a successful batch left out that are then
+# translated individually; a failed batch is not retried word by word
+TRANSLATION_FALLBACK_MAX = int(os.environ.get("TRANSLATION_FALLBACK_MAX", "5"))
+
+# Completion tokens reserved per word of a batch translation
+BATCH_TOKENS_PER_WORD = 24
+
+def _batch_translation_prompt(words, language):
+    return f"""Translate each of these {language} words or phrases to English: {json.dumps(words, ensure_ascii=False)}
+        
+        For each one provide only:
+        1. The English translation (1-3 words)
+        2. A very brief explanation (5-10 words)
+        
+        Respond with a JSON object mapping every word, exactly as given, to a string
+        in the format "Translation: [english] - [brief explanation]".
+        Example: {{"casa": "Translation: house - a building for human habitation"}}
+        Keep it very concise."""
+
+def _parse_batch_translations(text, language):
+    """
+    Parse a batch translation response
+    
+    Returns:
+        dict: Translation cache key -> translation
+        
+    Raises:
+        ValueError: If the response does not contain a JSON object
+    """
+    data = _extract_json_object(text, "batch translation")
+    return {
+        translation_cache_key(str(word), language): str(translation).strip()
+        for word, translation in data.items()
+        if translation
+    }
+
+def _request_batch_translation(words, language, api_key):
+    """
+    Translate several words with one structured (JSON) model call
+    
+    Returns:
+        dict: Translation cache key -> translation, for the words the model answered
+        
+    Raises:
+        Exception: If the model could not be reached within the deadline, or
+                   the response cannot be parsed
+    """
+    system_message = _batch_translation_prompt(words, language)
+    response = _ask_model("translation", system_message, api_key, temperature=0.1,
+                          generation_config={"response_mime_type": "application/json"},
+                          expected_completion=BATCH_TOKENS_PER_WORD * len(words))
+    logger.info(f"Translated a batch of {len(words)} words")
+    
+    return _parse_batch_translations(response, language)
+
+def _lookup_translations(words, language):
+    """
+    Look up cached (or lexicon) translations of several words
+    
+    Returns:
+        tuple: (cache key -> cached translation, cache key -> first spelling of each uncached word)
+    """
+    found = {}
+    missing = {}
+    with metrics.stage('cache'):
+        for word in words:
+            key = translation_cache_key(word, language)
+            if key in found or key in missing:
+                continue
+            cached = translation_cache.get(key)
+            if cached is None:
+                cached = _lexicon_translation(word, language)
+            if cached is not None:
+                found[key] = cached
+            else:
+                missing[key] = word
+    return found, missing
+
+def _missing_batches(missing):
+    items = list(missing.items())
+    for start in range(0, len(items), TRANSLATION_BATCH_SIZE):
+        yield items[start:start + TRANSLATION_BATCH_SIZE]
+
+def _individual_fallback(missing, found):
+    """
+    Split the words no batch answered into those to translate individually and the rest
+    
+    Only the first TRANSLATION_FALLBACK_MAX words are translated individually
+    (all of them without an API key, which only reports the missing key).
+    
+    Returns:
+        tuple: (list of (cache key, word) to translate individually,
+                cache key -> error message for the others)
+    """
+    omitted = [(key, word) for key, word in missing.items() if key not in found]
+    limit = TRANSLATION_FALLBACK_MAX if GEMINI_API_KEY else len(omitted)
+    return omitted[:limit], {key: _translation_error(word) for key, word in omitted[limit:]}
+
+def translate_words(words, language):
+    """
+    Translate several words or short phrases from the specified language to English.
+    
+    Cached words are answered from the translation cache; all other words are
+    translated with one structured model call per TRANSLATION_BATCH_SIZE words.
+    The words of a failed batch get an error message; up to
+    TRANSLATION_FALLBACK_MAX words a successful batch left out are
+    translated individually.
+    
+    Args:
+        words (list): The words or short phrases to translate
+        language (str): The source language (e.g., "Spanish")
+    
+    Returns:
+        dict: Each word as given -> "Translation: [english] - [brief explanation]"
+              (or an error message for that word)
+    """
+    found, missing = _lookup_translations(words, language)
+    
+    if missing and GEMINI_API_KEY:
+        for batch in _missing_batches(missing):
+            try:
+                translated = _request_batch_translation([word for _, word in batch], language, GEMINI_API_KEY)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                logger.error(f"Error translating words: {str(e)}")
+                # Retrying each word would multiply the load on a failing upstream
+                found.update((key, _translation_error(word)) for key, word in batch)
+                continue
+            results = [(key, word, translated[key]) for key, word in batch if translated.get(key)]
+            _store_translations(results, language)
+            found.update((key, translation) for key, _, translation in results)
+    
+    # Individually translate the few words a batch left out (also reports a missing API key)
+    individual, errors = _individual_fallback(missing, found)
+    found.update(errors)
+    for key, word in individual:
+        found[key] = translate_single_word(word, language)
+    
+    logger.debug(f"Translated {len(words)} words: {len(words) - len(missing)} cached, {len(missing)} requested")
+    return {word: found[translation_cache_key(word, language)] for word in words}
+
+def analysis_cache_key(sentence, language):
+    """Build the analysis cache key for a sentence: language plus content hash."""
+    return f"{language.strip().casefold()}|{sentence_hash(sentence)}"
+
+def _cache_analysis_sections(analysis, sentences, keys):
+    """
+    Store the per-sentence sections of an analysis in the analysis cache
+    
+    Returns:
+        list: The section matched to each sentence (None where none matched)
+    """
+    _, sections = parse_analysis(analysis)
+    matched = match_sections(sentences, sections)
+    analysis_cache.set_many((key, section) for key, section in zip(keys, matched) if section is not None)
+    return matched
+
+def _analysis_prompt(message, language):
+    return f"""Analyze this {language} text: "{message}"
+
+    Begin with the full English translation on its own line:
+    
+    Translation: [Full English translation]
+    
+    Then, split the text into sentences and analyze each sentence separately.
+    
+    For each sentence:
+    1. Use the original {language} sentence as a heading (add ## before it)
+    2. Provide an English translation for just this sentence (not in header format)
+    3. Under each sentence, create a bulleted list in the following format:
+       * **[Word]** [grammatical role] [single word translation] - [Brief explanation in English preceded by the {language} word]
+    
+    Example format:
+    
+    Translation: Hi! How are you?
+    
+    ## ¡Hola!
+    Translation: Hi!
+    * **Hola** greeting "hello" - Hola is a common greeting in Spanish.
+    
+    ## ¿Cómo estás?
+    Translation: How are you?
+    * **cómo** question word "how" - Cómo is used to ask about manner or condition.
+    * **estás** verb (present, 2nd person) "are" - Estás is the conjugated form of "estar" for "tú".
+    
+    Keep all explanations brief and beginner-friendly.
+    """
+
+def _request_analysis(message, language, api_key):
+    """
+    Request a linguistic analysis of a message from the model
+    
+    Raises:
+        Exception: If the model could not be reached within the deadline
+    """
+    # Simplified linguistic analysis prompt with specific formatting
+    system_message = _analysis_prompt(message, language)
+    
+    # Low temperature for focused analysis
+    analysis = _ask_model("analysis", system_message, api_key, temperature=0.2)
+    
+    # Keep the per-word entries for click-to-translate
+    _harvest_analysis(analysis, language)
+    return analysis
+
+def _request_analysis_once(message, language, api_key):
+    """Request an analysis, sharing the call with concurrent requests for the same text."""
+    return analysis_flight.do(analysis_cache_key(message, language), _request_analysis,
+                              message, language, api_key)
+
+def _lookup_analysis_sections(message, language):
+    """
+    Split a message into sentences and look up their cached analysis sections
+    
+    Returns:
+        tuple: (sentences, cache keys, cached section or None per sentence,
+                indexes of the sentences without a cached section)
+    """
+    with metrics.stage('cache'):
+        sentences = split_sentences(message)
+        keys = [analysis_cache_key(sentence, language) for sentence in sentences]
+        sections = [analysis_cache.get(key) for key in keys]
+    missing = [i for i, section in enumerate(sections) if section is None]
+    return sentences, keys, sections, missing
 
 def generate_analysis(message, language):
     """
@@ -549,6 +1505,11 @@ def generate_analysis(message, language):
     * **tienda** noun (feminine) "store" - Tienda refers to a shop or store.
     ```
     
+    Each sentence's section is cached by content hash and language, so repeat
+    analyses only send previously unseen sentences to the model; the result is
+    stitched back together with an overall translation composed from the
+    per-sentence translations.
+    
     Args:
         message (str): The message to analyze in the target language
         language (str): The language of the message (e.g., "Spanish")
@@ -567,62 +1528,850 @@ def generate_analysis(message, language):
     logger.debug(f"Using API key: {masked_key}")
     
     try:
-        # Simplified linguistic analysis prompt with specific formatting
-        system_message = f"""Analyze this {language} text: "{message}"
+        # Analyses are cached per sentence, so only sentences that have not
+        # been analyzed before are sent upstream
+        sentences, keys, sections, missing = _lookup_analysis_sections(message, language)
+        
+        if not sentences or len(missing) == len(sentences):
+            # Nothing cached: analyze the whole message as one request
+            analysis = _request_analysis_once(message, language, api_key)
+            _cache_analysis_sections(analysis, sentences, keys)
+            return analysis
+        
+        if missing:
+            missing_sentences = [sentences[i] for i in missing]
+            partial = _request_analysis_once(' '.join(missing_sentences), language, api_key)
+            new_sections = _cache_analysis_sections(partial, missing_sentences,
+                                                    [keys[i] for i in missing])
+            if None in new_sections:
+                # The model split the text differently; analyze the whole message instead
+                logger.debug("Could not map partial analysis to sentences, analyzing full message")
+                analysis = _request_analysis_once(message, language, api_key)
+                _cache_analysis_sections(analysis, sentences, keys)
+                return analysis
+            for i, section in zip(missing, new_sections):
+                sections[i] = section
+        
+        logger.info(f"Analysis served {len(sentences) - len(missing)} of {len(sentences)} sentences from cache")
+        return assemble_analysis(sections)
+            
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating language analysis: {str(e)}")
+        return f"Error analyzing text: {str(e)}. Please try again or with a shorter message."
 
-        Begin with the full English translation on its own line:
+# -------------------------------------------------------------------------
+# Streamed Analysis
+# -------------------------------------------------------------------------
+# Long analyses take many seconds to generate in full. The streaming
+# variant sends the overall translation and then each "## sentence" section
+# as soon as the model has finished it, so the learner can start reading
+# the first sentence while the rest is still being written.
+# -------------------------------------------------------------------------
+
+def _stream_model(endpoint, prompt, api_key, temperature):
+    """
+    Stream the response to a single prompt
+    
+    The streaming counterpart of _ask_model(): the call is admitted against
+    the token budgets and holds an upstream slot while the model's output is
+    read (ahead of the caller, see _read_ahead()), the direct API is
+    preferred and LangChain is the fallback path, and a path whose circuit
+    breaker is open is skipped. A path can only be abandoned before it has
+    produced any text, so there are no retries or hedged requests.
+    
+    Args:
+        endpoint (str): Endpoint name, also the LangChain client pool purpose
+        prompt (str): The prompt to send
+        api_key (str): Gemini API key
+        temperature (float): Sampling temperature for the LangChain path
         
-        Translation: [Full English translation]
+    Yields:
+        str: Consecutive chunks of the response text
         
-        Then, split the text into sentences and analyze each sentence separately.
+    Raises:
+        AdmissionRejected: If the token budget does not admit the call
+        Exception: If every path failed
+    """
+    def direct():
+        for chunk in get_generative_model(api_key).generate_content(prompt, stream=True):
+            yield chunk.text
+    
+    def langchain():
+        llm = get_chat_model(api_key, purpose=endpoint, temperature=temperature)
+        for chunk in llm.stream([langchain_schema.SystemMessage(content=prompt)]):
+            yield _response_text(chunk)
+    
+    def upstream():
+        error = None
+        for path, chunks in (('direct', direct), ('langchain', langchain)):
+            if not breaker(endpoint, path).allow():
+                continue
+            metrics.record_attempt(endpoint, path)
+            try:
+                for text in chunks():
+                    if text:
+                        if not parts:
+                            metrics.observe_stage('first-chunk', time.perf_counter() - started)
+                        parts.append(text)
+                        yield text
+            except Exception as e:
+                breaker(endpoint, path).failure()
+                # Once text has been passed on we cannot switch paths
+                if parts:
+                    raise
+                logger.error(f"Error in {path} streaming call for {endpoint}: {str(e)}")
+                error = e
+                continue
+            breaker(endpoint, path).success()
+            metrics.record_served(endpoint, path)
+            return
+        metrics.record_served(endpoint, "fallback")
+        raise error or RuntimeError(f"No upstream path available for {endpoint}")
+    
+    reservation = admission.admit(endpoint, prompt)
+    parts = []
+    started = time.perf_counter()
+    try:
+        yield from _read_ahead(endpoint, upstream())
+    finally:
+        admission.settle(reservation, ''.join(parts))
+    metrics.observe_stage(f'upstream-{endpoint}', time.perf_counter() - started)
+    metrics.record_sizes(endpoint, len(prompt), sum(len(part) for part in parts))
+
+class _SectionStream:
+    """
+    Puts cached and streamed analysis sections in message order
+    
+    Sentences with a cached section are ready at once; the sections the
+    model streams are assigned to the remaining sentences by position. A
+    section is released once every section before it has been, so the
+    client receives them in order. The assignment is provisional: the
+    final analysis is matched to the sentences by heading as usual and
+    sent with the "done" event.
+    
+    Args:
+        sentences (list): Sentences of the message
+        sections (list): Cached section or None per sentence
+        missing (list): Indexes of the sentences without a cached section
+    """
+    
+    def __init__(self, sentences, sections, missing):
+        self.slots = list(sections)
+        self.missing = missing
+        self.streamed = 0
+        self.sent = 0
+        # Only an analysis of the whole message has an overall translation to pass on
+        self.whole = len(missing) == len(sentences)
+        self.translation_sent = False
+    
+    def _release(self):
+        events = []
+        while self.sent < len(self.slots) and self.slots[self.sent] is not None:
+            events.append(('section', self.slots[self.sent]))
+            self.sent += 1
+        return events
+    
+    def begin(self):
+        """Events that can be sent before the model is asked: the cached sections in front."""
+        events = []
+        if not self.missing and self.slots:
+            translation, _ = parse_analysis(assemble_analysis(self.slots))
+            events.append(('translation', translation))
+            self.translation_sent = True
+        return events + self._release()
+    
+    def add(self, parsed):
+        """Events released by events of the AnalysisStreamParser."""
+        events = []
+        for event, value in parsed:
+            if event == 'translation':
+                if self.whole and not self.translation_sent:
+                    events.append(('translation', value))
+                    self.translation_sent = True
+                continue
+            if self.streamed < len(self.missing):
+                self.slots[self.missing[self.streamed]] = value
+            else:
+                # The model split the text into more sections than sentences
+                self.slots.append(value)
+            self.streamed += 1
+            events.extend(self._release())
+        return events
+    
+    def finish(self, analysis):
+        """Final events: whatever has not been sent yet, then the complete analysis."""
+        translation, sections = parse_analysis(analysis)
+        events = []
+        if not self.translation_sent and translation:
+            events.append(('translation', translation))
+        events.extend(('section', section) for section in sections[self.sent:])
+        events.append(('done', analysis))
+        return events
+
+def _complete_streamed_analysis(streamed, language, sentences, keys, sections, missing):
+    """
+    Harvest and cache the sections of a streamed analysis and assemble the full analysis
+    
+    Args:
+        streamed (str): The analysis the model streamed
+        language (str): The analyzed language
+        sentences, keys, sections, missing: As returned by _lookup_analysis_sections()
+    
+    Returns:
+        str: The analysis of the whole message, or None if the streamed
+             sections could not be mapped to the missing sentences
+    """
+    _harvest_analysis(streamed, language)
+    if len(missing) == len(sentences):
+        _cache_analysis_sections(streamed, sentences, keys)
+        return streamed
+    missing_sentences = [sentences[i] for i in missing]
+    new_sections = _cache_analysis_sections(streamed, missing_sentences, [keys[i] for i in missing])
+    if None in new_sections:
+        return None
+    sections = list(sections)
+    for i, section in zip(missing, new_sections):
+        sections[i] = section
+    return assemble_analysis(sections)
+
+def stream_analysis(message, language):
+    """
+    Stream a linguistic analysis section by section
+    
+    The streaming counterpart of generate_analysis(), with the same
+    per-sentence cache. Sections of cached sentences are sent at once; the
+    remaining sentences are analyzed by the model, and its output is parsed
+    as it arrives so each section is sent as soon as the next heading
+    begins. The overall translation comes first when the whole message is
+    cached or analyzed in one request; when only some sentences are sent
+    upstream it is composed from the section translations at the end.
+    
+    Args:
+        message (str): The message to analyze in the target language
+        language (str): The language of the message (e.g., "Spanish")
+    
+    Yields:
+        tuple: (event, value) pairs:
+               ("translation", overall translation),
+               ("section", next "## sentence" section in message order),
+               ("done", the complete analysis as generate_analysis() returns it), or
+               ("error", error message) if the analysis failed
+    
+    Raises:
+        AdmissionRejected: If the token budget does not admit the request
+    """
+    api_key = GEMINI_API_KEY
+    if not api_key:
+        logger.error("Gemini API key not found")
+        yield ('error', "Error: API key not configured. Please contact the administrator.")
+        return
+    
+    try:
+        sentences, keys, sections, missing = _lookup_analysis_sections(message, language)
+        stream = _SectionStream(sentences, sections, missing)
+        yield from stream.begin()
         
-        For each sentence:
-        1. Use the original {language} sentence as a heading (add ## before it)
-        2. Provide an English translation for just this sentence (not in header format)
-        3. Under each sentence, create a bulleted list in the following format:
-           * **[Word]** [grammatical role] [single word translation] - [Brief explanation in English preceded by the {language} word]
+        if sentences and not missing:
+            logger.info(f"Analysis served {len(sentences)} of {len(sentences)} sentences from cache")
+            yield from stream.finish(assemble_analysis(sections))
+            return
         
-        Example format:
+        text = message if stream.whole else ' '.join(sentences[i] for i in missing)
+        parser = AnalysisStreamParser()
+        parts = []
+        for chunk in _stream_model("analysis", _analysis_prompt(text, language), api_key, temperature=0.2):
+            parts.append(chunk)
+            yield from stream.add(parser.feed(chunk))
+        yield from stream.add(parser.close())
         
-        Translation: Hi! How are you?
+        streamed = ''.join(parts).strip()
+        analysis = _complete_streamed_analysis(streamed, language, sentences, keys, sections, missing)
+        if analysis is None:
+            # The model split the text differently; analyze the whole message instead
+            logger.debug("Could not map partial analysis to sentences, analyzing full message")
+            analysis = _request_analysis_once(message, language, api_key)
+            _cache_analysis_sections(analysis, sentences, keys)
+        elif not stream.whole:
+            logger.info(f"Analysis served {len(sentences) - len(missing)} of {len(sentences)} sentences from cache")
+        yield from stream.finish(analysis)
+    
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming language analysis: {str(e)}")
+        yield ('error', f"Error analyzing text: {str(e)}. Please try again or with a shorter message.")
+# -------------------------------------------------------------------------
+# Async Twins
+# -------------------------------------------------------------------------
+# Non-blocking versions of the functions above for the ASGI app (asgi.py).
+# They build the same prompts and share the same caches and conversation
+# memory, but await generate_content_async() / ainvoke() / astream() so a
+# single process can hold many in-flight model calls. The synchronous
+# functions remain the API used by the WSGI app.
+#
+# Only in-memory state is touched on the event loop. Everything that
+# waits on SQLite or the shared conversation backend runs in a worker
+# thread (asyncio.to_thread): disk-tier cache reads and writes, lexicon
+# lookups and harvesting, the correction filter's checks and learning,
+# and loading and saving conversations. Writes that belong together are
+# batched into one worker thread call.
+# -------------------------------------------------------------------------
+
+async def _fast_path_verdict_async(message, language):
+    """_fast_path_verdict() off the event loop (the filter reads its SQLite tier)."""
+    if not correction_filter.enabled:
+        return None
+    return await asyncio.to_thread(_fast_path_verdict, message, language)
+
+async def _prepare_chat_turn_async(message, language, vocabulary, conversation_id):
+    """_prepare_chat_turn(), reading a shared conversation backend off the event loop."""
+    if conversation_backend is None:
+        return _prepare_chat_turn(message, language, vocabulary, conversation_id)
+    return await asyncio.to_thread(_prepare_chat_turn, message, language, vocabulary, conversation_id)
+
+async def _lexicon_translations_async(words, language):
+    """Lexicon answers (or None) for several words, looked up in one worker thread call."""
+    if not LEXICON_ENABLED or not words:
+        return [None] * len(words)
+    return await asyncio.to_thread(lambda: [_lexicon_translation(word, language) for word in words])
+
+async def _store_translations_async(results, language):
+    """_store_translations() off the event loop."""
+    if results:
+        await asyncio.to_thread(_store_translations, results, language)
+
+async def _cache_analysis_sections_async(analysis, sentences, keys):
+    """_cache_analysis_sections() off the event loop."""
+    return await asyncio.to_thread(_cache_analysis_sections, analysis, sentences, keys)
+
+async def save_exchange_async(conversation_id, message, response):
+    """save_exchange() off the event loop (it may load and write the shared backend)."""
+    await asyncio.to_thread(save_exchange, conversation_id, message, response)
+
+async def _lookup_translations_async(words, language):
+    """Async twin of _lookup_translations()."""
+    keyed = {}
+    for word in words:
+        keyed.setdefault(translation_cache_key(word, language), word)
+    keys = list(keyed)
+    with metrics.stage('cache'):
+        cached = await translation_cache.get_many_async(keys)
+        uncached = [key for key, value in zip(keys, cached) if value is None]
+        local = await _lexicon_translations_async([keyed[key] for key in uncached], language)
+    found = {key: value for key, value in zip(keys, cached) if value is not None}
+    missing = {}
+    for key, value in zip(uncached, local):
+        if value is not None:
+            found[key] = value
+        else:
+            missing[key] = keyed[key]
+    return found, missing
+
+async def _lookup_analysis_sections_async(message, language):
+    """Async twin of _lookup_analysis_sections()."""
+    with metrics.stage('cache'):
+        sentences = split_sentences(message)
+        keys = [analysis_cache_key(sentence, language) for sentence in sentences]
+        sections = await analysis_cache.get_many_async(keys)
+    missing = [i for i, section in enumerate(sections) if section is None]
+    return sentences, keys, sections, missing
+
+async def _generate_async(prompt, purpose, temperature, task, generation_config=None,
+                          expected_completion=None):
+    """
+    Send a single prompt to the model without blocking the event loop
+    
+    The direct API is tried first with LangChain as the fallback, under the
+    same resilience policy as the synchronous functions.
+    
+    Args:
+        prompt (str): The prompt to send
+        purpose (str): Endpoint name, also the client pool purpose for the LangChain fallback
+        temperature (float): Sampling temperature for the LangChain fallback
+        task (str): Description used in log messages
+        generation_config (dict, optional): Generation config for the direct API call
+        expected_completion (int, optional): Completion tokens to reserve
         
-        ## ¡Hola!
-        Translation: Hi!
-        * **Hola** greeting "hello" - Hola is a common greeting in Spanish.
+    Returns:
+        str: The stripped response text
         
-        ## ¿Cómo estás?
-        Translation: How are you?
-        * **cómo** question word "how" - Cómo is used to ask about manner or condition.
-        * **estás** verb (present, 2nd person) "are" - Estás is the conjugated form of "estar" for "tú".
+    Raises:
+        AdmissionRejected: If the token budget does not admit the call
+        Exception: If the model could not be reached within the deadline
+    """
+    async def direct():
+        model = get_generative_model(GEMINI_API_KEY)
+        response = await model.generate_content_async(prompt, generation_config=generation_config)
+        return response.text.strip()
+    
+    async def langchain():
+        llm = get_chat_model(GEMINI_API_KEY, purpose=purpose, temperature=temperature)
+        return _response_text(await llm.ainvoke([langchain_schema.SystemMessage(content=prompt)])).strip()
+    
+    logger.debug(f"Sending async request for {task}")
+    reservation = await admission.admit_async(purpose, prompt, expected_completion)
+    response = ""
+    try:
+        response = await policy(purpose).call_async([('direct', direct), ('langchain', langchain)])
+    finally:
+        admission.settle(reservation, response)
+    metrics.record_sizes(purpose, len(prompt), len(response))
+    return response
+
+async def get_welcome_message_async(language):
+    """Async twin of get_welcome_message()."""
+    if not GEMINI_API_KEY:
+        logger.warning("API key not found, using fallback welcome message")
+        return _fallback_welcome_message(language)
+    if WELCOME_POOL_ENABLED:
+        return _pooled_welcome_message(language)
+    try:
+        return await welcome_flight.do_async(
+            language.strip().casefold(),
+            lambda: _generate_async(_welcome_prompt(language), "welcome", 0.7, "welcome message")
+        )
+    except Exception as e:
+        logger.error(f"Error generating welcome message: {str(e)}")
+        return _fallback_welcome_message(language)
+
+async def correct_user_message_async(message, language):
+    """Async twin of correct_user_message()."""
+    if not GEMINI_API_KEY or not message:
+        return message
+    verdict = await _fast_path_verdict_async(message, language)
+    if verdict is not None and correction_filter.active:
+        return message
+    try:
+        corrected = await _generate_async(_correction_prompt(message, language), "correction", 0.1,
+                                          "message correction")
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error correcting message: {str(e)}")
+        metrics.record_served("correction", "fallback")
+        return message
+    
+    # If the result is empty or too long, return the original
+    if _accepted_correction(message, corrected) is message:
+        return message
+    await asyncio.to_thread(correction_filter.learn, message, corrected, language, verdict)
+    return corrected
+
+async def generate_response_async(message, language, vocabulary=None, conversation_id='guest',
+                                  save_to_memory=True):
+    """
+    Async twin of generate_response()
+    
+    There is no Flask session in the ASGI app, so the conversation ID has to
+    be passed in by the caller.
+    """
+    api_key = GEMINI_API_KEY
+    if not api_key:
+        logger.error("Gemini API key not found")
+        return "Error: API key not configured. Please contact the administrator."
+    
+    try:
+        proper_messages = await _prepare_chat_turn_async(message, language, vocabulary, conversation_id)
         
-        Keep all explanations brief and beginner-friendly.
-        """
+        async def langchain():
+            return _response_text(await _get_conversation_llm(api_key).ainvoke(proper_messages))
         
-        # Try direct API call first
+        async def direct():
+            # The same turn flattened into one prompt
+            model = get_generative_model(api_key)
+            return (await model.generate_content_async(_direct_chat_prompt(proper_messages))).text
+        
+        reservation = await admission.admit_async("conversation", _prompt_text(proper_messages))
         try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(system_message).text
-            logger.info("Used direct API call for language analysis")
-            return response.strip()
-            
+            response = await policy("conversation").call_async([('langchain', langchain), ('direct', direct)])
+            admission.settle(reservation, response)
+            metrics.record_sizes("conversation", _prompt_size(proper_messages), len(response))
         except Exception as e:
-            logger.warning(f"Direct API failed for language analysis: {str(e)}")
-            
-            # Fallback to LangChain implementation
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash", 
-                api_key=api_key,
-                temperature=0.2  # Low temperature for focused analysis
-            )
-            
-            result = llm.invoke([SystemMessage(content=system_message)])
-            
-            if hasattr(result, 'content'):
-                return result.content.strip()
-            else:
-                return str(result).strip()
-            
+            logger.error(f"Both async API approaches failed: {str(e)}")
+            admission.settle(reservation, "")
+            metrics.record_served("conversation", "fallback")
+            response = f"Error: Could not generate response. {str(e)}"
+        
+        if save_to_memory:
+            await save_exchange_async(conversation_id, message, response)
+            pretranslate_reply(response, language)
+        
+        if response:
+            return response.strip() if isinstance(response, str) else str(response)
+        logger.error("Empty response received from language model")
+        return "Sorry, I couldn't generate a response. Please try again."
+    
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating response with LangChain: {str(e)}")
+        if "invalid api key" in str(e).lower():
+            return "Error: The API key appears to be invalid. Please contact the administrator."
+        return f"Error: {str(e)}"
+
+async def generate_combined_response_async(message, language, vocabulary=None, conversation_id='guest',
+                                           save_to_memory=True):
+    """Async twin of generate_combined_response()."""
+    api_key = GEMINI_API_KEY
+    if not api_key or not message:
+        return None
+    
+    verdict = await _fast_path_verdict_async(message, language)
+    if verdict is not None and correction_filter.active:
+        return message, await generate_response_async(message, language, vocabulary,
+                                                      conversation_id=conversation_id,
+                                                      save_to_memory=save_to_memory)
+    
+    proper_messages = await _prepare_chat_turn_async(message, language, vocabulary, conversation_id)
+    prompt, messages = _combined_request(proper_messages, message, language)
+    
+    async def direct():
+        model = get_generative_model(api_key)
+        response = await model.generate_content_async(
+            prompt, generation_config={"response_mime_type": "application/json"}
+        )
+        return response.text.strip()
+    
+    async def langchain():
+        return _response_text(await _get_conversation_llm(api_key).ainvoke(messages)).strip()
+    
+    reservation = await admission.admit_async("combined", prompt)
+    text = ""
+    try:
+        text = await policy("combined").call_async([('direct', direct), ('langchain', langchain)])
+        corrected, response = _parse_combined_response(text)
+    except Exception as e:
+        logger.warning(f"Combined correction and reply failed, falling back to separate calls: {str(e)}")
+        return None
+    finally:
+        admission.settle(reservation, text)
+    metrics.record_sizes("combined", len(prompt), len(text))
+    
+    return await asyncio.to_thread(_finish_combined_turn, message, corrected, response, language,
+                                   conversation_id, save_to_memory, verdict)
+
+async def _read_ahead_async(endpoint, chunks):
+    """Async twin of _read_ahead(); the chunks are read by a task, which is cancelled if the caller stops."""
+    buffer = asyncio.Queue()
+    
+    async def read():
+        try:
+            async with scheduler.slot_async(endpoint):
+                try:
+                    async for chunk in chunks:
+                        buffer.put_nowait((chunk, None))
+                finally:
+                    await chunks.aclose()
+        except Exception as e:
+            buffer.put_nowait((_END_OF_STREAM, e))
+        else:
+            buffer.put_nowait((_END_OF_STREAM, None))
+    
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            chunk, error = await buffer.get()
+            if chunk is _END_OF_STREAM:
+                if error is not None:
+                    raise error
+                return
+            yield chunk
+    finally:
+        reader.cancel()
+
+async def stream_response_async(message, language, vocabulary=None, conversation_id='guest'):
+    """
+    Async twin of stream_response()
+    
+    Yields:
+        str: Consecutive chunks of the response text (or a single error message)
+    """
+    api_key = GEMINI_API_KEY
+    if not api_key:
+        logger.error("Gemini API key not found")
+        yield "Error: API key not configured. Please contact the administrator."
+        return
+    
+    proper_messages = await _prepare_chat_turn_async(message, language, vocabulary, conversation_id)
+    reservation = await admission.admit_async("conversation", _prompt_text(proper_messages))
+    
+    received = []
+    started = time.perf_counter()
+    
+    async def upstream():
+        try:
+            if not breaker("conversation", 'langchain').allow():
+                raise RuntimeError("LangChain circuit breaker is open")
+            metrics.record_attempt("conversation", "langchain")
+            try:
+                async for chunk in _get_conversation_llm(api_key).astream(proper_messages):
+                    text = _response_text(chunk)
+                    if text:
+                        if not received:
+                            metrics.observe_stage('first-chunk', time.perf_counter() - started)
+                        received.append(text)
+                        yield text
+            except Exception:
+                breaker("conversation", 'langchain').failure()
+                raise
+            breaker("conversation", 'langchain').success()
+            metrics.record_served("conversation", "langchain")
+            logger.info("Used LangChain async streaming for response")
+        except Exception as e:
+            # Once text has been passed on we cannot switch paths
+            if received:
+                raise
+            logger.error(f"Error in async streaming API call: {str(e)}")
+        
+            if not breaker("conversation", 'direct').allow():
+                raise RuntimeError("Direct circuit breaker is open")
+            metrics.record_attempt("conversation", "direct")
+            try:
+                model = get_generative_model(api_key)
+                async for chunk in await model.generate_content_async(_direct_chat_prompt(proper_messages),
+                                                                      stream=True):
+                    text = chunk.text
+                    if text:
+                        if not received:
+                            metrics.observe_stage('first-chunk', time.perf_counter() - started)
+                        received.append(text)
+                        yield text
+            except Exception:
+                breaker("conversation", 'direct').failure()
+                raise
+            breaker("conversation", 'direct').success()
+            metrics.record_served("conversation", "direct")
+            logger.info("Used fallback direct async streaming method")
+    
+    parts = []
+    try:
+        async for text in _read_ahead_async("conversation", upstream()):
+            parts.append(text)
+            yield text
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        if not parts:
+            metrics.record_served("conversation", "fallback")
+            yield f"Error: Could not generate response. {str(e)}"
+        return
+    finally:
+        admission.settle(reservation, ''.join(received))
+    metrics.observe_stage('upstream-conversation', time.perf_counter() - started)
+    
+    response = ''.join(parts).strip()
+    if not response:
+        logger.error("Empty response received from language model")
+        yield "Sorry, I couldn't generate a response. Please try again."
+        return
+    
+    await save_exchange_async(conversation_id, message, response)
+    pretranslate_reply(response, language)
+
+async def translate_single_word_async(word, language):
+    """Async twin of translate_single_word()."""
+    cache_key = translation_cache_key(word, language)
+    cached = await translation_cache.get_async(cache_key)
+    if cached is not None:
+        metrics.record_served("translation", "cache")
+        return cached
+    local, = await _lexicon_translations_async([word], language)
+    if local is not None:
+        return local
+    
+    if not GEMINI_API_KEY:
+        logger.error("Gemini API key not found")
+        return "Error: API key not configured. Please contact the administrator."
+    
+    async def request():
+        translation = await _generate_async(_translation_prompt(word, language), "translation", 0.1,
+                                            "word translation")
+        await _store_translations_async([(cache_key, word, translation)] if translation else [], language)
+        return translation
+    
+    try:
+        return await translation_flight.do_async(cache_key, request)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error translating word: {str(e)}")
+        return _translation_error(word)
+
+async def _request_analysis_once_async(message, language):
+    """Async twin of _request_analysis_once()."""
+    async def upstream():
+        analysis = await _generate_async(_analysis_prompt(message, language), "analysis", 0.2,
+                                         "language analysis")
+        await asyncio.to_thread(_harvest_analysis, analysis, language)
+        return analysis
+    
+    return await analysis_flight.do_async(analysis_cache_key(message, language), upstream)
+
+async def generate_analysis_async(message, language):
+    """Async twin of generate_analysis(), using the same per-sentence cache."""
+    if not GEMINI_API_KEY:
+        logger.error("Gemini API key not found")
+        return "Error: API key not configured. Please contact the administrator."
+    
+    async def request(text):
+        return await _request_analysis_once_async(text, language)
+    
+    try:
+        sentences, keys, sections, missing = await _lookup_analysis_sections_async(message, language)
+        
+        if not sentences or len(missing) == len(sentences):
+            analysis = await request(message)
+            await _cache_analysis_sections_async(analysis, sentences, keys)
+            return analysis
+        
+        if missing:
+            missing_sentences = [sentences[i] for i in missing]
+            partial = await request(' '.join(missing_sentences))
+            new_sections = await _cache_analysis_sections_async(partial, missing_sentences,
+                                                                [keys[i] for i in missing])
+            if None in new_sections:
+                logger.debug("Could not map partial analysis to sentences, analyzing full message")
+                analysis = await request(message)
+                await _cache_analysis_sections_async(analysis, sentences, keys)
+                return analysis
+            for i, section in zip(missing, new_sections):
+                sections[i] = section
+        
+        logger.info(f"Analysis served {len(sentences) - len(missing)} of {len(sentences)} sentences from cache")
+        return assemble_analysis(sections)
+    
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error generating language analysis: {str(e)}")
-        return f"Error analyzing text: {str(e)}. Please try again or with a shorter message."
\ No newline at end of file
+        return f"Error analyzing text: {str(e)}. Please try again or with a shorter message."
+
+async def _stream_model_async(endpoint, prompt, api_key, temperature):
+    """Async twin of _stream_model()."""
+    async def direct():
+        model = get_generative_model(api_key)
+        async for chunk in await model.generate_content_async(prompt, stream=True):
+            yield chunk.text
+    
+    async def langchain():
+        llm = get_chat_model(api_key, purpose=endpoint, temperature=temperature)
+        async for chunk in llm.astream([langchain_schema.SystemMessage(content=prompt)]):
+            yield _response_text(chunk)
+    
+    async def upstream():
+        error = None
+        for path, chunks in (('direct', direct), ('langchain', langchain)):
+            if not breaker(endpoint, path).allow():
+                continue
+            metrics.record_attempt(endpoint, path)
+            try:
+                async for text in chunks():
+                    if text:
+                        if not parts:
+                            metrics.observe_stage('first-chunk', time.perf_counter() - started)
+                        parts.append(text)
+                        yield text
+            except Exception as e:
+                breaker(endpoint, path).failure()
+                if parts:
+                    raise
+                logger.error(f"Error in {path} async streaming call for {endpoint}: {str(e)}")
+                error = e
+                continue
+            breaker(endpoint, path).success()
+            metrics.record_served(endpoint, path)
+            return
+        metrics.record_served(endpoint, "fallback")
+        raise error or RuntimeError(f"No upstream path available for {endpoint}")
+    
+    reservation = await admission.admit_async(endpoint, prompt)
+    parts = []
+    started = time.perf_counter()
+    try:
+        async for text in _read_ahead_async(endpoint, upstream()):
+            yield text
+    finally:
+        admission.settle(reservation, ''.join(parts))
+    metrics.observe_stage(f'upstream-{endpoint}', time.perf_counter() - started)
+    metrics.record_sizes(endpoint, len(prompt), sum(len(part) for part in parts))
+
+async def stream_analysis_async(message, language):
+    """Async twin of stream_analysis(), yielding the same (event, value) pairs."""
+    if not GEMINI_API_KEY:
+        logger.error("Gemini API key not found")
+        yield ('error', "Error: API key not configured. Please contact the administrator.")
+        return
+    
+    try:
+        sentences, keys, sections, missing = await _lookup_analysis_sections_async(message, language)
+        stream = _SectionStream(sentences, sections, missing)
+        for event in stream.begin():
+            yield event
+        
+        if sentences and not missing:
+            logger.info(f"Analysis served {len(sentences)} of {len(sentences)} sentences from cache")
+            for event in stream.finish(assemble_analysis(sections)):
+                yield event
+            return
+        
+        text = message if stream.whole else ' '.join(sentences[i] for i in missing)
+        parser = AnalysisStreamParser()
+        parts = []
+        async for chunk in _stream_model_async("analysis", _analysis_prompt(text, language),
+                                               GEMINI_API_KEY, temperature=0.2):
+            parts.append(chunk)
+            for event in stream.add(parser.feed(chunk)):
+                yield event
+        for event in stream.add(parser.close()):
+            yield event
+        
+        streamed = ''.join(parts).strip()
+        analysis = await asyncio.to_thread(_complete_streamed_analysis, streamed, language,
+                                           sentences, keys, sections, missing)
+        if analysis is None:
+            logger.debug("Could not map partial analysis to sentences, analyzing full message")
+            analysis = await _request_analysis_once_async(message, language)
+            await _cache_analysis_sections_async(analysis, sentences, keys)
+        elif not stream.whole:
+            logger.info(f"Analysis served {len(sentences) - len(missing)} of {len(sentences)} sentences from cache")
+        for event in stream.finish(analysis):
+            yield event
+    
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming language analysis: {str(e)}")
+        yield ('error', f"Error analyzing text: {str(e)}. Please try again or with a shorter message.")
+
+async def translate_words_async(words, language):
+    """Async twin of translate_words()."""
+    found, missing = await _lookup_translations_async(words, language)
+    
+    if missing and GEMINI_API_KEY:
+        for batch in _missing_batches(missing):
+            batch_words = [word for _, word in batch]
+            try:
+                response = await _generate_async(
+                    _batch_translation_prompt(batch_words, language), "translation", 0.1,
+                    f"batch translation of {len(batch_words)} words",
+                    generation_config={"response_mime_type": "application/json"},
+                    expected_completion=BATCH_TOKENS_PER_WORD * len(batch_words)
+                )
+                translated = _parse_batch_translations(response, language)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                logger.error(f"Error translating words: {str(e)}")
+                found.update((key, _translation_error(word)) for key, word in batch)
+                continue
+            results = [(key, word, translated[key]) for key, word in batch if translated.get(key)]
+            await _store_translations_async(results, language)
+            found.update((key, translation) for key, _, translation in results)
+    
+    individual, errors = _individual_fallback(missing, found)
+    found.update(errors)
+    for key, word in individual:
+        found[key] = await translate_single_word_async(word, language)
+    
+    return {word: found[translation_cache_key(word, language)] for word in words}
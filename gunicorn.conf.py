@@ -0,0 +1,22 @@
+# -------------------------------------------------------------------------
+# gunicorn.conf.py - Gunicorn Server Hooks
+# -------------------------------------------------------------------------
+# Picked up automatically when gunicorn is started from the project root,
+# e.g. `gunicorn --bind 0.0.0.0:5000 main:app`.
+#
+# The Gemini SDKs and LangChain are imported lazily (see lazy_imports.py),
+# so a worker boots and starts serving without paying for them. Once a
+# forked worker has loaded the app, the deferred imports are started in a
+# background thread so they are usually done before a request needs them.
+#
+# Configuration (environment variables):
+# - IMPORT_WARMUP: "0"/"false" to skip the background warm-up (default enabled)
+# -------------------------------------------------------------------------
+
+
+def post_worker_init(worker):
+    """Warm up the deferred imports of a freshly forked worker."""
+    from lazy_imports import IMPORT_WARMUP, warm_up
+    if IMPORT_WARMUP:
+        worker.log.info("Warming up deferred imports in the background")
+        warm_up()
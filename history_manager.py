@@ -0,0 +1,175 @@
+# -------------------------------------------------------------------------
+# history_manager.py - Token-Budgeted Conversation History
+# -------------------------------------------------------------------------
+# Sending the entire conversation history with every turn makes long
+# practice sessions slower and more expensive on each message. This module
+# keeps the history part of the prompt within a token budget: the last few
+# turns are sent verbatim and older turns are folded into a compact running
+# summary. Summaries are updated incrementally on a background thread, so a
+# turn never waits for summarization; until the summary catches up, the
+# not-yet-folded turns are sent verbatim as far as the budget allows.
+#
+# The last turn is always sent, even if it alone exceeds the budget; every
+# turn before the verbatim history is folded into the summary, including
+# recent turns that did not fit, so no part of the conversation is dropped.
+#
+# Configuration (environment variables):
+# - HISTORY_TOKEN_BUDGET: maximum estimated tokens of history per prompt (default 1500)
+# - HISTORY_KEEP_TURNS: number of recent turns kept verbatim while they fit the budget (default 6)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Application-specific imports
+from cache_service import LRUCache
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_KEEP_TURNS = int(os.environ.get("HISTORY_KEEP_TURNS", "6"))
+
+
+def is_wide_char(ch):
+    # CJK, kana and hangul characters are roughly one token each
+    code = ord(ch)
+    return (0x3040 <= code <= 0x30FF or 0x3400 <= code <= 0x9FFF
+            or 0xAC00 <= code <= 0xD7AF or 0xF900 <= code <= 0xFAFF)
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of model tokens in a text without calling the API.
+
+    Uses ~4 characters per token for alphabetic scripts and one token per
+    CJK/kana/hangul character.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    wide = sum(1 for ch in text if is_wide_char(ch))
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+def _message_text(message):
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+class HistoryManager:
+    """
+    Selects the history sent with each prompt and maintains rolling summaries.
+
+    Args:
+        summarize (callable): summarize(previous_summary, messages) -> new summary text
+        token_budget (int): Maximum estimated tokens of summary plus verbatim history
+                            (the last turn is sent even if it exceeds the budget)
+        keep_turns (int): Number of most recent turns not folded while they fit the budget
+        max_conversations (int): Number of conversation summaries kept in memory
+    """
+
+    def __init__(self, summarize, token_budget=HISTORY_TOKEN_BUDGET, keep_turns=HISTORY_KEEP_TURNS,
+                 max_conversations=1000):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        # conversation_id -> (summary, number of messages folded into it)
+        self._summaries = LRUCache(max_entries=max_conversations)
+        self._pending = set()
+        # Conversations forgotten while a fold was in progress
+        self._forgotten = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+    def _current_summary(self, conversation_id, message_count):
+        summary, folded = self._summaries.get(conversation_id) or ("", 0)
+        if folded > message_count:
+            # The conversation was reset since this summary was made
+            self._summaries.pop(conversation_id)
+            return "", 0
+        return summary, folded
+
+    def window(self, conversation_id, messages):
+        """
+        Choose the history to send for the next turn.
+
+        Args:
+            conversation_id: The conversation's identifier
+            messages (list): All stored messages of the conversation, oldest first
+
+        Returns:
+            tuple: (summary text, possibly empty; list of messages to send verbatim)
+        """
+        summary, folded = self._current_summary(conversation_id, len(messages))
+        unfolded = messages[folded:]
+
+        # The last turn (from the learner's last message on) is always sent
+        last_turn = next((i for i in range(len(unfolded) - 1, -1, -1)
+                          if getattr(unfolded[i], 'type', None) == 'human'), len(unfolded))
+        selected = list(reversed(unfolded[last_turn:]))
+        budget = self.token_budget - estimate_tokens(summary)
+        budget -= sum(estimate_tokens(_message_text(message)) for message in selected)
+
+        # Fill the rest of the budget from the newest message backwards; turns
+        # that are waiting to be folded into the summary are included while they fit
+        for message in reversed(unfolded[:last_turn]):
+            cost = estimate_tokens(_message_text(message))
+            if cost > budget:
+                break
+            selected.append(message)
+            budget -= cost
+        selected.reverse()
+
+        # Start the verbatim history on a learner message
+        while selected and getattr(selected[0], 'type', None) != 'human':
+            selected.pop(0)
+
+        # Fold everything before the verbatim history, and the turns older than
+        # the kept ones even while they still fit
+        fold_to = max(len(messages) - len(selected), len(messages) - self.keep_turns * 2)
+        if folded < fold_to:
+            self._schedule_fold(conversation_id, messages[:fold_to])
+        return summary, selected
+
+    def _schedule_fold(self, conversation_id, older):
+        with self._lock:
+            if conversation_id in self._pending:
+                return
+            self._pending.add(conversation_id)
+        self._executor.submit(self._fold, conversation_id, list(older))
+
+    def _fold(self, conversation_id, older):
+        try:
+            # A summary that already covers more (the fold point moved back) is kept
+            summary, folded = self._summaries.get(conversation_id) or ("", 0)
+            new_messages = older[folded:]
+            if new_messages:
+                summary = self.summarize(summary, new_messages)
+                with self._lock:
+                    if conversation_id in self._forgotten:
+                        return
+                    self._summaries.set(conversation_id, (summary, len(older)))
+                logger.debug(f"Folded {len(new_messages)} messages into summary for {conversation_id}")
+        except Exception as e:
+            logger.warning(f"Failed to update conversation summary: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(conversation_id)
+                self._forgotten.discard(conversation_id)
+
+    def forget(self, conversation_id):
+        """Drop the summary of a conversation that was cleared, expired or evicted."""
+        with self._lock:
+            if conversation_id in self._pending:
+                # A fold in progress must not bring the summary back
+                self._forgotten.add(conversation_id)
+        self._summaries.pop(conversation_id)
@@ -0,0 +1,136 @@
+# -------------------------------------------------------------------------
+# lazy_imports.py - Deferred Imports of Heavy Dependencies
+# -------------------------------------------------------------------------
+# Importing google.generativeai and LangChain takes well over a second, and
+# every gunicorn worker boot and every new replica used to pay for it before
+# serving a single request, although LangChain is mostly a fallback path.
+# Modules registered with lazy_import() are imported on first attribute
+# access instead.
+#
+# warm_up() imports every registered module ahead of time in a background
+# thread. gunicorn.conf.py calls it once each worker has loaded the app and
+# the ASGI app calls it on lifespan startup, so a worker is ready at once
+# and the imports are usually done before the first request needs them.
+#
+# How long each deferred import took is reported in /api/stats, and
+# benchmarks/startup_benchmark.py checks the import time of the app
+# against a budget.
+#
+# Configuration (environment variables):
+# - LAZY_IMPORTS: "0"/"false" to import registered modules at once (default enabled)
+# - IMPORT_WARMUP: "0"/"false" to skip the background warm-up (default enabled)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import importlib
+import logging
+import os
+import threading
+import time
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+LAZY_IMPORTS = os.environ.get("LAZY_IMPORTS", "1").lower() in ("1", "true", "yes")
+IMPORT_WARMUP = os.environ.get("IMPORT_WARMUP", "1").lower() in ("1", "true", "yes")
+
+# Module name -> LazyModule, guarded by _lock
+_registry = {}
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Args:
+        name (str): Dotted module name (e.g. "langchain.memory")
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = None
+        self._module = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        """Import the module if that has not happened yet and return it."""
+        module = self._module
+        if module is None:
+            started = time.perf_counter()
+            # The import system serializes concurrent imports of the same module
+            module = importlib.import_module(self.name)
+            with _lock:
+                if self._module is None:
+                    self._module = module
+                    self.seconds = time.perf_counter() - started
+                    logger.debug(f"Imported {self.name} in {self.seconds * 1000:.0f}ms")
+        return module
+
+    def __getattr__(self, attribute):
+        # Only called for attributes not found on the stand-in itself
+        return getattr(self.load(), attribute)
+
+    def __repr__(self):
+        return f"<LazyModule {self.name} ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+def lazy_import(name):
+    """
+    Register a module to be imported on first use
+
+    Args:
+        name (str): Dotted module name
+
+    Returns:
+        LazyModule: Stand-in whose attributes are those of the module
+                    (shared by every caller registering the same name)
+    """
+    with _lock:
+        module = _registry.get(name)
+        if module is None:
+            module = _registry[name] = LazyModule(name)
+    if not LAZY_IMPORTS:
+        module.load()
+    return module
+
+
+def warm_up(background=True):
+    """
+    Import every registered module ahead of its first use
+
+    Args:
+        background (bool): Import in a daemon thread instead of the caller's
+    """
+    def run():
+        started = time.perf_counter()
+        for module in list(_registry.values()):
+            try:
+                module.load()
+            except Exception as e:
+                # The first real use reports the error again
+                logger.warning(f"Import warm-up of {module.name} failed: {str(e)}")
+        logger.info(f"Import warm-up finished in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    if background:
+        threading.Thread(target=run, name="import-warmup", daemon=True).start()
+    else:
+        run()
+
+
+def stats():
+    with _lock:
+        modules = list(_registry.values())
+    return {
+        'lazy': LAZY_IMPORTS,
+        'modules': {
+            module.name: {
+                'loaded': module.loaded,
+                'importMs': round(module.seconds * 1000, 1) if module.seconds is not None else None
+            }
+            for module in modules
+        }
+    }
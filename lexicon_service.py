@@ -0,0 +1,351 @@
+# -------------------------------------------------------------------------
+# lexicon_service.py - Local Lexicon Harvested from Model Output
+# -------------------------------------------------------------------------
+# Every linguistic analysis lists its words as bullets
+#     * **Quiero** verb (1st person present) "want" - Quiero is the ...
+# and every word translation has the form
+#     Translation: house - a building for human habitation
+# This module parses those outputs as they are produced and keeps the
+# entries in a per-language lexicon, so click-to-translate can answer many
+# words locally without calling the model.
+#
+# Entries are keyed by (language, normalized surface form) and also carry
+# the lemma when the explanation names it ("form of \"querer\""). When an
+# analysis gives the lemma's own translation ("querer" (to want)) the lemma
+# gets an entry of its own. Entries are stored compactly in a WITHOUT
+# ROWID SQLite table; each has a confidence that grows when the same
+# translation is seen again, and only entries at or above
+# LEXICON_MIN_CONFIDENCE are used to answer lookups. A word translation
+# is trusted at once; a gloss from an analysis needs one confirmation.
+# The lemma is indexed: a word whose own entry is not confident yet is
+# answered from a confident entry of its lemma (the dictionary form's own
+# entry, or else another form of it).
+#
+# Configuration (environment variables):
+# - LEXICON: "0"/"false" to disable (default enabled)
+# - LEXICON_DB_PATH: database file (default: the shared cache database)
+# - LEXICON_MIN_CONFIDENCE: confidence needed to answer a lookup (default 0.8)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Application-specific imports
+from analysis_parser import parse_analysis
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+LEXICON_ENABLED = os.environ.get("LEXICON", "1").lower() in ("1", "true", "yes")
+LEXICON_MIN_CONFIDENCE = float(os.environ.get("LEXICON_MIN_CONFIDENCE", "0.8"))
+
+# Initial confidence by source; a direct word translation is more reliable
+# than a word's gloss inside a sentence analysis, which stays below the
+# default LEXICON_MIN_CONFIDENCE until the same translation is seen again
+SOURCE_CONFIDENCE = {'translation': 0.9, 'analysis': 0.7}
+# Confidence added each time the same translation is observed again
+CONFIRMATION_BONUS = 0.1
+
+# Fields of an entry returned by Lexicon.lookup(), in column order
+_ENTRY_FIELDS = ('surface', 'lemma', 'role', 'translation', 'explanation', 'source', 'confidence')
+
+# * **word** role "translation" - explanation
+_BULLET_RE = re.compile(
+    r'^\s*[*\-•]\s+\*\*(?P<word>[^*]+?)\*\*\s*(?P<role>[^"“]*?)\s*["“](?P<translation>[^"”]+)["”]'
+    r'\s*[-–—:]\s*(?P<explanation>.+?)\s*$'
+)
+# Translation: english - explanation
+_TRANSLATION_RE = re.compile(r'Translation:\s*(?P<translation>.+?)\s+[-–—]\s+(?P<explanation>.+)', re.DOTALL)
+# ... form of "querer" (to want) / ... infinitive "querer"
+_LEMMA_RE = re.compile(
+    r'(?:form|conjugation|infinitive|plural|participle|gerund)\s+(?:of\s+)?["“](?P<lemma>[^"”]+)["”]'
+    r'(?:\s*\((?P<meaning>[^)]+)\))?'
+)
+
+
+def normalize_word(word):
+    """
+    Normalize a word for lookups
+
+    Case, Unicode composition and surrounding punctuation (e.g. "¿Cómo" or
+    "estás?") are ignored.
+    """
+    word = unicodedata.normalize('NFC', word).strip()
+    start, end = 0, len(word)
+    while start < end and unicodedata.category(word[start]).startswith('P'):
+        start += 1
+    while end > start and unicodedata.category(word[end - 1]).startswith('P'):
+        end -= 1
+    return word[start:end].casefold()
+
+
+def _language_key(language):
+    return language.strip().casefold()
+
+
+def parse_translation(text):
+    """
+    Parse a word translation result
+
+    Returns:
+        tuple: (translation, explanation), or None if the text has another format
+    """
+    match = _TRANSLATION_RE.search(text or '')
+    if not match:
+        return None
+    return match.group('translation').strip(' "\''), match.group('explanation').strip()
+
+
+def parse_analysis_entries(analysis):
+    """
+    Extract word entries from the bullets of a linguistic analysis
+
+    Args:
+        analysis (str): Markdown analysis as produced by the model
+
+    Returns:
+        list: dicts with surface, lemma, role, translation and explanation
+    """
+    entries = []
+    _, sections = parse_analysis(analysis)
+    for section in sections:
+        for line in section.splitlines():
+            match = _BULLET_RE.match(line)
+            if not match:
+                continue
+            surface = normalize_word(match.group('word'))
+            if not surface:
+                continue
+            explanation = match.group('explanation')
+            lemma_match = _LEMMA_RE.search(explanation)
+            translation = match.group('translation').strip()
+            if lemma_match and normalize_word(lemma_match.group('lemma')) == normalize_word(translation):
+                # 'the infinitive form of "to go"' quotes the English meaning, not a lemma
+                lemma_match = None
+            lemma = normalize_word(lemma_match.group('lemma')) if lemma_match else surface
+            entries.append({
+                'surface': surface,
+                'lemma': lemma or surface,
+                'role': match.group('role').strip(),
+                'translation': translation,
+                'explanation': explanation
+            })
+            # The lemma's own meaning, when the analysis states it
+            if lemma_match and lemma_match.group('meaning') and lemma != surface:
+                entries.append({
+                    'surface': lemma,
+                    'lemma': lemma,
+                    'role': '',
+                    'translation': lemma_match.group('meaning').strip(),
+                    'explanation': f"Dictionary form of \"{match.group('word').strip()}\""
+                })
+    return entries
+
+
+class Lexicon:
+    """
+    Per-language lexicon stored in SQLite.
+
+    Args:
+        db_path (str): Path of the SQLite database file
+        min_confidence (float): Confidence needed for lookup() to return an entry
+    """
+
+    def __init__(self, db_path, min_confidence=LEXICON_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS lexicon_entry ("
+                "language TEXT NOT NULL, "
+                "surface TEXT NOT NULL, "
+                "lemma TEXT NOT NULL, "
+                "role TEXT NOT NULL, "
+                "translation TEXT NOT NULL, "
+                "explanation TEXT NOT NULL, "
+                "source TEXT NOT NULL, "
+                "confidence REAL NOT NULL, "
+                "seen INTEGER NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "PRIMARY KEY (language, surface)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_lexicon_entry_lemma ON lexicon_entry (language, lemma)"
+            )
+            # Unconfirmed analysis entries stored with an older, higher initial confidence
+            self._conn.execute(
+                "UPDATE lexicon_entry SET confidence = ? WHERE source = 'analysis' AND seen = 1 "
+                "AND confidence > ?", (SOURCE_CONFIDENCE['analysis'], SOURCE_CONFIDENCE['analysis'])
+            )
+        self.lookups = 0
+        self.hits = 0
+        self.lemma_hits = 0
+        self.harvested = 0
+        # Lookups and hits per hour (epoch hour -> [lookups, hits]), last 48 hours
+        self._hourly = OrderedDict()
+
+    # Harvesting
+
+    def harvest_translation(self, word, language, text):
+        """Store the entry contained in a word translation result, if it parses."""
+        self.harvest_translations([(word, text)], language)
+
+    def harvest_translations(self, results, language):
+        """Store the entries of several (word, translation result) pairs in one transaction."""
+        entries = []
+        for word, text in results:
+            parsed = parse_translation(text)
+            surface = normalize_word(word)
+            if not parsed or not surface:
+                continue
+            translation, explanation = parsed
+            entries.append({
+                'surface': surface, 'lemma': surface, 'role': '',
+                'translation': translation, 'explanation': explanation
+            })
+        if entries:
+            self._upsert(language, entries, 'translation')
+
+    def harvest_analysis(self, analysis, language):
+        """Store the word entries of a linguistic analysis."""
+        entries = parse_analysis_entries(analysis)
+        if entries:
+            self._upsert(language, entries, 'analysis')
+
+    def _upsert(self, language, entries, source):
+        language = _language_key(language)
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                rows = []
+                for entry in {entry['surface']: entry for entry in entries}.values():
+                    existing = self._conn.execute(
+                        "SELECT translation, confidence, seen FROM lexicon_entry "
+                        "WHERE language = ? AND surface = ?", (language, entry['surface'])
+                    ).fetchone()
+                    confidence, seen = SOURCE_CONFIDENCE[source], 1
+                    if existing is not None:
+                        old_translation, old_confidence, old_seen = existing
+                        if old_translation.casefold() == entry['translation'].casefold():
+                            # Same meaning observed again
+                            # Rounded so that 0.7 + 0.1 reaches 0.8
+                            confidence = round(min(1.0, max(old_confidence, confidence) + CONFIRMATION_BONUS), 6)
+                            seen = old_seen + 1
+                        elif old_confidence > confidence:
+                            # Keep the more reliable existing entry
+                            continue
+                    rows.append((language, entry['surface'], entry['lemma'], entry['role'],
+                                 entry['translation'], entry['explanation'], source,
+                                 confidence, seen, now))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO lexicon_entry (language, surface, lemma, role, translation, "
+                    "explanation, source, confidence, seen, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self.harvested += len(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Lexicon write failed: {str(e)}")
+
+    # Lookups
+
+    def lookup(self, word, language):
+        """
+        Find a confident entry for a word
+
+        A word whose own entry is not confident yet but names its lemma is
+        answered from the lemma's confident entry (or, failing that, from a
+        confident entry of another form of the lemma).
+
+        Args:
+            word (str): The word as clicked (punctuation and case are ignored)
+            language (str): The word's language
+
+        Returns:
+            dict: The entry (surface, lemma, role, translation, explanation, source,
+                  confidence), or None
+        """
+        surface = normalize_word(word)
+        language = _language_key(language)
+        entry = None
+        if surface:
+            try:
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT surface, lemma, role, translation, explanation, source, confidence "
+                        "FROM lexicon_entry WHERE language = ? AND surface = ?", (language, surface)
+                    ).fetchone()
+                    if row is not None and row[-1] >= self.min_confidence:
+                        entry = dict(zip(_ENTRY_FIELDS, row))
+                    elif row is not None and row[1] != surface:
+                        entry = self._lemma_entry(language, surface, row[1])
+            except sqlite3.Error as e:
+                logger.warning(f"Lexicon read failed: {str(e)}")
+        self._record(entry is not None)
+        return entry
+
+    def _lemma_entry(self, language, surface, lemma):
+        """A confident entry of the lemma for a form of it; the caller holds the lock."""
+        row = self._conn.execute(
+            "SELECT surface, lemma, role, translation, explanation, source, confidence "
+            "FROM lexicon_entry WHERE language = ? AND lemma = ? AND confidence >= ? "
+            "ORDER BY surface = lemma DESC, confidence DESC LIMIT 1",
+            (language, lemma, self.min_confidence)
+        ).fetchone()
+        if row is None:
+            return None
+        self.lemma_hits += 1
+        entry = dict(zip(_ENTRY_FIELDS, row))
+        entry.update(surface=surface, explanation=f"Form of \"{lemma}\"; {entry['explanation']}")
+        return entry
+
+    def _record(self, hit):
+        hour = int(time.time() // 3600)
+        with self._lock:
+            self.lookups += 1
+            counts = self._hourly.setdefault(hour, [0, 0])
+            counts[0] += 1
+            if hit:
+                self.hits += 1
+                counts[1] += 1
+            while len(self._hourly) > 48:
+                self._hourly.popitem(last=False)
+
+    def stats(self):
+        try:
+            with self._lock:
+                by_language = dict(self._conn.execute(
+                    "SELECT language, COUNT(*) FROM lexicon_entry GROUP BY language"
+                ).fetchall())
+        except sqlite3.Error:
+            by_language = {}
+        with self._lock:
+            return {
+                'enabled': LEXICON_ENABLED,
+                'entries': by_language,
+                'harvested': self.harvested,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'lemmaHits': self.lemma_hits,
+                'coverage': self.hits / self.lookups if self.lookups else 0.0,
+                'coverageByHour': [
+                    {'hour': time.strftime('%Y-%m-%dT%H:00Z', time.gmtime(hour * 3600)),
+                     'lookups': lookups, 'hits': hits,
+                     'coverage': hits / lookups if lookups else 0.0}
+                    for hour, (lookups, hits) in self._hourly.items()
+                ]
+            }
+
+
+def format_entry(entry):
+    """Format a lexicon entry like a word translation result."""
+    return f"Translation: {entry['translation']} - {entry['explanation']}"
@@ -0,0 +1,592 @@
+# -------------------------------------------------------------------------
+# llm_backends.py - Pluggable LLM Backends
+# -------------------------------------------------------------------------
+# gemini_service.py gets its model objects from here instead of building
+# Gemini clients directly, so the whole app can run without a key or a
+# network:
+#
+# - gemini: the real models from the shared client registry (default)
+# - fake: a deterministic local fake with a configurable latency
+#   distribution and failure rate, answering every prompt in the format
+#   the service functions expect
+# - record: the Gemini backend, with every response appended to a cassette
+# - replay: canned responses served from a cassette
+#
+# Backends hand out objects with the subset of the SDK surface the service
+# functions use: generate_content(_async) for the direct path and
+# invoke/ainvoke/stream/astream for the LangChain path.
+#
+# Configuration (environment variables):
+# - LLM_BACKEND: gemini, fake, record or replay (default gemini)
+# - LLM_CASSETTE: cassette file for record/replay (default instance/llm_cassette.jsonl)
+# - LLM_REPLAY_MISS: "error" (default) or "fake" for prompts not in the cassette
+# - LLM_REPLAY_TIMING: "recorded" (default) replays recorded latencies, "none" answers at once
+# - FAKE_LLM_LATENCY_MS: median fake latency in milliseconds (default 300)
+# - FAKE_LLM_LATENCY_SIGMA: spread of the log-normal latency (default 0.5)
+# - FAKE_LLM_FAILURE_RATE: fraction of calls failing with a 503 (default 0)
+# - FAKE_LLM_RATE_LIMIT_RATE: fraction of calls failing with a 429 (default 0)
+# - FAKE_LLM_SEED: seed of the latency and failure draws (default 0)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini").lower()
+LLM_CASSETTE = os.environ.get(
+    "LLM_CASSETTE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "llm_cassette.jsonl")
+)
+LLM_REPLAY_MISS = os.environ.get("LLM_REPLAY_MISS", "error").lower()
+LLM_REPLAY_TIMING = os.environ.get("LLM_REPLAY_TIMING", "recorded").lower()
+FAKE_LLM_LATENCY_MS = float(os.environ.get("FAKE_LLM_LATENCY_MS", "300"))
+FAKE_LLM_LATENCY_SIGMA = float(os.environ.get("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+FAKE_LLM_FAILURE_RATE = float(os.environ.get("FAKE_LLM_FAILURE_RATE", "0"))
+FAKE_LLM_RATE_LIMIT_RATE = float(os.environ.get("FAKE_LLM_RATE_LIMIT_RATE", "0"))
+FAKE_LLM_SEED = int(os.environ.get("FAKE_LLM_SEED", "0"))
+
+# API key used by offline backends when no real key is configured
+OFFLINE_API_KEY = "offline"
+
+
+class FakeBackendError(RuntimeError):
+    """A simulated upstream failure (503), raised after `latency` seconds."""
+
+    code = 503
+
+    def __init__(self, message, latency=0.0):
+        super().__init__(message)
+        self.latency = latency
+
+
+class FakeRateLimitError(RuntimeError):
+    """A simulated rate-limit response (429)."""
+
+    code = 429
+
+    def __init__(self, message, retry_after=0.1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CassetteMiss(LookupError):
+    """The replayed cassette has no response for a request."""
+
+
+class TextResponse:
+    """A model response or stream chunk, readable as .text (SDK) or .content (LangChain)."""
+
+    def __init__(self, text):
+        self.text = text
+        self.content = text
+
+
+def request_key(request):
+    """
+    Key of a model request for cassettes
+
+    A direct prompt and a single-message LangChain call with the same text
+    get the same key, so either path can replay a recording of the other.
+
+    Args:
+        request: A prompt string or a list of LangChain messages
+    """
+    if isinstance(request, str):
+        parts = [request]
+    elif len(request) == 1:
+        parts = [getattr(request[0], 'content', str(request[0]))]
+    else:
+        parts = [f"{getattr(m, 'type', 'message')}: {getattr(m, 'content', str(m))}" for m in request]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _last_text(request):
+    if isinstance(request, str):
+        return request
+    return getattr(request[-1], 'content', str(request[-1])) if request else ''
+
+
+def _chunks(text, count=4):
+    """Split a response into stream chunks at word boundaries."""
+    words = re.findall(r'\S+\s*', text)
+    size = max(1, math.ceil(len(words) / count))
+    return [''.join(words[i:i + size]) for i in range(0, len(words), size)] or [text]
+
+
+# -------------------------------------------------------------------------
+# Model Objects
+# -------------------------------------------------------------------------
+
+class _CannedModel:
+    """
+    Model object answering from a function instead of the network.
+
+    Args:
+        answer (callable): answer(request) -> (text, latency in seconds); may
+                           raise, after the error's `latency` attribute (if any)
+                           has passed on this surface
+    """
+
+    def __init__(self, answer):
+        self.answer = answer
+
+    def _answer(self, request):
+        try:
+            return self.answer(request)
+        except Exception as e:
+            time.sleep(getattr(e, 'latency', 0.0))
+            raise
+
+    async def _answer_async(self, request):
+        try:
+            return self.answer(request)
+        except Exception as e:
+            await asyncio.sleep(getattr(e, 'latency', 0.0))
+            raise
+
+    # Direct SDK surface
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self.stream(prompt)
+        text, latency = self._answer(prompt)
+        time.sleep(latency)
+        return TextResponse(text)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self.astream(prompt)
+        text, latency = await self._answer_async(prompt)
+        await asyncio.sleep(latency)
+        return TextResponse(text)
+
+    # LangChain surface
+
+    def invoke(self, messages, **kwargs):
+        return self.generate_content(messages)
+
+    async def ainvoke(self, messages, **kwargs):
+        return await self.generate_content_async(messages)
+
+    def stream(self, messages, **kwargs):
+        text, latency = self._answer(messages)
+        chunks = _chunks(text)
+        for chunk in chunks:
+            time.sleep(latency / len(chunks))
+            yield TextResponse(chunk)
+
+    async def astream(self, messages, **kwargs):
+        text, latency = await self._answer_async(messages)
+        chunks = _chunks(text)
+        for chunk in chunks:
+            await asyncio.sleep(latency / len(chunks))
+            yield TextResponse(chunk)
+
+
+class _RecordingModel:
+    """Wraps a real model object and appends its responses to a cassette."""
+
+    def __init__(self, model, cassette):
+        self.model = model
+        self.cassette = cassette
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        started = time.monotonic()
+        if stream:
+            return self._record_stream(prompt, started, self.model.generate_content(prompt, stream=True, **kwargs))
+        response = self.model.generate_content(prompt, **kwargs)
+        self.cassette.record(prompt, response.text, time.monotonic() - started)
+        return response
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        started = time.monotonic()
+        if stream:
+            chunks = await self.model.generate_content_async(prompt, stream=True, **kwargs)
+            return self._record_astream(prompt, started, chunks)
+        response = await self.model.generate_content_async(prompt, **kwargs)
+        self.cassette.record(prompt, response.text, time.monotonic() - started)
+        return response
+
+    def invoke(self, messages, **kwargs):
+        started = time.monotonic()
+        result = self.model.invoke(messages, **kwargs)
+        self.cassette.record(messages, _text_of(result), time.monotonic() - started)
+        return result
+
+    async def ainvoke(self, messages, **kwargs):
+        started = time.monotonic()
+        result = await self.model.ainvoke(messages, **kwargs)
+        self.cassette.record(messages, _text_of(result), time.monotonic() - started)
+        return result
+
+    def stream(self, messages, **kwargs):
+        return self._record_stream(messages, time.monotonic(), self.model.stream(messages, **kwargs))
+
+    def astream(self, messages, **kwargs):
+        return self._record_astream(messages, time.monotonic(), self.model.astream(messages, **kwargs))
+
+    def _record_stream(self, request, started, chunks):
+        parts = []
+        for chunk in chunks:
+            parts.append(_text_of(chunk))
+            yield chunk
+        self.cassette.record(request, ''.join(parts), time.monotonic() - started)
+
+    async def _record_astream(self, request, started, chunks):
+        parts = []
+        async for chunk in chunks:
+            parts.append(_text_of(chunk))
+            yield chunk
+        self.cassette.record(request, ''.join(parts), time.monotonic() - started)
+
+
+def _text_of(result):
+    if hasattr(result, 'content'):
+        return result.content
+    return getattr(result, 'text', str(result))
+
+
+# -------------------------------------------------------------------------
+# Fake Responses
+# -------------------------------------------------------------------------
+
+_WELCOME_RE = re.compile(r'greeting in (?P<language>[^.\n]+)\.')
+_CORRECTION_RE = re.compile(r'Correct this .+? message from a learner: "(?P<message>.*)"\s*$', re.MULTILINE)
+_BATCH_RE = re.compile(r'Translate each of these .+? to English: (?P<words>\[.*\])')
+_TRANSLATION_RE = re.compile(r"word or phrase to English: '(?P<word>.*)'")
+_COMBINED_RE = re.compile(r'JSON object with the keys "corrected" and "reply"')
+_COMBINED_MESSAGE_RE = re.compile(r'New message from the learner: "(?P<message>.*)"\s*$', re.DOTALL)
+_ANALYSIS_RE = re.compile(r'Analyze this .+? text: "(?P<text>.*)"\s*\n\s*Begin with', re.DOTALL)
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _fake_translation(word):
+    return f"Translation: fake-{word} - Fake translation of \"{word}\""
+
+
+def _fake_analysis(text):
+    # Imported here to keep this module free of app imports at load time
+    from analysis_parser import split_sentences
+    lines = [f"Translation: Fake translation of \"{text}\"", ""]
+    for sentence in split_sentences(text) or [text]:
+        lines += [f"## {sentence}", f"Translation: Fake translation of \"{sentence}\""]
+        for word in _WORD_RE.findall(sentence):
+            lines.append(f"* **{word}** word \"fake-{word.lower()}\" - {word} is a fake word entry.")
+        lines.append("")
+    return "\n".join(lines).strip()
+
+
+def fake_response(request, variant=0):
+    """
+    Deterministic answer to a request, in the format its prompt asks for
+
+    Args:
+        request: A prompt string or a list of LangChain messages
+        variant (int): Varies otherwise identical greetings
+
+    Returns:
+        str: The response text
+    """
+    prompt = _last_text(request)
+    system_prompt = request if isinstance(request, str) else getattr(request[0], 'content', '')
+    if request and _COMBINED_RE.search(system_prompt):
+        match = _COMBINED_MESSAGE_RE.search(prompt) if isinstance(request, str) else None
+        message = match.group('message') if match else prompt
+        return json.dumps({'corrected': message, 'reply': _fake_reply(message)}, ensure_ascii=False)
+    if isinstance(request, str) or len(request) == 1:
+        # Analysis prompts first: their example mentions "a common greeting in Spanish."
+        match = _ANALYSIS_RE.search(prompt)
+        if match:
+            return _fake_analysis(match.group('text'))
+        match = _WELCOME_RE.search(prompt)
+        if match:
+            return f"Hello! This is fake {match.group('language')} greeting number {variant}. How are you?"
+        match = _CORRECTION_RE.search(prompt)
+        if match:
+            return match.group('message')
+        match = _BATCH_RE.search(prompt)
+        if match:
+            words = json.loads(match.group('words'))
+            return json.dumps({word: _fake_translation(word) for word in words}, ensure_ascii=False)
+        match = _TRANSLATION_RE.search(prompt)
+        if match:
+            return _fake_translation(match.group('word'))
+        if 'running summary' in prompt:
+            return "The learner and the tutor had a fake conversation."
+    return _fake_reply(prompt)
+
+
+def _fake_reply(prompt):
+    digest = int(hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:6], 16)
+    return f"That is interesting! This is fake tutor reply {digest % 1000}. What else would you like to talk about?"
+
+
+# -------------------------------------------------------------------------
+# Cassettes
+# -------------------------------------------------------------------------
+
+class Cassette:
+    """
+    Request/response recordings in a JSON Lines file.
+
+    Args:
+        path (str): Path of the cassette file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        # Later recordings of the same request win
+                        self._entries[entry['key']] = entry
+        logger.info(f"Loaded {len(self._entries)} recordings from cassette {path}")
+
+    def record(self, request, text, latency):
+        entry = {'key': request_key(request), 'prompt': _last_text(request)[:200],
+                 'response': text, 'latencyMs': round(latency * 1000, 1)}
+        with self._lock:
+            self._entries[entry['key']] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def lookup(self, request):
+        """The recorded entry for a request, or None."""
+        with self._lock:
+            return self._entries.get(request_key(request))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# -------------------------------------------------------------------------
+# Backends
+# -------------------------------------------------------------------------
+
+class LLMBackend:
+    """
+    Source of the model objects used by gemini_service.py.
+
+    Subclasses implement generative_model() for the direct path and
+    chat_model() for the LangChain path.
+    """
+
+    name = 'base'
+    # Offline backends work without an API key
+    offline = False
+
+    def generative_model(self, api_key):
+        raise NotImplementedError
+
+    def chat_model(self, api_key, purpose, temperature, **kwargs):
+        raise NotImplementedError
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+class GeminiBackend(LLMBackend):
+    """The real Gemini models from the shared client registry."""
+
+    name = 'gemini'
+
+    def __init__(self):
+        # Imported here so offline backends do not register the Gemini SDKs
+        # for the import warm-up; the registry itself imports them lazily
+        import gemini_clients
+        self.clients = gemini_clients
+
+    def generative_model(self, api_key):
+        return self.clients.get_generative_model(api_key)
+
+    def chat_model(self, api_key, purpose, temperature, **kwargs):
+        return self.clients.get_chat_model(api_key, purpose=purpose, temperature=temperature, **kwargs)
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic local fake with log-normal latency and random failures.
+
+    Args:
+        latency_ms (float): Median latency in milliseconds
+        sigma (float): Spread of the log-normal latency distribution
+        failure_rate (float): Fraction of calls failing with a 503
+        rate_limit_rate (float): Fraction of calls failing with a 429
+        seed (int): Seed of the latency and failure draws
+    """
+
+    name = 'fake'
+    offline = True
+
+    def __init__(self, latency_ms=FAKE_LLM_LATENCY_MS, sigma=FAKE_LLM_LATENCY_SIGMA,
+                 failure_rate=FAKE_LLM_FAILURE_RATE, rate_limit_rate=FAKE_LLM_RATE_LIMIT_RATE,
+                 seed=FAKE_LLM_SEED):
+        self.latency = latency_ms / 1000.0
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {'calls': 0, 'failures': 0, 'rateLimited': 0}
+        self._model = _CannedModel(self.answer)
+
+    def answer(self, request):
+        """
+        Draw the outcome of one call
+
+        Returns:
+            tuple: (response text, latency in seconds)
+
+        Raises:
+            FakeBackendError, FakeRateLimitError: For simulated failures; the
+                model surface waits a FakeBackendError's latency before raising it
+        """
+        with self._lock:
+            self.counts['calls'] += 1
+            calls = self.counts['calls']
+            latency = self.latency * math.exp(self.sigma * self._random.gauss(0, 1))
+            draw = self._random.random()
+            if draw < self.rate_limit_rate:
+                self.counts['rateLimited'] += 1
+            elif draw < self.rate_limit_rate + self.failure_rate:
+                self.counts['failures'] += 1
+        if draw < self.rate_limit_rate:
+            raise FakeRateLimitError("429 Resource has been exhausted (fake backend)")
+        if draw < self.rate_limit_rate + self.failure_rate:
+            raise FakeBackendError("503 Service Unavailable (fake backend)", latency=latency)
+        return fake_response(request, variant=calls), latency
+
+    def generative_model(self, api_key):
+        return self._model
+
+    def chat_model(self, api_key, purpose, temperature, **kwargs):
+        return self._model
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, backend=self.name, medianLatencyMs=self.latency * 1000)
+
+
+class RecordingBackend(LLMBackend):
+    """
+    A backend whose responses are appended to a cassette.
+
+    Args:
+        inner (LLMBackend): The backend that answers (normally Gemini)
+        cassette (Cassette): Where the responses are recorded
+    """
+
+    name = 'record'
+
+    def __init__(self, inner, cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    def generative_model(self, api_key):
+        return _RecordingModel(self.inner.generative_model(api_key), self.cassette)
+
+    def chat_model(self, api_key, purpose, temperature, **kwargs):
+        return _RecordingModel(self.inner.chat_model(api_key, purpose, temperature, **kwargs), self.cassette)
+
+    def stats(self):
+        return {'backend': self.name, 'recordings': len(self.cassette)}
+
+
+class ReplayBackend(LLMBackend):
+    """
+    Canned responses served from a cassette.
+
+    Args:
+        cassette (Cassette): The recordings to serve
+        miss (str): "error" raises CassetteMiss for unknown requests, "fake"
+                    answers them like the fake backend
+        timing (str): "recorded" waits the recorded latency, "none" answers at once
+    """
+
+    name = 'replay'
+    offline = True
+
+    def __init__(self, cassette, miss=LLM_REPLAY_MISS, timing=LLM_REPLAY_TIMING):
+        self.cassette = cassette
+        self.miss = miss
+        self.timing = timing
+        self._lock = threading.Lock()
+        self.counts = {'hits': 0, 'misses': 0}
+        self._model = _CannedModel(self.answer)
+
+    def answer(self, request):
+        entry = self.cassette.lookup(request)
+        with self._lock:
+            self.counts['hits' if entry else 'misses'] += 1
+        if entry is None:
+            if self.miss == 'fake':
+                return fake_response(request), 0.0
+            raise CassetteMiss(f"No recording for request {request_key(request)[:12]}")
+        latency = entry.get('latencyMs', 0) / 1000.0 if self.timing == 'recorded' else 0.0
+        return entry['response'], latency
+
+    def generative_model(self, api_key):
+        return self._model
+
+    def chat_model(self, api_key, purpose, temperature, **kwargs):
+        return self._model
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, backend=self.name, recordings=len(self.cassette))
+
+
+def create_backend(name=LLM_BACKEND, cassette_path=LLM_CASSETTE):
+    """
+    Create a backend by name
+
+    Args:
+        name (str): gemini, fake, record or replay
+        cassette_path (str): Cassette file for record and replay
+
+    Returns:
+        LLMBackend: The backend
+
+    Raises:
+        ValueError: For an unknown backend name
+    """
+    if name == 'gemini':
+        return GeminiBackend()
+    if name == 'fake':
+        return FakeBackend()
+    if name == 'record':
+        return RecordingBackend(GeminiBackend(), Cassette(cassette_path))
+    if name == 'replay':
+        return ReplayBackend(Cassette(cassette_path))
+    raise ValueError(f"Unknown LLM_BACKEND '{name}' (expected gemini, fake, record or replay)")
+
+
+# The process-wide backend, configured by LLM_BACKEND
+backend = create_backend()
+if backend.name != 'gemini':
+    logger.info(f"Using the '{backend.name}' LLM backend")
+
+
+def get_generative_model(api_key):
+    """Model object for the direct path from the configured backend."""
+    return backend.generative_model(api_key)
+
+
+def get_chat_model(api_key, purpose, temperature, **kwargs):
+    """Chat model for the LangChain path from the configured backend."""
+    return backend.chat_model(api_key, purpose, temperature, **kwargs)
@@ -0,0 +1,285 @@
+# -------------------------------------------------------------------------
+# metrics.py - Latency Histograms, /metrics and Server-Timing
+# -------------------------------------------------------------------------
+# A slow /api/chat can be caused by the correction, loading the
+# conversation memory, prompt assembly, the upstream call or a fallback
+# path. This module keeps Prometheus-style counters and histograms for:
+#
+# - request latency per endpoint and status
+# - stage latency per endpoint and stage (correction, memory, prompt,
+#   upstream-<endpoint>, save, ...)
+# - upstream attempts per request, and attempts per upstream path
+# - which path served each upstream request (direct, langchain, fallback,
+#   pool, cache, lexicon, fast-path)
+# - prompt and response sizes in characters
+# - time spent waiting for an upstream slot per priority class (see
+#   scheduler.py)
+#
+# They are exposed in the Prometheus text format at /metrics. The stages of
+# the current request are also collected in a context variable and returned
+# in a Server-Timing header, so browser dev tools show where a request
+# spent its time. Metrics are per process; with several gunicorn workers
+# each scrape sees the worker that answered it.
+#
+# Configuration (environment variables):
+# - SERVER_TIMING: "0"/"false" to omit the Server-Timing header (default enabled)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING", "1").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536)
+ATTEMPT_BUCKETS = (0, 1, 2, 3, 4, 6, 8)
+
+# Endpoint label of work done outside a request (e.g. background threads)
+BACKGROUND = 'background'
+
+# Every metric, in registration order
+_registry = []
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    """
+    A monotonically increasing count per label set.
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Label names
+    """
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [f"{self.name}_total{_format_labels(self.labelnames, key)} {value}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum and count per label set.
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Label names
+        buckets (tuple): Upper bounds of the buckets, ascending
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+request_seconds = Histogram(
+    'languagepal_request_seconds', 'Request latency by endpoint and status', ('endpoint', 'status')
+)
+stage_seconds = Histogram(
+    'languagepal_stage_seconds', 'Latency of request stages by endpoint and stage', ('endpoint', 'stage')
+)
+upstream_attempts_per_request = Histogram(
+    'languagepal_upstream_attempts_per_request', 'Upstream model calls started per API request',
+    ('endpoint',), ATTEMPT_BUCKETS
+)
+upstream_attempts = Counter(
+    'languagepal_upstream_attempts', 'Upstream model calls started by upstream endpoint and path',
+    ('upstream', 'path')
+)
+served = Counter(
+    'languagepal_served', 'Upstream requests by the path that served them', ('upstream', 'path')
+)
+prompt_chars = Histogram(
+    'languagepal_prompt_chars', 'Prompt size in characters', ('upstream',), SIZE_BUCKETS
+)
+response_chars = Histogram(
+    'languagepal_response_chars', 'Response size in characters', ('upstream',), SIZE_BUCKETS
+)
+queue_seconds = Histogram(
+    'languagepal_upstream_queue_seconds', 'Time spent waiting for an upstream slot by priority class',
+    ('priority',)
+)
+
+
+# -------------------------------------------------------------------------
+# Per-Request Timings
+# -------------------------------------------------------------------------
+
+class RequestTimings:
+    """Stages and upstream attempts of one request (shared with its worker threads)."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            # Repeated stages (e.g. several upstream calls) are summed
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def attempt(self):
+        with self._lock:
+            self.attempts += 1
+
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def start_request(endpoint):
+    """
+    Start collecting the timings of a request in the current context
+
+    Args:
+        endpoint (str): Endpoint label, e.g. the URL rule "/api/chat"
+    """
+    _current.set(RequestTimings(endpoint))
+
+
+def finish_request(status):
+    """Record the current request's latency and stop collecting its timings."""
+    timings = _current.get()
+    if timings is None:
+        return
+    _current.set(None)
+    request_seconds.observe(time.perf_counter() - timings.started,
+                            endpoint=timings.endpoint, status=str(status))
+    if timings.endpoint.startswith('/api/'):
+        upstream_attempts_per_request.observe(timings.attempts, endpoint=timings.endpoint)
+
+
+def current_endpoint():
+    timings = _current.get()
+    return timings.endpoint if timings is not None else BACKGROUND
+
+
+def observe_stage(name, seconds):
+    """Record a stage duration for the current request."""
+    timings = _current.get()
+    stage_seconds.observe(seconds, endpoint=timings.endpoint if timings else BACKGROUND, stage=name)
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as a stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def record_attempt(upstream, path):
+    """Count an upstream model call that is about to start."""
+    upstream_attempts.inc(upstream=upstream, path=path)
+    timings = _current.get()
+    if timings is not None:
+        timings.attempt()
+
+
+def record_served(upstream, path):
+    """Count which path served an upstream request."""
+    served.inc(upstream=upstream, path=path)
+
+
+def record_sizes(upstream, prompt_size, response_size):
+    """Record prompt and response sizes (in characters) of an upstream request."""
+    prompt_chars.observe(prompt_size, upstream=upstream)
+    response_chars.observe(response_size, upstream=upstream)
+
+
+def record_queue_wait(priority, seconds):
+    """Record the time a request waited for an upstream slot."""
+    queue_seconds.observe(seconds, priority=priority)
+    if seconds > 0.001:
+        observe_stage('queue', seconds)
+
+
+def server_timing():
+    """
+    Server-Timing header value for the current request
+
+    Returns:
+        str: e.g. "correction;dur=412.3, memory;dur=0.8, total;dur=1290.2", or None
+    """
+    timings = _current.get()
+    if timings is None or not SERVER_TIMING_ENABLED:
+        return None
+    with timings._lock:
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.stages.items()]
+    entries.append(f"total;dur={(time.perf_counter() - timings.started) * 1000:.1f}")
+    return ", ".join(entries)
@@ -0,0 +1,152 @@
+# -------------------------------------------------------------------------
+# pretranslation.py - Background Pre-Translation of Tutor Replies
+# -------------------------------------------------------------------------
+# Click-to-translate is only fast when the clicked word is already in the
+# translation cache. Learners mostly click words of the tutor's latest
+# reply, so once a reply is produced its distinct words are queued for
+# translation in the background, before anyone clicks.
+#
+# This is strictly best-effort work: the queue is bounded and replies are
+# skipped when it is full, workers hold back while many foreground API
+# requests are in flight, and jobs that waited too long are dropped.
+#
+# Configuration (environment variables):
+# - PRETRANSLATE: "0"/"false" to disable (default enabled)
+# - PRETRANSLATE_WORKERS: number of worker threads (default 2)
+# - PRETRANSLATE_QUEUE: maximum number of queued replies (default 64)
+# - PRETRANSLATE_BUSY_REQUESTS: foreground requests in flight above which
+#   workers wait (default 8)
+# - PRETRANSLATE_MAX_AGE: seconds after which a queued reply is dropped (default 120)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import logging
+import os
+import queue
+import threading
+import time
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+PRETRANSLATE_ENABLED = os.environ.get("PRETRANSLATE", "1").lower() in ("1", "true", "yes")
+PRETRANSLATE_WORKERS = int(os.environ.get("PRETRANSLATE_WORKERS", "2"))
+PRETRANSLATE_QUEUE = int(os.environ.get("PRETRANSLATE_QUEUE", "64"))
+PRETRANSLATE_BUSY_REQUESTS = int(os.environ.get("PRETRANSLATE_BUSY_REQUESTS", "8"))
+PRETRANSLATE_MAX_AGE = float(os.environ.get("PRETRANSLATE_MAX_AGE", "120"))
+
+
+class ForegroundLoad:
+    """Thread-safe count of foreground (user-facing) requests in flight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def enter(self):
+        with self._lock:
+            self.active += 1
+
+    def exit(self):
+        with self._lock:
+            self.active -= 1
+
+
+# Updated by the WSGI and ASGI apps around every /api request
+foreground_load = ForegroundLoad()
+
+
+class Pretranslator:
+    """
+    Bounded background queue of words to translate ahead of time.
+
+    Args:
+        translate (callable): translate(words, language), fills the translation cache
+        is_cached (callable): is_cached(word, language) -> bool
+        load (ForegroundLoad): Foreground request counter used to back off
+        workers (int): Number of worker threads
+        max_queue (int): Maximum number of queued jobs
+        busy_requests (int): Foreground requests in flight above which workers wait
+        max_age (float): Seconds after which a queued job is dropped
+    """
+
+    def __init__(self, translate, is_cached, load=foreground_load, workers=PRETRANSLATE_WORKERS,
+                 max_queue=PRETRANSLATE_QUEUE, busy_requests=PRETRANSLATE_BUSY_REQUESTS,
+                 max_age=PRETRANSLATE_MAX_AGE):
+        self.translate = translate
+        self.is_cached = is_cached
+        self.load = load
+        self.busy_requests = busy_requests
+        self.max_age = max_age
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.counts = {'queued': 0, 'skipped': 0, 'deferred': 0, 'expired': 0,
+                       'completed': 0, 'failed': 0, 'wordsTranslated': 0}
+        for number in range(workers):
+            threading.Thread(target=self._work, name=f"pretranslate-{number}", daemon=True).start()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def submit(self, words, language):
+        """
+        Queue words for translation unless the queue is full.
+
+        Returns:
+            bool: True if the job was queued
+        """
+        if not words:
+            return False
+        try:
+            self._queue.put_nowait((time.monotonic(), list(words), language))
+        except queue.Full:
+            self._count('skipped')
+            return False
+        self._count('queued')
+        return True
+
+    def _work(self):
+        while True:
+            queued_at, words, language = self._queue.get()
+            try:
+                self._run(queued_at, words, language)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, queued_at, words, language):
+        # Hold back while the foreground is busy
+        deferred = False
+        while self.load.active > self.busy_requests and time.monotonic() - queued_at < self.max_age:
+            deferred = True
+            time.sleep(0.1)
+        if deferred:
+            self._count('deferred')
+        if time.monotonic() - queued_at >= self.max_age:
+            self._count('expired')
+            return
+
+        # Words may have been translated (e.g. clicked) while the job waited
+        missing = [word for word in words if not self.is_cached(word, language)]
+        if not missing:
+            self._count('completed')
+            return
+        try:
+            self.translate(missing, language)
+        except Exception as e:
+            logger.warning(f"Pre-translation failed: {str(e)}")
+            self._count('failed')
+            return
+        self._count('completed')
+        self._count('wordsTranslated', len(missing))
+        logger.debug(f"Pre-translated {len(missing)} {language} words")
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self.counts)
+        snapshot.update({
+            'enabled': PRETRANSLATE_ENABLED,
+            'queueDepth': self._queue.qsize(),
+            'foregroundRequests': self.load.active
+        })
+        return snapshot
@@ -0,0 +1,549 @@
+# -------------------------------------------------------------------------
+# resilience.py - Deadlines, Circuit Breakers, Hedging and Retries
+# -------------------------------------------------------------------------
+# Every service function has two upstream paths: the direct Gemini API and
+# the LangChain client. Trying them strictly one after the other doubles
+# latency during an upstream brownout, and nothing bounds how long a call
+# may take. An UpstreamPolicy runs the paths of one endpoint with:
+#
+# - a deadline budget per endpoint; callers get DeadlineExceeded instead of
+#   waiting indefinitely (the abandoned call finishes in the background)
+# - a circuit breaker per endpoint and path that opens after consecutive
+#   failures, so a failing path is skipped until a trial call succeeds
+#   again; a threaded call that outlives the deadline counts by its real
+#   outcome once it finishes
+# - optional hedging: if the first path has not answered within its
+#   observed p95 latency, the next path is started as well and the first
+#   answer wins
+# - retries with full jitter for rate-limited (429) responses, honoring the
+#   retry delay the server asks for, within the deadline
+#
+# Paths are plain callables (coroutine functions for call_async), so the
+# policy can be exercised against a local fake backend. Every attempt
+# waits for a slot of the upstream scheduler (see scheduler.py) and holds
+# it until the upstream call has finished, even when the caller stopped
+# waiting at the deadline; retry backoff does not hold a slot, and a hedge
+# is only started if a slot is free. The deadline starts once the first
+# slot is granted.
+#
+# Configuration (environment variables):
+# - UPSTREAM_DEADLINE_<ENDPOINT>: deadline in seconds, e.g. UPSTREAM_DEADLINE_TRANSLATION
+# - UPSTREAM_HEDGE: comma-separated endpoints that use hedged requests (default none)
+# - UPSTREAM_MAX_RETRIES: retries of a rate-limited call (default 2)
+# - UPSTREAM_RETRY_BASE: base of the exponential retry backoff in seconds (default 0.5)
+# - CIRCUIT_FAILURE_THRESHOLD: consecutive failures that open a breaker (default 5)
+# - CIRCUIT_RESET_TIMEOUT: seconds before an open breaker allows a trial call (default 30)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Application-specific imports
+import metrics
+from scheduler import scheduler
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+# Default deadline budgets in seconds per endpoint
+DEFAULT_DEADLINES = {
+    'welcome': 10.0,
+    'correction': 10.0,
+    'conversation': 30.0,
+    'translation': 10.0,
+    'analysis': 45.0,
+    'summary': 30.0,
+    'combined': 30.0,
+}
+HEDGED_ENDPOINTS = {name.strip() for name in os.environ.get("UPSTREAM_HEDGE", "").split(",") if name.strip()}
+UPSTREAM_MAX_RETRIES = int(os.environ.get("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_RETRY_BASE = float(os.environ.get("UPSTREAM_RETRY_BASE", "0.5"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", "30"))
+
+# Hedging needs this many latency samples before it trusts the p95
+MIN_HEDGE_SAMPLES = 20
+
+# Upstream calls run here so the caller can stop waiting at the deadline
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("UPSTREAM_WORKERS", "32")),
+    thread_name_prefix="upstream-call"
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The endpoint's deadline passed before any path answered."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Every path of the endpoint is skipped because its circuit breaker is open."""
+
+
+# -------------------------------------------------------------------------
+# Rate Limit Detection
+# -------------------------------------------------------------------------
+
+_RETRY_DELAY_RES = [
+    re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)'),
+    re.compile(r'retry (?:in|after) (\d+(?:\.\d+)?)\s*s', re.IGNORECASE),
+]
+
+
+def is_rate_limited(error):
+    """Whether an exception is a 429 / resource exhausted response."""
+    for attribute in ('code', 'status_code', 'status'):
+        value = getattr(error, attribute, None)
+        if value == 429 or getattr(value, 'value', None) == 429:
+            return True
+    return type(error).__name__ == 'ResourceExhausted'
+
+
+def retry_after(error):
+    """The retry delay the server asked for in seconds, or None."""
+    value = getattr(error, 'retry_after', None)
+    if value is not None:
+        return float(value)
+    for pattern in _RETRY_DELAY_RES:
+        match = pattern.search(str(error))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+# -------------------------------------------------------------------------
+# Circuit Breaker and Latency Tracking
+# -------------------------------------------------------------------------
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls pass. Open: calls are skipped until reset_timeout has
+    passed. Then a single trial call is let through (half-open); its
+    success closes the breaker, its failure opens it again. A trial whose
+    outcome is never reported is replaced after another reset_timeout.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.skipped = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+                # Also marks the start of the trial call
+                self.opened_at = time.monotonic()
+                return True
+            self.skipped += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                    logger.warning(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures,
+                    'timesOpened': self.times_opened, 'skipped': self.skipped}
+
+
+class LatencyWindow:
+    """The most recent latencies of a path, for percentile estimates."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction, min_samples=1):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+# (endpoint, path) -> CircuitBreaker; a path that fails for one endpoint
+# (e.g. long analysis prompts) is not skipped for the others
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(endpoint, path):
+    """Return the circuit breaker of an endpoint's upstream path, creating it if needed."""
+    key = (endpoint, path)
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(f"{endpoint}/{path}")
+        return _breakers[key]
+
+
+# -------------------------------------------------------------------------
+# Upstream Policy
+# -------------------------------------------------------------------------
+
+class UpstreamPolicy:
+    """
+    Runs the upstream paths of one endpoint with a deadline, circuit
+    breakers, optional hedging and rate-limit retries.
+
+    Args:
+        name (str): Endpoint name (e.g. "translation")
+        deadline (float): Deadline budget in seconds
+        hedge (bool): Whether to hedge with the next path after the observed p95
+        max_retries (int): Retries of a rate-limited call
+        retry_base (float): Base of the exponential backoff in seconds
+    """
+
+    def __init__(self, name, deadline, hedge=False, max_retries=UPSTREAM_MAX_RETRIES,
+                 retry_base=UPSTREAM_RETRY_BASE):
+        self.name = name
+        self.deadline = deadline
+        self.hedge = hedge
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self._latencies = {}
+        self._lock = threading.Lock()
+        # Held while an outcome is recorded, so a caller that finds the call
+        # already settled by its done callback also sees the breaker updated
+        self._settle_lock = threading.Lock()
+        self.counts = {'calls': 0, 'fallbacks': 0, 'hedges': 0, 'hedgeWins': 0,
+                       'retries': 0, 'deadlineExceeded': 0, 'circuitOpen': 0, 'failures': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _latency(self, path):
+        with self._lock:
+            if path not in self._latencies:
+                self._latencies[path] = LatencyWindow()
+            return self._latencies[path]
+
+    def _hedge_delay(self, path):
+        return self._latency(path).percentile(0.95, MIN_HEDGE_SAMPLES)
+
+    def _settle(self, attempt, error=None):
+        """Record the outcome of a path call once (later reports are ignored)."""
+        with self._settle_lock:
+            if attempt['settled']:
+                return
+            attempt['settled'] = True
+            path = attempt['path']
+            if error is None:
+                breaker(self.name, path).success()
+                self._latency(path).add(time.monotonic() - attempt['started'])
+            elif not is_rate_limited(error):
+                # Rate limits are retried, they do not mean the path is broken
+                breaker(self.name, path).failure()
+
+    def _finished(self, attempt, finished):
+        """Done callback of a path call: frees its upstream slot and settles it."""
+        scheduler.release()
+        # Also settles calls that lost a hedge or outlived the caller
+        if not finished.cancelled():
+            self._settle(attempt, finished.exception())
+
+    def _start(self, path, fn):
+        """Start a path call that owns the caller's upstream slot until it finishes."""
+        metrics.record_attempt(self.name, path)
+        attempt = {'path': path, 'started': time.monotonic(), 'settled': False}
+        try:
+            future = _executor.submit(fn)
+        except Exception:
+            scheduler.release()
+            raise
+        future.add_done_callback(lambda finished: self._finished(attempt, finished))
+        return future, attempt
+
+    def _start_async(self, path, fn):
+        """Async variant of _start(); fn is a coroutine function."""
+        metrics.record_attempt(self.name, path)
+        attempt = {'path': path, 'started': time.monotonic(), 'settled': False}
+        try:
+            task = asyncio.ensure_future(fn())
+        except Exception:
+            scheduler.release()
+            raise
+        task.add_done_callback(lambda finished: self._finished(attempt, finished))
+        return task, attempt
+
+    def _start_hedge(self, hedge):
+        """Start the hedge path if a slot is free right now; returns (future, attempt) or None."""
+        if not scheduler.try_acquire(self.name):
+            return None
+        if not breaker(self.name, hedge[0]).allow():
+            scheduler.release()
+            return None
+        self._count('hedges')
+        return self._start(*hedge)
+
+    def _deadline_exceeded(self, cancelled=()):
+        # Abandoned threaded calls are settled by their done callback once they
+        # finish; async calls are cancelled, so not answering in time is their outcome
+        for attempt in cancelled:
+            self._settle(attempt, DeadlineExceeded())
+        self._count('deadlineExceeded')
+        return DeadlineExceeded(f"{self.name} deadline of {self.deadline}s exceeded")
+
+    def _retry_delay(self, attempt, error, deadline):
+        """Seconds to wait before retrying, or None if the error is not retried."""
+        if not is_rate_limited(error) or attempt == self.max_retries:
+            return None
+        # Full jitter, unless the server said how long to wait
+        delay = retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, self.retry_base * 2 ** attempt)
+        if time.monotonic() + delay >= deadline:
+            return None
+        self._count('retries')
+        return delay
+
+    # Synchronous callers
+
+    def call(self, paths):
+        """
+        Call the first path that succeeds.
+
+        Args:
+            paths (list): (path name, callable) pairs in order of preference
+
+        Returns:
+            The first successful result
+
+        Raises:
+            QueueFull, QueueTimeout: If no upstream slot was granted
+            DeadlineExceeded: If the deadline passed
+            CircuitOpenError: If every path's breaker is open
+            Exception: The last path's error if every path failed
+        """
+        with metrics.stage(f"upstream-{self.name}"):
+            return self._call(paths)
+
+    def _call(self, paths):
+        self._count('calls')
+        deadline = None
+        last_error = None
+        for index, (path, fn) in enumerate(paths):
+            if not breaker(self.name, path).allow():
+                continue
+            if last_error is not None:
+                self._count('fallbacks')
+            hedge = paths[index + 1] if self.hedge and index + 1 < len(paths) else None
+            for attempt in range(self.max_retries + 1):
+                # The slot passes to the call started by _run()
+                scheduler.acquire(self.name)
+                if deadline is None:
+                    deadline = time.monotonic() + self.deadline
+                try:
+                    return self._run(path, fn, hedge, deadline)
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    last_error = e
+                    delay = self._retry_delay(attempt, e, deadline)
+                    if delay is None:
+                        break
+                    logger.info(f"{self.name} rate limited on {path}, retrying in {delay:.2f}s")
+                    time.sleep(delay)
+        return self._give_up(last_error)
+
+    def _give_up(self, last_error):
+        if last_error is None:
+            self._count('circuitOpen')
+            raise CircuitOpenError(f"All upstream paths for {self.name} are unavailable")
+        self._count('failures')
+        raise last_error
+
+    def _run(self, path, fn, hedge, deadline):
+        """Run one attempt; the caller holds an upstream slot for it."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            scheduler.release()
+            raise self._deadline_exceeded()
+        future, attempt = self._start(path, fn)
+        attempts = {future: attempt}
+
+        hedge_delay = self._hedge_delay(path) if hedge else None
+        if hedge_delay is not None and hedge_delay < remaining:
+            done, _ = wait([future], timeout=hedge_delay)
+            started = None if done else self._start_hedge(hedge)
+            if started is not None:
+                attempts[started[0]] = started[1]
+
+        pending = set(attempts)
+        last_error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                # The calls cannot be interrupted; they finish in the background
+                raise self._deadline_exceeded()
+            for future in done:
+                error = future.exception()
+                self._settle(attempts[future], error)
+                if error is not None:
+                    last_error = error
+                    continue
+                if attempts[future]['path'] != path:
+                    self._count('hedgeWins')
+                metrics.record_served(self.name, attempts[future]['path'])
+                return future.result()
+        raise last_error
+
+    # Asynchronous callers
+
+    async def call_async(self, paths):
+        """
+        Async variant of call(); the paths are coroutine functions.
+
+        Unlike threads, calls that lose a hedge or pass the deadline are cancelled.
+        """
+        with metrics.stage(f"upstream-{self.name}"):
+            return await self._call_async(paths)
+
+    async def _call_async(self, paths):
+        self._count('calls')
+        deadline = None
+        last_error = None
+        for index, (path, fn) in enumerate(paths):
+            if not breaker(self.name, path).allow():
+                continue
+            if last_error is not None:
+                self._count('fallbacks')
+            hedge = paths[index + 1] if self.hedge and index + 1 < len(paths) else None
+            for attempt in range(self.max_retries + 1):
+                await scheduler.acquire_async(self.name)
+                if deadline is None:
+                    deadline = time.monotonic() + self.deadline
+                try:
+                    return await self._run_async(path, fn, hedge, deadline)
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    last_error = e
+                    delay = self._retry_delay(attempt, e, deadline)
+                    if delay is None:
+                        break
+                    logger.info(f"{self.name} rate limited on {path}, retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+        return self._give_up(last_error)
+
+    async def _run_async(self, path, fn, hedge, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            scheduler.release()
+            raise self._deadline_exceeded()
+        task, attempt = self._start_async(path, fn)
+        attempts = {task: attempt}
+
+        try:
+            hedge_delay = self._hedge_delay(path) if hedge else None
+            if hedge_delay is not None and hedge_delay < remaining:
+                done, _ = await asyncio.wait([task], timeout=hedge_delay)
+                if not done and scheduler.try_acquire(self.name):
+                    if breaker(self.name, hedge[0]).allow():
+                        self._count('hedges')
+                        hedge_task, hedge_attempt = self._start_async(*hedge)
+                        attempts[hedge_task] = hedge_attempt
+                    else:
+                        scheduler.release()
+
+            pending = set(attempts)
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise self._deadline_exceeded([attempts[task] for task in pending])
+                for task in done:
+                    error = task.exception()
+                    self._settle(attempts[task], error)
+                    if error is not None:
+                        last_error = error
+                        continue
+                    if attempts[task]['path'] != path:
+                        self._count('hedgeWins')
+                    metrics.record_served(self.name, attempts[task]['path'])
+                    return task.result()
+            raise last_error
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self.counts)
+            paths = list(self._latencies.items())
+        snapshot.update({
+            'deadlineSeconds': self.deadline,
+            'hedged': self.hedge,
+            'p95Ms': {path: round(window.percentile(0.95) * 1000, 1)
+                      for path, window in paths if window.percentile(0.95) is not None}
+        })
+        return snapshot
+
+
+# Policies by endpoint name
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def policy(name):
+    """
+    Return the policy of an endpoint, configured from the environment.
+
+    Args:
+        name (str): Endpoint name (e.g. "translation")
+    """
+    with _policies_lock:
+        if name not in _policies:
+            deadline = float(os.environ.get(f"UPSTREAM_DEADLINE_{name.upper()}",
+                                            DEFAULT_DEADLINES.get(name, 30.0)))
+            _policies[name] = UpstreamPolicy(name, deadline, hedge=name in HEDGED_ENDPOINTS)
+        return _policies[name]
+
+
+def stats():
+    """Statistics of every endpoint policy and circuit breaker."""
+    with _policies_lock:
+        policies = list(_policies.values())
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {
+        'endpoints': {p.name: p.stats() for p in policies},
+        'breakers': {b.name: b.snapshot() for b in breakers}
+    }
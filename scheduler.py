@@ -0,0 +1,332 @@
+# -------------------------------------------------------------------------
+# scheduler.py - Priority-Aware Upstream Scheduler
+# -------------------------------------------------------------------------
+# All service functions share one Gemini quota. Without coordination a burst
+# of heavy analyses can hold every upstream slot while learners wait for a
+# click-to-translate lookup or their chat reply. The scheduler bounds the
+# number of upstream requests in flight and hands out free slots by
+# priority class:
+#
+#   translate (click-to-translate) > chat (correction and reply) >
+#   welcome > analysis > background (pre-translation, welcome pool,
+#   rolling summaries and anything else outside a request)
+#
+# Each class has its own queue with a depth limit and a queue-time
+# deadline; a request that finds its queue full, or is still waiting when
+# the deadline passes, fails with QueueFull / QueueTimeout without reaching
+# the upstream API, so the service functions fall back as they do for any
+# other upstream failure. Within a class, waiting sessions are served round
+# robin, so one session's burst does not delay everyone else's requests.
+#
+# A slot is held by each upstream call of an UpstreamPolicy until the call
+# has finished (see resilience.py), and by a streamed reply until the model
+# has finished; the chunks are read ahead of the client, so a slow reader
+# does not hold the slot (see _read_ahead() in gemini_service.py).
+# Queue wait is recorded per class in languagepal_upstream_queue_seconds
+# and as the "queue" stage of the request.
+#
+# Configuration (environment variables):
+# - UPSTREAM_CONCURRENCY: upstream requests in flight at once (default 16)
+# - SCHEDULER_QUEUE_<CLASS>: queue depth limit of a class, e.g. SCHEDULER_QUEUE_ANALYSIS
+# - SCHEDULER_WAIT_<CLASS>: queue-time deadline in seconds of a class
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+# Application-specific imports
+from admission import current_session
+import metrics
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+UPSTREAM_CONCURRENCY = int(os.environ.get("UPSTREAM_CONCURRENCY", "16"))
+
+# Priority classes, highest first: (name, default queue depth, default wait in seconds)
+PRIORITY_CLASSES = (
+    ('translate', 64, 3.0),
+    ('chat', 64, 8.0),
+    ('welcome', 16, 3.0),
+    ('analysis', 16, 15.0),
+    ('background', 256, 60.0),
+)
+
+# Upstream endpoint name -> priority class of requests made while serving a user
+ENDPOINT_CLASSES = {
+    'translation': 'translate',
+    'correction': 'chat',
+    'conversation': 'chat',
+    'combined': 'chat',
+    'welcome': 'welcome',
+    'analysis': 'analysis',
+    'summary': 'background',
+}
+
+
+class QueueFull(RuntimeError):
+    """The priority class's queue is at its depth limit."""
+
+
+class QueueTimeout(TimeoutError):
+    """No upstream slot became free within the class's queue-time deadline."""
+
+
+def priority_class(endpoint):
+    """
+    Priority class of an upstream request
+
+    Work outside a request (background threads) is always "background",
+    e.g. batch translations of the pre-translation queue.
+
+    Args:
+        endpoint (str): Upstream endpoint name (e.g. "translation")
+    """
+    if metrics.current_endpoint() == metrics.BACKGROUND:
+        return 'background'
+    return ENDPOINT_CLASSES.get(endpoint, 'background')
+
+
+class _Waiter:
+    """A queued request, woken from whichever thread releases a slot."""
+
+    def __init__(self, loop=None):
+        self.granted = False
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._future = loop.create_future()
+
+    def wake(self):
+        """Caller holds the scheduler lock and has set granted."""
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self._future.done():
+            self._future.set_result(None)
+
+    def wait(self, timeout):
+        self._event.wait(timeout)
+
+    async def wait_async(self, timeout):
+        try:
+            await asyncio.wait_for(asyncio.shield(self._future), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class _ClassQueue:
+    """Waiters of one priority class, grouped by session for round robin."""
+
+    def __init__(self, name, depth, wait):
+        self.name = name
+        self.depth = depth
+        self.wait = wait
+        self.sessions = OrderedDict()
+        self.size = 0
+        self.counts = {'admitted': 0, 'queued': 0, 'full': 0, 'timedOut': 0}
+        self.wait_total = 0.0
+
+    def push(self, session_id, waiter):
+        self.sessions.setdefault(session_id, deque()).append(waiter)
+        self.size += 1
+
+    def pop(self):
+        """Next waiter: the first of the session least recently served."""
+        session_id, waiters = next(iter(self.sessions.items()))
+        waiter = waiters.popleft()
+        del self.sessions[session_id]
+        if waiters:
+            # The session goes to the back of the line
+            self.sessions[session_id] = waiters
+        self.size -= 1
+        return waiter
+
+    def remove(self, session_id, waiter):
+        waiters = self.sessions.get(session_id)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self.sessions[session_id]
+            self.size -= 1
+
+
+class UpstreamScheduler:
+    """
+    Bounded upstream concurrency with prioritized, per-session fair queues.
+
+    Args:
+        concurrency (int): Upstream requests in flight at once
+    """
+
+    def __init__(self, concurrency=UPSTREAM_CONCURRENCY):
+        self.concurrency = concurrency
+        self.active = 0
+        self._lock = threading.Lock()
+        self._queues = OrderedDict(
+            (name, _ClassQueue(
+                name,
+                int(os.environ.get(f"SCHEDULER_QUEUE_{name.upper()}", depth)),
+                float(os.environ.get(f"SCHEDULER_WAIT_{name.upper()}", wait))
+            ))
+            for name, depth, wait in PRIORITY_CLASSES
+        )
+
+    def _enqueue(self, cls, loop=None):
+        """
+        Take a free slot or join the class's queue
+
+        Returns:
+            tuple: (class queue, waiter or None if a slot was free)
+
+        Raises:
+            QueueFull: If the class's queue is at its depth limit
+        """
+        queue = self._queues[cls]
+        with self._lock:
+            if self.active < self.concurrency:
+                self.active += 1
+                queue.counts['admitted'] += 1
+                return queue, None
+            if queue.size >= queue.depth:
+                queue.counts['full'] += 1
+                raise QueueFull(f"Upstream queue for {cls} requests is full ({queue.depth})")
+            waiter = _Waiter(loop)
+            queue.push(current_session(), waiter)
+            queue.counts['queued'] += 1
+            return queue, waiter
+
+    def _dequeue(self, queue, waiter):
+        """Settle a waiter whose wait ended; raise QueueTimeout if it was not granted a slot."""
+        with self._lock:
+            if waiter.granted:
+                queue.counts['admitted'] += 1
+                return
+            queue.remove(current_session(), waiter)
+            queue.counts['timedOut'] += 1
+        raise QueueTimeout(f"No upstream slot for {queue.name} requests within {queue.wait}s")
+
+    def _abandon(self, queue, waiter):
+        """Settle the waiter of a cancelled task, handing back a slot it was granted meanwhile."""
+        with self._lock:
+            granted = waiter.granted
+            if not granted:
+                queue.remove(current_session(), waiter)
+        if granted:
+            self.release()
+
+    def _record_wait(self, queue, started):
+        waited = time.perf_counter() - started
+        with self._lock:
+            queue.wait_total += waited
+        metrics.record_queue_wait(queue.name, waited)
+
+    def acquire(self, endpoint):
+        """
+        Wait for an upstream slot
+
+        Args:
+            endpoint (str): Upstream endpoint name (e.g. "analysis")
+
+        Raises:
+            QueueFull: If the request's class queue is full
+            QueueTimeout: If no slot became free within the class's deadline
+        """
+        started = time.perf_counter()
+        queue, waiter = self._enqueue(priority_class(endpoint))
+        if waiter is not None:
+            try:
+                waiter.wait(queue.wait)
+            finally:
+                self._dequeue(queue, waiter)
+        self._record_wait(queue, started)
+
+    async def acquire_async(self, endpoint):
+        """Async variant of acquire() that waits without blocking the event loop."""
+        started = time.perf_counter()
+        queue, waiter = self._enqueue(priority_class(endpoint), asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await waiter.wait_async(queue.wait)
+            except asyncio.CancelledError:
+                # Cancellation is not a queue timeout, and a granted slot must not leak
+                self._abandon(queue, waiter)
+                raise
+            self._dequeue(queue, waiter)
+        self._record_wait(queue, started)
+
+    def try_acquire(self, endpoint):
+        """
+        Take an upstream slot only if one is free right now (e.g. for a hedged request)
+
+        Returns:
+            bool: Whether a slot was taken; it must be given back with release()
+        """
+        queue = self._queues[priority_class(endpoint)]
+        with self._lock:
+            if self.active >= self.concurrency:
+                return False
+            self.active += 1
+            queue.counts['admitted'] += 1
+            return True
+
+    def max_wait(self, endpoint):
+        """Queue-time deadline of an endpoint's requests made while serving a user."""
+        return self._queues[ENDPOINT_CLASSES.get(endpoint, 'background')].wait
+
+    def release(self):
+        """Free a slot, handing it to the next waiter of the highest waiting class."""
+        with self._lock:
+            for queue in self._queues.values():
+                if queue.size:
+                    waiter = queue.pop()
+                    waiter.granted = True
+                    waiter.wake()
+                    return
+            self.active -= 1
+
+    @contextmanager
+    def slot(self, endpoint):
+        """Hold an upstream slot for the enclosed block."""
+        self.acquire(endpoint)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, endpoint):
+        """Async variant of slot()."""
+        await self.acquire_async(endpoint)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            classes = {}
+            for name, queue in self._queues.items():
+                waits = queue.counts['admitted']
+                classes[name] = dict(
+                    queue.counts,
+                    waiting=queue.size,
+                    depth=queue.depth,
+                    waitSeconds=queue.wait,
+                    avgWaitMs=round(queue.wait_total * 1000 / waits, 1) if waits else 0.0
+                )
+            return {'concurrency': self.concurrency, 'active': self.active, 'classes': classes}
+
+
+# Shared by all upstream calls of the process
+scheduler = UpstreamScheduler()
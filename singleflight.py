@@ -0,0 +1,171 @@
+# -------------------------------------------------------------------------
+# singleflight.py - Coalescing of Identical In-Flight Requests
+# -------------------------------------------------------------------------
+# When a class opens the same lesson, many students ask for the same
+# translation, analysis or welcome message at the same moment. Caches only
+# help once the first result is in; until then every request would go
+# upstream. A single-flight group lets the first caller for a key (the
+# leader) make the upstream call while concurrent callers with the same key
+# wait for and share its result - or its exception.
+#
+# Both thread-based callers (WSGI) and coroutines (ASGI) are supported.
+# Waiters give up after a timeout with TimeoutError; the upstream call
+# itself is not interrupted. A group's timeout should cover everything the
+# leader's call may take (gemini_service derives it from the endpoint's
+# admission wait, scheduler queue wait and deadline), or waiters fail
+# while the leader still succeeds.
+#
+# Configuration (environment variables):
+# - SINGLEFLIGHT_TIMEOUT: seconds a waiter waits for the leader, overriding
+#   every group's own timeout (default unset)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import asyncio
+import logging
+import os
+import threading
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+SINGLEFLIGHT_TIMEOUT = float(os.environ["SINGLEFLIGHT_TIMEOUT"]) if os.environ.get("SINGLEFLIGHT_TIMEOUT") else None
+# Timeout of a group created without one
+DEFAULT_TIMEOUT = 30.0
+
+# All groups by name, for reporting
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+class _Call:
+    """An in-flight call shared by a leader thread and its waiters."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    A group of keyed calls where concurrent callers of the same key share one call.
+
+    Args:
+        name (str): Name used in logs and statistics
+        timeout (float, optional): Seconds a waiter waits for the leader's result
+                                   (SINGLEFLIGHT_TIMEOUT takes precedence)
+    """
+
+    def __init__(self, name, timeout=None):
+        self.name = name
+        if SINGLEFLIGHT_TIMEOUT is not None:
+            timeout = SINGLEFLIGHT_TIMEOUT
+        self.timeout = timeout if timeout is not None else DEFAULT_TIMEOUT
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.upstream = 0
+        self.collapsed = 0
+        self.errors = 0
+        self.timeouts = 0
+        with _groups_lock:
+            _groups[name] = self
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs), unless a call for the same key is already in flight,
+        in which case wait for that call and return its result.
+
+        Raises:
+            Exception: Whatever the shared call raised
+            TimeoutError: If the shared call did not finish within the timeout
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.upstream += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise TimeoutError(f"Timed out waiting for in-flight {self.name} call")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, coro_factory):
+        """
+        Await coro_factory(), unless a call for the same key is already in flight,
+        in which case await that call's result.
+
+        The shared call runs as its own task, so a caller that is cancelled
+        (e.g. a disconnected client) does not cancel it for the others.
+
+        Raises:
+            Exception: Whatever the shared call raised
+            TimeoutError: If the shared call did not finish within the timeout
+        """
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(coro_factory())
+                task.add_done_callback(lambda finished: self._finish_task(key, finished))
+                self.upstream += 1
+            else:
+                self.collapsed += 1
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"Timed out waiting for in-flight {self.name} call") from None
+
+    def _finish_task(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            if not task.cancelled() and task.exception() is not None:
+                self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'upstreamCalls': self.upstream,
+                'collapsed': self.collapsed,
+                'collapseRate': self.collapsed / self.calls if self.calls else 0.0,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'timeoutSeconds': self.timeout,
+                'inFlight': len(self._calls) + len(self._tasks)
+            }
+
+
+def stats():
+    """Statistics of every single-flight group, by name."""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
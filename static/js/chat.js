@@ -28,6 +28,10 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentVocabularyName = '';
     let messages = [];
     
+    // Word translations by "language|word", as promises so that clicks
+    // during a pending batch request wait for the same request
+    const wordTranslations = new Map();
+    
     // Set initial values for the dropdown badges
     if (languageBadge) {
         languageBadge.textContent = currentLanguage;
@@ -100,13 +104,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
         
         // Load vocabularies from API
-        fetch('/api/vocabulary')
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error(`HTTP error! Status: ${response.status}`);
-                }
-                return response.json();
-            })
+        fetchVocabularySummaries()
             .then(data => {
                 if (!vocabularySelect) return;
                 
@@ -172,6 +170,25 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
+    /**
+     * Fetch the names of all vocabulary lists, page by page
+     * @param {number} page - The page to start from
+     * @returns {Promise<Array>} Vocabulary lists with id, name and language
+     */
+    function fetchVocabularySummaries(page = 1) {
+        return fetch(`/api/vocabulary?page=${page}&per_page=100&include_words=0`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! Status: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                if (!data.hasMore) return data.lists;
+                return fetchVocabularySummaries(page + 1).then(rest => data.lists.concat(rest));
+            });
+    }
+    
     /**
      * Check if user is currently logged in
      * @returns {boolean} Always returns true since we removed authentication
@@ -380,8 +397,12 @@ document.addEventListener('DOMContentLoaded', function() {
         // Show loading indicator
         chatMessages.appendChild(createLoadingMessage());
         
-        // Send to server
-        fetch('/api/chat', {
+        // Send to server and stream the reply as it is generated
+        let streamingElement = null;
+        let streamedText = '';
+        let serverError = null;
+        
+        fetch('/api/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -392,39 +413,74 @@ document.addEventListener('DOMContentLoaded', function() {
                 vocabularyId: currentVocabularyId
             })
         })
-        .then(response => response.json())
-        .then(data => {
+        .then(response => {
+            if (!response.ok || !response.body) {
+                return response.json().then(data => {
+                    const error = new Error(data.error || `HTTP error! Status: ${response.status}`);
+                    // Requests refused by admission control carry a message for the learner
+                    if (data.retryAfter !== undefined) error.userMessage = data.error;
+                    throw error;
+                });
+            }
+            
+            return readEventStream(response, (event, data) => {
+                if (event === 'correction') {
+                    // Show the correction as soon as it arrives
+                    if (data.originalMessage && data.correctedMessage && 
+                        data.originalMessage !== data.correctedMessage) {
+                        messages[messageIndex] = { 
+                            role: 'user', 
+                            content: data.originalMessage,
+                            corrected: data.correctedMessage
+                        };
+                        renderMessages();
+                        chatMessages.appendChild(createLoadingMessage());
+                    }
+                } else if (event === 'chunk') {
+                    // Replace the loading indicator with the reply on the first chunk
+                    if (!streamingElement) {
+                        const loadingElement = document.querySelector('.loading-message');
+                        if (loadingElement) loadingElement.remove();
+                        
+                        streamingElement = document.createElement('div');
+                        streamingElement.className = 'message-bubble assistant-message';
+                        chatMessages.appendChild(streamingElement);
+                    }
+                    
+                    streamedText += data.text;
+                    streamingElement.innerHTML = formatMessageText(streamedText);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event === 'done') {
+                    streamedText = data.response;
+                } else if (event === 'error') {
+                    serverError = data.error;
+                }
+            });
+        })
+        .then(() => {
+            if (serverError) {
+                const error = new Error(serverError);
+                error.userMessage = serverError;
+                throw error;
+            }
+            
             // Remove loading indicator
             const loadingElement = document.querySelector('.loading-message');
             if (loadingElement) loadingElement.remove();
             
-            if (data.error) {
-                // Handle API key errors specially
-                if (data.error.includes('API key') || data.error.includes('not configured')) {
-                    messages.push({ 
-                        role: 'error', 
-                        content: 'API key required. Please set up your Gemini API key to use the chat feature.',
-                        isApiKeyError: true
-                    });
-                } else {
-                    messages.push({ role: 'error', content: data.error });
-                }
+            // Handle API key errors specially
+            if (streamedText.includes('API key') && streamedText.startsWith('Error')) {
+                messages.push({ 
+                    role: 'error', 
+                    content: 'API key required. Please set up your Gemini API key to use the chat feature.',
+                    isApiKeyError: true
+                });
             } else {
-                // Handle message correction if provided
-                if (data.originalMessage && data.correctedMessage && 
-                    data.originalMessage !== data.correctedMessage) {
-                    messages[messageIndex] = { 
-                        role: 'user', 
-                        content: data.originalMessage,
-                        corrected: data.correctedMessage
-                    };
-                }
-                
                 // Add assistant response
-                messages.push({ role: 'assistant', content: data.response });
+                messages.push({ role: 'assistant', content: streamedText });
             }
             
-            // Update UI and save messages
+            // Re-render to attach the analyze button and clickable words
             renderMessages();
             if (!isLoggedIn()) {
                 saveChatMessages(messages);
@@ -433,20 +489,69 @@ document.addEventListener('DOMContentLoaded', function() {
         .catch(error => {
             console.error('Error sending message:', error);
             
-            // Remove loading indicator
+            // Remove loading indicator and any partial reply
             const loadingElement = document.querySelector('.loading-message');
             if (loadingElement) loadingElement.remove();
+            if (streamingElement) streamingElement.remove();
             
             // Show error message
             messages.push({ 
                 role: 'error', 
-                content: 'Error connecting to server. Please try again.'
+                content: error.userMessage || 'Error connecting to server. Please try again.'
             });
             
             renderMessages();
         });
     }
     
+    /**
+     * Read a Server-Sent Events stream from a fetch response
+     * @param {Response} response - The fetch response with an event-stream body
+     * @param {Function} onEvent - Called with (eventName, parsedData) for each event
+     * @returns {Promise} Resolves when the stream ends
+     */
+    function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        const dispatch = (block) => {
+            let event = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            });
+            if (dataLines.length > 0) {
+                onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        };
+        
+        const pump = () => reader.read().then(({ done, value }) => {
+            if (done) {
+                if (buffer.trim()) dispatch(buffer);
+                return;
+            }
+            
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Events are separated by a blank line
+            let boundary = buffer.indexOf('\n\n');
+            while (boundary !== -1) {
+                dispatch(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                boundary = buffer.indexOf('\n\n');
+            }
+            
+            return pump();
+        });
+        
+        return pump();
+    }
+    
     /**
      * Render all messages in the chat
      */
@@ -617,7 +722,7 @@ document.addEventListener('DOMContentLoaded', function() {
                             const x = rect.left + window.scrollX;
                             const y = rect.top + window.scrollY;
                             console.log('Translating word:', word);
-                            showWordTranslation(word, currentLanguage, x, y);
+                            showWordTranslation(word, currentLanguage, x, y, span.closest('.message-bubble'));
                         });
                         
                         fragment.appendChild(span);
@@ -657,8 +762,9 @@ document.addEventListener('DOMContentLoaded', function() {
      * @param {string} language - The source language
      * @param {number} x - X coordinate for popup
      * @param {number} y - Y coordinate for popup
+     * @param {HTMLElement} container - The message the word belongs to
      */
-    function showWordTranslation(word, language, x, y) {
+    function showWordTranslation(word, language, x, y, container) {
         // Create or get existing popup
         let popup = document.getElementById('translation-popup');
         if (!popup) {
@@ -694,38 +800,18 @@ document.addEventListener('DOMContentLoaded', function() {
         `;
         popup.style.display = 'block';
         
-        // Get translation from server
-        fetch('/api/translate-word', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                word: word,
-                language: language
-            })
-        })
-        .then(response => response.json())
-        .then(data => {
-            if (data.error) {
-                popup.innerHTML = `
-                    <div class="p-2">
-                        <div class="alert alert-danger mb-0 p-2 small">
-                            ${data.error}
-                        </div>
-                    </div>
-                `;
-            } else {
-                popup.innerHTML = `
-                    <div class="p-2">
-                        <div class="mb-1 fw-bold">${escapeHtml(word)}</div>
-                        <div class="mb-2 text-light">${formatMessageText(data.translation)}</div>
-                        <button class="btn btn-sm btn-outline-light" onclick="document.getElementById('translation-popup').style.display='none'">
-                            Close
-                        </button>
-                    </div>
-                `;
-            }
+        // Get translation from server (the whole message is translated on first click)
+        getWordTranslation(word, language, container)
+        .then(translation => {
+            popup.innerHTML = `
+                <div class="p-2">
+                    <div class="mb-1 fw-bold">${escapeHtml(word)}</div>
+                    <div class="mb-2 text-light">${formatMessageText(translation)}</div>
+                    <button class="btn btn-sm btn-outline-light" onclick="document.getElementById('translation-popup').style.display='none'">
+                        Close
+                    </button>
+                </div>
+            `;
         })
         .catch(error => {
             console.error('Error translating word:', error);
@@ -739,6 +825,56 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    /**
+     * Get the translation of a word, translating all untranslated words of
+     * its message with a single /api/translate-words request
+     * @param {string} word - The word to translate
+     * @param {string} language - The source language
+     * @param {HTMLElement} container - The message the word belongs to
+     * @returns {Promise<string>} The translation
+     */
+    function getWordTranslation(word, language, container) {
+        const key = `${language}|${word}`;
+        if (wordTranslations.has(key)) return wordTranslations.get(key);
+        
+        // Collect the message's words that are not translated or pending yet
+        const words = new Set([word]);
+        if (container) {
+            container.querySelectorAll('.translatable-word').forEach(span => {
+                const text = span.textContent.trim();
+                if (text && !wordTranslations.has(`${language}|${text}`)) words.add(text);
+            });
+        }
+        const batch = Array.from(words).slice(0, 200);
+        
+        const request = fetch('/api/translate-words', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                words: batch,
+                language: language
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) throw new Error(data.error);
+            // Failed words show the error message but are asked again on the next click
+            (data.failed || []).forEach(failedWord => wordTranslations.delete(`${language}|${failedWord}`));
+            return data.translations;
+        });
+        
+        batch.forEach(batchWord => {
+            const batchKey = `${language}|${batchWord}`;
+            const translation = request.then(translations => translations[batchWord]);
+            // Allow a retry after a failed request
+            translation.catch(() => wordTranslations.delete(batchKey));
+            wordTranslations.set(batchKey, translation);
+        });
+        return wordTranslations.get(key);
+    }
+    
     /**
      * Create an error message element
      * @param {string} content - The error message
@@ -782,20 +918,42 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Analyses still streaming into the modal after another was opened are ignored
+    let analysisRequestId = 0;
+    
     /**
      * Show language analysis for a message
+     * 
+     * The analysis is streamed: the overall translation and each sentence
+     * section are rendered as soon as they arrive, with the loading
+     * indicator below them until the analysis is complete.
      * @param {string} message - The message to analyze
      */
     function showAnalysis(message) {
         if (!analysisModal || !analysisContent || !analysisLoading) return;
         
+        const requestId = ++analysisRequestId;
+        const isCurrent = () => requestId === analysisRequestId;
+        
         // Show modal with loading state
+        analysisContent.innerHTML = '';
         analysisContent.classList.add('d-none');
         analysisLoading.classList.remove('d-none');
         analysisModal.show();
         
+        let translation = null;
+        const sections = [];
+        let analysis = null;
+        let serverError = null;
+        
+        const renderAnalysis = (text) => {
+            // Allow the analysis to control the heading
+            analysisContent.innerHTML = formatMessageText(text);
+            analysisContent.classList.remove('d-none');
+        };
+        
         // Request analysis from server
-        fetch('/api/analyze', {
+        fetch('/api/analyze/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -805,30 +963,58 @@ document.addEventListener('DOMContentLoaded', function() {
                 language: currentLanguage
             })
         })
-        .then(response => response.json())
-        .then(data => {
+        .then(response => {
+            if (!response.ok || !response.body) {
+                return response.json().then(data => {
+                    serverError = data.error || `HTTP error! Status: ${response.status}`;
+                });
+            }
+            
+            return readEventStream(response, (event, data) => {
+                if (!isCurrent()) return;
+                
+                if (event === 'translation') {
+                    // The translation goes on top, even when it arrives last
+                    translation = data.translation;
+                } else if (event === 'section') {
+                    sections.push(data.section);
+                } else if (event === 'done') {
+                    analysis = data.analysis;
+                    return;
+                } else if (event === 'error') {
+                    serverError = data.error;
+                    return;
+                }
+                
+                const parts = translation !== null ? [`Translation: ${translation}`] : [];
+                renderAnalysis(parts.concat(sections).join('\n\n'));
+            });
+        })
+        .then(() => {
+            if (!isCurrent()) return;
+            
             // Hide loading indicator
             analysisLoading.classList.add('d-none');
             
-            if (data.error) {
+            if (serverError) {
                 analysisContent.innerHTML = `
                     <div class="alert alert-danger">
-                        ${data.error}
+                        ${serverError}
                     </div>
                 `;
-            } else {
-                // Allow the analysis to control the heading 
-                analysisContent.innerHTML = formatMessageText(data.analysis);
-                
-                // Enable text selection in the analysis too
-                setupTextSelectionListeners(analysisContent);
+                analysisContent.classList.remove('d-none');
+                return;
             }
             
-            // Show content
-            analysisContent.classList.remove('d-none');
+            // The complete analysis replaces the progressive rendering
+            if (analysis !== null) renderAnalysis(analysis);
+            
+            // Enable text selection in the analysis too
+            setupTextSelectionListeners(analysisContent);
         })
         .catch(error => {
             console.error('Error analyzing message:', error);
+            if (!isCurrent()) return;
             
             // Show error
             analysisLoading.classList.add('d-none');
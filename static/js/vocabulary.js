@@ -22,14 +22,20 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Load vocabulary lists
-    loadVocabularyLists();
+    // Load the first page of vocabulary lists
+    loadVocabularyLists(1);
 
-    function loadVocabularyLists() {
-        fetch('/api/vocabulary')
+    function loadVocabularyLists(page) {
+        // Remove the "load more" button of the previous page
+        const loadMoreBtn = document.getElementById('load-more-vocab-btn');
+        if (loadMoreBtn) loadMoreBtn.closest('.col-12').remove();
+        
+        // Lists arrive sorted by name, one page at a time
+        fetch(`/api/vocabulary?page=${page}`)
             .then(response => response.json())
-            .then(data => {
-                if (data.length === 0) {
+            .then(result => {
+                const data = result.lists;
+                if (page === 1 && data.length === 0) {
                     noVocabMessage.classList.remove('d-none');
                     vocabularyListsContainer.innerHTML = '';
                     return;
@@ -37,13 +43,6 @@ document.addEventListener('DOMContentLoaded', function() {
 
                 // Hide the "no vocabulary" message
                 noVocabMessage.classList.add('d-none');
-                
-                // Sort vocabulary lists alphabetically by name
-                data.sort((a, b) => {
-                    const nameA = a.name.toLowerCase();
-                    const nameB = b.name.toLowerCase();
-                    return nameA.localeCompare(nameB);
-                });
 
                 // Generate HTML for vocabulary lists
                 let html = '';
@@ -108,10 +107,31 @@ document.addEventListener('DOMContentLoaded', function() {
                     `;
                 });
 
-                vocabularyListsContainer.innerHTML = html;
+                // Offer the next page if there is one
+                if (result.hasMore) {
+                    html += `
+                        <div class="col-12 text-center">
+                            <button id="load-more-vocab-btn" class="btn btn-outline-secondary">
+                                <i class="bi bi-chevron-down me-1"></i>Load more
+                            </button>
+                        </div>
+                    `;
+                }
+
+                // Append this page's cards, keeping the listeners of earlier pages
+                const pageContainer = document.createElement('div');
+                pageContainer.innerHTML = html;
+                const newElements = Array.from(pageContainer.children);
+                if (page === 1) vocabularyListsContainer.innerHTML = '';
+                newElements.forEach(element => vocabularyListsContainer.appendChild(element));
+                
+                const newButton = document.getElementById('load-more-vocab-btn');
+                if (newButton) {
+                    newButton.addEventListener('click', () => loadVocabularyLists(page + 1));
+                }
                 
                 // Add event listeners to delete buttons
-                document.querySelectorAll('.delete-vocab-btn').forEach(btn => {
+                newElements.flatMap(element => Array.from(element.querySelectorAll('.delete-vocab-btn'))).forEach(btn => {
                     btn.addEventListener('click', function() {
                         const vocabId = this.dataset.vocabId;
                         const vocabName = this.dataset.vocabName;
@@ -123,7 +143,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
                 
                 // Add event listeners to practice buttons
-                document.querySelectorAll('.practice-btn').forEach(btn => {
+                newElements.flatMap(element => Array.from(element.querySelectorAll('.practice-btn'))).forEach(btn => {
                     btn.addEventListener('click', function(e) {
                         const vocabId = this.dataset.vocabId;
                         // Save this vocabulary ID as the last used vocabulary
@@ -0,0 +1,20 @@
+# -------------------------------------------------------------------------
+# conftest.py - Shared Test Setup
+# -------------------------------------------------------------------------
+# The tests run offline: the fake LLM backend answers every model call and
+# the databases live in a temporary directory. The environment is set
+# before any application module is imported, since they read their
+# configuration at import time.
+# -------------------------------------------------------------------------
+
+import os
+import sys
+import tempfile
+
+_data_dir = tempfile.mkdtemp(prefix="languagepal-tests-")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("CACHE_DB_PATH", os.path.join(_data_dir, "cache.db"))
+os.environ.setdefault("TRANSLATION_CACHE_PREWARM", "0")
+os.environ.setdefault("WELCOME_POOL", "0")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
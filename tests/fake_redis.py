@@ -0,0 +1,108 @@
+"""In-process stand-in for the redis-py commands used by RedisConversationBackend."""
+
+import threading
+import time
+
+
+class FakeRedis:
+    """Strings and lists with expiry; replies are bytes like redis-py's."""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+        self.round_trips = 0
+
+    def _live(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def _command(self, name, *args):
+        with self._lock:
+            return getattr(self, '_' + name)(*args)
+
+    def __getattr__(self, name):
+        if name in _COMMANDS:
+            def command(*args):
+                self.round_trips += 1
+                return self._command(name, *args)
+            return command
+        raise AttributeError(name)
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    # Commands
+
+    def _get(self, key):
+        value = self._live(key)
+        return None if value is None else str(value).encode()
+
+    def _incrby(self, key, amount):
+        value = int(self._live(key) or 0) + amount
+        self._data[key] = value
+        return value
+
+    def _rpush(self, key, *values):
+        items = self._live(key)
+        if items is None:
+            items = self._data[key] = []
+        items.extend(value.encode() for value in values)
+        return len(items)
+
+    def _lrange(self, key, start, stop):
+        items = self._live(key) or []
+        start = max(len(items) + start, 0) if start < 0 else start
+        stop = len(items) + stop if stop < 0 else stop
+        return items[start:stop + 1]
+
+    def _ltrim(self, key, start, stop):
+        items = self._live(key)
+        if items is not None:
+            items[:] = self._lrange(key, start, stop)
+        return True
+
+    def _expire(self, key, seconds):
+        if self._live(key) is None:
+            return False
+        self._expires[key] = time.monotonic() + seconds
+        return True
+
+    def _delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._live(key) is not None:
+                deleted += 1
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return deleted
+
+
+_COMMANDS = ('get', 'incrby', 'rpush', 'lrange', 'ltrim', 'expire', 'delete')
+
+
+class _Pipeline:
+    """Queues commands and runs them atomically in one round trip (MULTI/EXEC)."""
+
+    def __init__(self, client):
+        self._client = client
+        self._queued = []
+
+    def __getattr__(self, name):
+        if name in _COMMANDS:
+            def queue(*args):
+                self._queued.append((name, args))
+                return self
+            return queue
+        raise AttributeError(name)
+
+    def execute(self):
+        client = self._client
+        with client._lock:
+            client.round_trips += 1
+            replies = [client._command(name, *args) for name, args in self._queued]
+        self._queued = []
+        return replies
@@ -0,0 +1,40 @@
+"""Helpers for calling the Server-Sent Events endpoints over WSGI and ASGI."""
+
+import asyncio
+import json
+
+
+def parse_events(text):
+    """(event, payload) pairs of a text/event-stream body."""
+    events = []
+    for block in text.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def asgi_post(path, payload, client=('203.0.113.7', 50000)):
+    """
+    POST a JSON body to the ASGI app
+
+    Returns:
+        tuple: (status, headers dict, body text)
+    """
+    import asgi
+
+    body = json.dumps(payload).encode('utf-8')
+    requests = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    messages = []
+
+    async def receive():
+        return requests.pop(0) if requests else {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'client': client,
+             'headers': [(b'content-type', b'application/json')]}
+    asyncio.run(asgi.application(scope, receive, send))
+    start = messages[0]
+    headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in start['headers']}
+    return start['status'], headers, b''.join(message.get('body', b'') for message in messages[1:]).decode('utf-8')
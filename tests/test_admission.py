@@ -0,0 +1,57 @@
+import pytest
+
+import app
+from admission import AdmissionController, AdmissionRejected, admission, current_session, set_session
+
+
+@pytest.fixture(autouse=True)
+def no_session():
+    set_session(None)
+    yield
+    set_session(None)
+
+
+def test_session_over_its_budget_is_rejected_while_others_are_admitted():
+    controller = AdmissionController(enabled=True, session_rate=0, session_burst=1000, max_wait=0)
+    set_session('heavy')
+    controller.admit('analysis', "palabra " * 100, expected_completion=0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit('analysis', "palabra " * 1000, expected_completion=0)
+    assert rejected.value.status == 429
+    assert controller.counts['rejected'] == 1
+
+    set_session('light')
+    reservation = controller.admit('analysis', "palabra " * 100, expected_completion=0)
+    assert reservation.session_id == 'light'
+
+
+def test_oversized_request_is_answered_with_413(monkeypatch):
+    monkeypatch.setattr(admission, 'max_request_tokens', 50)
+    client = app.app.test_client()
+    response = client.post('/api/analyze', json={'message': "Hola amigo. " * 100, 'language': "Spanish"})
+    assert response.status_code == 413
+    assert "too long" in response.get_json()['error']
+    assert response.headers.get('Retry-After') is None
+
+
+def test_requests_without_a_session_cookie_are_charged_to_the_client_address(monkeypatch):
+    charged = []
+
+    def generate_analysis(message, language):
+        charged.append(current_session())
+        return "Translation: Hello."
+
+    monkeypatch.setattr(app, 'generate_analysis', generate_analysis)
+    for address in ('203.0.113.7', '203.0.113.7', '198.51.100.2'):
+        client = app.app.test_client()
+        response = client.post('/api/analyze', json={'message': "Hola", 'language': "Spanish"},
+                               environ_base={'REMOTE_ADDR': address})
+        assert response.status_code == 200
+    assert charged == ['client:203.0.113.7', 'client:203.0.113.7', 'client:198.51.100.2']
+
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['session_id'] = 'learner-1'
+    client.post('/api/analyze', json={'message': "Hola", 'language': "Spanish"},
+                environ_base={'REMOTE_ADDR': '203.0.113.7'})
+    assert charged[-1] == 'learner-1'
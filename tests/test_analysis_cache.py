@@ -0,0 +1,69 @@
+import pytest
+
+import gemini_service
+import llm_backends
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def in_request(monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    metrics.start_request('/api/analyze')
+    yield
+    metrics.finish_request(200)
+
+
+class _Analyzed(list):
+    """Texts the model was asked to analyze; texts in unparseable get an answer without sections."""
+
+    def __init__(self):
+        super().__init__()
+        self.unparseable = set()
+
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    texts = _Analyzed()
+    fake_response = llm_backends.fake_response
+
+    def respond(request, variant=0):
+        match = llm_backends._ANALYSIS_RE.search(llm_backends._last_text(request))
+        if match:
+            texts.append(match.group('text'))
+            if match.group('text') in texts.unparseable:
+                return "I could not analyze this text."
+        return fake_response(request, variant)
+
+    monkeypatch.setattr(llm_backends, 'fake_response', respond)
+    return texts
+
+
+def test_partial_hit_only_sends_the_new_sentence(analyzed):
+    gemini_service.generate_analysis("Zorro rojo. Zorro azul.", "Spanish")
+    assert analyzed == ["Zorro rojo. Zorro azul."]
+
+    analysis = gemini_service.generate_analysis("Zorro verde. Zorro rojo.", "Spanish")
+    assert analyzed[1:] == ["Zorro verde."]
+    headings = [line for line in analysis.splitlines() if line.startswith("## ")]
+    assert headings == ["## Zorro verde.", "## Zorro rojo."]
+    assert analysis.splitlines()[0] == ('Translation: Fake translation of "Zorro verde." '
+                                        'Fake translation of "Zorro rojo."')
+
+    # Both sentences are cached now
+    gemini_service.generate_analysis("Zorro rojo. Zorro verde. Zorro azul.", "Spanish")
+    assert len(analyzed) == 2
+
+
+def test_unparseable_partial_analysis_falls_back_to_the_whole_message(analyzed):
+    gemini_service.generate_analysis("Lince gris.", "Spanish")
+    analyzed.unparseable.add("Lince pardo.")
+    analysis = gemini_service.generate_analysis("Lince gris. Lince pardo.", "Spanish")
+    assert analyzed[1:] == ["Lince pardo.", "Lince gris. Lince pardo."]
+    assert analysis.startswith('Translation: Fake translation of "Lince gris. Lince pardo."')
+
+
+def test_unparseable_analysis_is_returned_but_not_cached(analyzed):
+    analyzed.unparseable.add("Tejón negro.")
+    assert gemini_service.generate_analysis("Tejón negro.", "Spanish") == "I could not analyze this text."
+    key = gemini_service.analysis_cache_key("Tejón negro.", "Spanish")
+    assert gemini_service.analysis_cache.get(key) is None
@@ -0,0 +1,38 @@
+import app
+
+
+def test_stored_list_is_warmed_once_per_worker(monkeypatch):
+    warmed = []
+    monkeypatch.setattr(app, 'prewarm_translations', lambda words, language: warmed.append((words, language)))
+    list_id = app.vocabulary_store.create('owner-warm', 'Animals', 'Spanish', ['gato', 'perro'])
+
+    with app.app.test_request_context():
+        app.session['vocabulary_owner'] = 'owner-warm'
+        assert app.get_vocabulary_words(list_id) == ['gato', 'perro']
+        assert app.get_vocabulary_words(list_id) == ['gato', 'perro']
+
+    assert warmed == [(['gato', 'perro'], 'Spanish')]
+
+
+def test_vocabulary_lists_are_paged_by_name():
+    for name in ("Lista E", "lista b", "Lista D", "Lista A", "Lista C"):
+        app.vocabulary_store.create('owner-paging', name, 'Spanish', ['gato', 'perro'])
+    app.vocabulary_store.create('owner-other', 'Lista F', 'Spanish', ['casa'])
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['vocabulary_owner'] = 'owner-paging'
+
+    page = client.get('/api/vocabulary?page=2&per_page=2').get_json()
+    assert [vocab['name'] for vocab in page['lists']] == ["Lista C", "Lista D"]
+    assert page['lists'][0]['words'] == ['gato', 'perro']
+    assert (page['page'], page['perPage'], page['total'], page['hasMore']) == (2, 2, 5, True)
+
+    last = client.get('/api/vocabulary?page=3&per_page=2&include_words=0').get_json()
+    assert [vocab['name'] for vocab in last['lists']] == ["Lista E"]
+    assert 'words' not in last['lists'][0]
+    assert last['hasMore'] is False
+
+    # Out-of-range parameters are clamped
+    clamped = client.get('/api/vocabulary?page=0&per_page=1000').get_json()
+    assert (clamped['page'], clamped['perPage']) == (1, 100)
+    assert [vocab['name'] for vocab in clamped['lists']] == ["Lista A", "lista b", "Lista C", "Lista D", "Lista E"]
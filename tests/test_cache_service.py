@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pytest
+
+import app
+import gemini_service
+import llm_backends
+from cache_service import LRUCache, SQLiteCache, TwoTierCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TwoTierCache('test_cache', max_entries=10, db_path=str(tmp_path / "cache.db"))
+
+
+def test_async_reads_only_touch_the_disk_tier_off_the_loop(cache, monkeypatch):
+    cache.set('memory', 'a')
+    cache.disk.set('disk', 'b')
+    disk_reads = []
+    read = cache.disk.get
+
+    def recording_get(key):
+        disk_reads.append((key, threading.current_thread() is threading.main_thread()))
+        return read(key)
+
+    monkeypatch.setattr(cache.disk, 'get', recording_get)
+    assert asyncio.run(cache.get_many_async(['memory', 'disk', 'absent'])) == ['a', 'b', None]
+    assert disk_reads == [('disk', False), ('absent', False)]
+
+    # The disk hit was promoted into memory
+    disk_reads.clear()
+    assert asyncio.run(cache.get_async('disk')) == 'b'
+    assert disk_reads == []
+    assert cache.stats()['memoryHits'] == 2
+    assert cache.stats()['diskHits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_writes_sweep_expired_rows_and_cap_the_table(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('cache_service.time.time', lambda: clock[0])
+    disk = SQLiteCache('sweep_cache', db_path=str(tmp_path / "cache.db"), ttl=60, max_rows=3,
+                       sweep_interval=30)
+    disk.set('stale', 'x')
+    clock[0] += 100
+    for index in range(4):
+        disk.set(f'fresh-{index}', str(index))
+        clock[0] += 1
+    # Only the first fresh write swept; the next sweep waits out the interval
+    assert disk.get('stale') is None and disk.swept == 1
+    clock[0] += 30
+    disk.set('fresh-4', '4')
+    keys = [row[0] for row in disk._conn.execute("SELECT key FROM sweep_cache ORDER BY created_at")]
+    assert keys == ['fresh-2', 'fresh-3', 'fresh-4']
+    assert disk.swept == 3
+
+
+def test_async_writes_batch_the_disk_tier_off_the_loop(cache, monkeypatch):
+    disk_writes = []
+    write = cache.disk.set_many
+
+    def recording_set_many(items):
+        disk_writes.append((list(items), threading.current_thread() is threading.main_thread()))
+        write(items)
+
+    monkeypatch.setattr(cache.disk, 'set_many', recording_set_many)
+    asyncio.run(cache.set_many_async([('a', '1'), ('b', '2')]))
+    assert disk_writes == [([('a', '1'), ('b', '2')], False)]
+    assert cache.memory.get('a') == '1'
+    assert cache.disk.get('b') == '2'
+
+
+def test_click_to_translate_is_answered_from_each_cache_tier(monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    monkeypatch.setattr(gemini_service, 'LEXICON_ENABLED', False)
+    prompts = []
+    fake_response = llm_backends.fake_response
+
+    def respond(request, variant=0):
+        prompts.append(request)
+        return fake_response(request, variant)
+
+    monkeypatch.setattr(llm_backends, 'fake_response', respond)
+    cache = gemini_service.translation_cache
+    client = app.app.test_client()
+
+    def translate():
+        response = client.post('/api/translate-word', json={'word': "¿Mapache?", 'language': "Spanish"})
+        assert response.status_code == 200
+        return response.get_json()['translation']
+
+    translation = translate()
+    assert not gemini_service.is_translation_error(translation)
+    assert len(prompts) == 1
+    before = cache.stats()
+    assert translate() == translation
+    assert cache.stats()['memoryHits'] == before['memoryHits'] + 1
+
+    # Another worker process shares the disk tier but not the memory tier
+    monkeypatch.setattr(cache, 'memory', LRUCache(max_entries=10))
+    assert translate() == translation
+    assert cache.stats()['diskHits'] == before['diskHits'] + 1
+    assert len(prompts) == 1
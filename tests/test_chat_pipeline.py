@@ -0,0 +1,105 @@
+import asyncio
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import chat_pipeline
+from admission import AdmissionRejected
+
+
+def wait_for(condition, timeout=2.0):
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def speculative(monkeypatch):
+    """Speculative mode with 50 ms corrections and replies; returns fresh stats."""
+    corrections = {"Tengo un gato.": "Tengo un gato.", "Yo ser Ana.": "Me llamo Ana."}
+    monkeypatch.setattr(chat_pipeline, 'CHAT_MODE', 'separate')
+    monkeypatch.setattr(chat_pipeline, 'SPECULATIVE_CHAT_ENABLED', True)
+    monkeypatch.setattr(chat_pipeline, 'speculation_stats', chat_pipeline.SpeculationStats())
+    monkeypatch.setattr(chat_pipeline, 'pretranslate_reply', lambda response, language: None)
+
+    def correct(message, language):
+        time.sleep(0.05)
+        return corrections[message]
+
+    def reply(message, language, vocabulary, conversation_id=None, save_to_memory=True):
+        time.sleep(0.05)
+        return f"Reply to {message}"
+
+    async def correct_async(message, language):
+        await asyncio.sleep(0.05)
+        return corrections[message]
+
+    async def reply_async(message, language, vocabulary, conversation_id=None, save_to_memory=True):
+        await asyncio.sleep(0.05)
+        return f"Reply to {message}"
+
+    async def save_async(conversation_id, message, response):
+        pass
+
+    monkeypatch.setattr(chat_pipeline, '_correct', correct)
+    monkeypatch.setattr(chat_pipeline, 'generate_response', reply)
+    monkeypatch.setattr(chat_pipeline, 'save_exchange', lambda conversation_id, message, response: None)
+    monkeypatch.setattr(chat_pipeline, '_correct_async', correct_async)
+    monkeypatch.setattr(chat_pipeline, 'generate_response_async', reply_async)
+    monkeypatch.setattr(chat_pipeline, 'save_exchange_async', save_async)
+    return chat_pipeline.speculation_stats
+
+
+class _PendingExecutor:
+    """Accepts jobs without running them."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+def test_failed_correction_cancels_the_speculative_reply(monkeypatch):
+    executor = _PendingExecutor()
+    monkeypatch.setattr(chat_pipeline, 'CHAT_MODE', 'separate')
+    monkeypatch.setattr(chat_pipeline, 'SPECULATIVE_CHAT_ENABLED', True)
+    monkeypatch.setattr(chat_pipeline, '_executor', executor)
+
+    def refused(message, language):
+        raise AdmissionRejected("Token budget exhausted", retry_after=1.0)
+
+    monkeypatch.setattr(chat_pipeline, '_correct', refused)
+    with pytest.raises(AdmissionRejected):
+        chat_pipeline.run_chat_turn("Hola", "Spanish", [], "pipeline-test")
+    assert [future.cancelled() for future in executor.futures] == [True]
+
+
+def test_misses_count_wasted_time_instead_of_latency_saved(speculative):
+    assert chat_pipeline.run_chat_turn("Tengo un gato.", "Spanish", [], "speculative-hit") == \
+        ("Tengo un gato.", "Reply to Tengo un gato.")
+    assert chat_pipeline.run_chat_turn("Yo ser Ana.", "Spanish", [], "speculative-miss") == \
+        ("Me llamo Ana.", "Reply to Me llamo Ana.")
+    snapshot = speculative.snapshot()
+    assert (snapshot['hits'], snapshot['misses']) == (1, 1)
+    # Only the hit saved latency, and the average is over hits
+    assert snapshot['avgLatencySavedMs'] == snapshot['latencySavedMs'] > 20
+    # The discarded reply's upstream time is counted once it finishes
+    assert wait_for(lambda: speculative.snapshot()['wastedSpeculativeMs'] >= 50)
+
+
+def test_async_misses_count_wasted_time_instead_of_latency_saved(speculative):
+    async def run():
+        await chat_pipeline.run_chat_turn_async("Tengo un gato.", "Spanish", [], "speculative-hit-async")
+        return await chat_pipeline.run_chat_turn_async("Yo ser Ana.", "Spanish", [], "speculative-miss-async")
+
+    assert asyncio.run(run()) == ("Me llamo Ana.", "Reply to Me llamo Ana.")
+    snapshot = speculative.snapshot()
+    assert (snapshot['hits'], snapshot['misses']) == (1, 1)
+    assert snapshot['avgLatencySavedMs'] == snapshot['latencySavedMs'] > 20
+    # The cancelled reply ran alongside the correction
+    assert snapshot['wastedSpeculativeMs'] >= 50
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import chat_pipeline
+import gemini_service
+import llm_backends
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def combined_mode(monkeypatch):
+    monkeypatch.setattr(chat_pipeline, 'CHAT_MODE', 'combined')
+    monkeypatch.setattr(chat_pipeline, 'SPECULATIVE_CHAT_ENABLED', False)
+    monkeypatch.setattr(chat_pipeline, 'combined_stats', chat_pipeline.CombinedStats())
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    metrics.start_request('/api/chat')
+    yield
+    metrics.finish_request(200)
+
+
+@pytest.fixture
+def combined_answers(monkeypatch):
+    """Replace the fake backend's answer to combined prompts; returns the prompts seen."""
+    prompts = []
+
+    def install(answer):
+        fake_response = llm_backends.fake_response
+
+        def respond(request, variant=0):
+            system_prompt = request if isinstance(request, str) else getattr(request[0], 'content', '')
+            if llm_backends._COMBINED_RE.search(system_prompt):
+                prompts.append(request)
+                return answer
+            return fake_response(request, variant)
+
+        monkeypatch.setattr(llm_backends, 'fake_response', respond)
+        return prompts
+
+    return install
+
+
+def test_structured_answer_gives_correction_and_reply(combined_answers):
+    prompts = combined_answers(json.dumps({'corrected': "Yo quiero un café.",
+                                           'reply': "¡Claro! ¿Con leche?"}))
+    corrected, reply = chat_pipeline.run_chat_turn("yo quiero un cafe", "Spanish", None, "combined-valid")
+    assert (corrected, reply) == ("Yo quiero un café.", "¡Claro! ¿Con leche?")
+    assert len(prompts) == 1
+    assert chat_pipeline.combined_stats.snapshot()['combined'] == 1
+    history = gemini_service.get_conversation_memory("combined-valid").chat_memory.messages
+    assert [message.content for message in history] == ["Yo quiero un café.", "¡Claro! ¿Con leche?"]
+
+
+def test_malformed_answer_falls_back_to_separate_calls(combined_answers):
+    prompts = combined_answers("Sure! Here is the corrected message: Yo quiero un café.")
+    corrected, reply = chat_pipeline.run_chat_turn("Yo quiero un té", "Spanish", None, "combined-malformed")
+    assert corrected == "Yo quiero un té"
+    assert reply.startswith("That is interesting!")
+    assert len(prompts) == 1
+    snapshot = chat_pipeline.combined_stats.snapshot()
+    assert (snapshot['combined'], snapshot['fallbacks'], snapshot['fallbackRate']) == (0, 1, 1.0)
+
+
+def test_fast_path_message_only_asks_for_the_reply(combined_answers):
+    prompts = combined_answers(json.dumps({'corrected': "Hola.", 'reply': "unused"}))
+    corrected, reply = chat_pipeline.run_chat_turn("Hola", "Spanish", None, "combined-fast-path")
+    assert corrected == "Hola"
+    assert reply.startswith("That is interesting!")
+    assert prompts == []
+    assert chat_pipeline.combined_stats.snapshot()['combined'] == 1
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from conversation_backends import ConversationBackend, RedisConversationBackend, SQLiteConversationBackend
+from fake_redis import FakeRedis
+
+TURN = [("human", "Hola"), ("ai", "¡Hola! ¿Qué tal?")]
+
+
+@pytest.fixture
+def redis_backend():
+    # Flushed by the tests, not by the background thread
+    return RedisConversationBackend(FakeRedis(), flush_interval=60, max_messages=4)
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    return SQLiteConversationBackend(str(tmp_path / "conversations.db"), flush_interval=60, max_messages=4)
+
+
+def test_backend_methods_are_abstract():
+    with pytest.raises(TypeError):
+        ConversationBackend()
+
+
+def test_redis_batch_is_written_in_one_round_trip(redis_backend):
+    client = redis_backend.client
+    redis_backend.append("a", TURN)
+    redis_backend.append("b", TURN)
+    redis_backend.flush()
+    assert client.round_trips == 1
+    assert redis_backend.written_version("a") == 2
+
+    assert redis_backend.load("a") == (2, TURN)
+    assert client.round_trips == 2
+
+
+def test_redis_keeps_only_the_recent_messages(redis_backend):
+    for number in range(3):
+        redis_backend.append("a", [("human", f"message {number}"), ("ai", f"reply {number}")])
+        redis_backend.flush()
+    version, turns = redis_backend.load("a")
+    assert version == 6
+    assert turns == [("human", "message 1"), ("ai", "reply 1"), ("human", "message 2"), ("ai", "reply 2")]
+
+
+def test_redis_clear_changes_the_version(redis_backend):
+    redis_backend.append("a", TURN)
+    redis_backend.flush()
+    redis_backend.clear("a")
+    assert redis_backend.load("a") == (3, [])
+
+
+def test_redis_conversations_expire(redis_backend):
+    redis_backend.ttl = 1
+    redis_backend.append("a", TURN)
+    redis_backend.flush()
+    time.sleep(1.05)
+    assert redis_backend.load("a") == (0, [])
+
+
+def test_sqlite_keeps_and_loads_only_the_recent_messages(sqlite_backend):
+    for number in range(3):
+        sqlite_backend.append("a", [("human", f"message {number}"), ("ai", f"reply {number}")])
+    sqlite_backend.flush()
+    version, turns = sqlite_backend.load("a")
+    assert version == sqlite_backend.version("a") == sqlite_backend.written_version("a")
+    assert turns == [("human", "message 1"), ("ai", "reply 1"), ("human", "message 2"), ("ai", "reply 2")]
+    count = sqlite_backend._conn.execute("SELECT COUNT(*) FROM conversation_turn").fetchone()[0]
+    assert count == 4
+
+
+def test_sqlite_prunes_expired_conversations(sqlite_backend):
+    sqlite_backend.append("old", TURN)
+    sqlite_backend.flush()
+    sqlite_backend._conn.execute("UPDATE conversation_turn SET created_at = created_at - 7200")
+    sqlite_backend.ttl = 3600
+    sqlite_backend.prune_interval = 0
+    sqlite_backend.append("new", TURN)
+    sqlite_backend.flush()
+    assert sqlite_backend.load("old") == (0, [])
+    assert sqlite_backend.load("new")[1] == TURN
+
+
+def test_forked_process_restarts_the_flusher_and_drops_inherited_writes(sqlite_backend):
+    sqlite_backend.append("a", TURN)
+    parent_flusher = sqlite_backend._flusher
+    # Pretend this process was forked from another one
+    sqlite_backend._owner_pid = -1
+    sqlite_backend.append("b", TURN)
+    assert sqlite_backend._flusher is not parent_flusher
+    assert sqlite_backend._flusher.is_alive()
+    assert not sqlite_backend.has_pending("a")
+    assert sqlite_backend.has_pending("b")
+    sqlite_backend.flush()
+    assert sqlite_backend.load("b")[1] == TURN
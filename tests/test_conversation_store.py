@@ -0,0 +1,55 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from conversation_store import ConversationStore
+from history_manager import HistoryManager
+
+
+def empty_memory():
+    return SimpleNamespace(chat_memory=SimpleNamespace(messages=[]))
+
+
+def message(kind, text):
+    return SimpleNamespace(type=kind, content=text)
+
+
+def test_evicted_and_expired_conversations_are_reported():
+    evicted = []
+    store = ConversationStore(empty_memory, max_conversations=1, idle_ttl=0.05, on_evict=evicted.append)
+    store.get_or_create('a')
+    store.get_or_create('b')
+    assert evicted == ['a']
+    time.sleep(0.06)
+    assert store.get('b') is None
+    assert evicted == ['a', 'b']
+    # Clearing a conversation is not an eviction
+    store.get_or_create('c')
+    store.pop('c')
+    assert evicted == ['a', 'b']
+
+
+def test_eviction_forgets_the_history_summary():
+    history = HistoryManager(lambda summary, messages: "summary", token_budget=10, keep_turns=1)
+    store = ConversationStore(empty_memory, max_conversations=1, on_evict=history.forget)
+    store.get_or_create('a')
+    history._summaries.set('a', ("summary of a", 4))
+    store.get_or_create('b')
+    assert history._summaries.get('a') is None
+
+
+def test_forget_during_a_fold_keeps_the_summary_away():
+    started, release = threading.Event(), threading.Event()
+
+    def summarize(summary, messages):
+        started.set()
+        release.wait(1)
+        return "stale summary"
+
+    history = HistoryManager(summarize, keep_turns=1)
+    history._schedule_fold('a', [message('human', 'Hola'), message('ai', 'Hola')])
+    assert started.wait(1)
+    history.forget('a')
+    release.set()
+    history._executor.shutdown(wait=True)
+    assert history._summaries.get('a') is None
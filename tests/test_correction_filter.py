@@ -0,0 +1,47 @@
+import pytest
+
+from correction_filter import CorrectionFilter
+
+
+@pytest.fixture
+def correction_filter(tmp_path):
+    return CorrectionFilter(mode="on", max_words=1, db_path=str(tmp_path / "filter.db"))
+
+
+def test_known_words_are_accepted(correction_filter):
+    assert correction_filter.check("¡Hola!", "Spanish") == 'knownWords'
+    assert correction_filter.check("Por favor", "Spanish") == 'knownWords'
+    # Longer messages need more than known words
+    assert correction_filter.check("hola gato", "Spanish") is None
+    assert correction_filter.check("holaa", "Spanish") is None
+
+
+def test_messages_without_letters_are_accepted(correction_filter):
+    assert correction_filter.check("42 :)", "Spanish") == 'noLetters'
+
+
+def test_verified_sentences_are_accepted(correction_filter):
+    assert correction_filter.check("Yo quiero un café.", "Spanish") is None
+    correction_filter.learn("Yo quiero un cafe", "Yo quiero un café.", "Spanish")
+    assert correction_filter.check("yo quiero un café", "Spanish") == 'verified'
+    # The uncorrected message is not verified
+    assert correction_filter.check("Yo quiero un cafe", "Spanish") is None
+    counts = correction_filter.stats()
+    assert (counts['verified'], counts['knownWords'], counts['noLetters']) == (1, 0, 0)
+
+
+def test_shadow_mode_counts_agreement_with_the_model(tmp_path):
+    shadow = CorrectionFilter(mode="shadow", db_path=str(tmp_path / "filter.db"))
+    assert not shadow.active
+    verdict = shadow.check("gracias", "Spanish")
+    assert verdict == 'knownWords'
+    shadow.learn("gracias", "Gracias.", "Spanish", verdict)
+    shadow.learn("gato", "El gato.", "Spanish", shadow.check("gato", "Spanish"))
+    stats = shadow.stats()
+    assert (stats['shadowAgreed'], stats['shadowDisagreed']) == (1, 1)
+    assert stats['disagreementRate'] == 0.5
+
+
+def test_languages_without_examples_are_not_seeded_with_english(correction_filter):
+    assert correction_filter.check("hello", "Klingon") is None
+    assert correction_filter.stats()['knownWordsByLanguage'] == {'klingon': 0}
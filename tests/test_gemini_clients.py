@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_clients
+
+
+class _FakeSDK:
+    """Stands in for both SDKs and counts what they were asked to build."""
+
+    def __init__(self):
+        self.configured = []
+        self.built = []
+
+    def configure(self, api_key):
+        self.configured.append(api_key)
+
+    def GenerativeModel(self, model_name):
+        self.built.append(model_name)
+        return SimpleNamespace(model_name=model_name)
+
+    def ChatGoogleGenerativeAI(self, model, api_key, temperature, **kwargs):
+        self.built.append((model, temperature))
+        return SimpleNamespace(model=model, temperature=temperature, **kwargs)
+
+
+@pytest.fixture
+def sdk(monkeypatch):
+    fake = _FakeSDK()
+    monkeypatch.setattr(gemini_clients, 'genai', fake)
+    monkeypatch.setattr(gemini_clients, 'langchain_google_genai', fake)
+    gemini_clients.reset_clients()
+    yield fake
+    gemini_clients.reset_clients()
+
+
+def test_models_are_built_once_and_shared(sdk):
+    model = gemini_clients.get_generative_model("key-1")
+    assert gemini_clients.get_generative_model("key-1") is model
+    chat = gemini_clients.get_chat_model("key-1", purpose="correction", temperature=0.3)
+    assert gemini_clients.get_chat_model("key-1", purpose="correction", temperature=0.3) is chat
+    assert sdk.configured == ["key-1"]
+    assert sdk.built == [gemini_clients.DEFAULT_MODEL, (gemini_clients.DEFAULT_MODEL, 0.3)]
+
+
+def test_chat_models_are_kept_per_purpose_temperature_and_parameters(sdk):
+    correction = gemini_clients.get_chat_model("key-1", purpose="correction", temperature=0.3)
+    assert gemini_clients.get_chat_model("key-1", purpose="analysis", temperature=0.3) is not correction
+    assert gemini_clients.get_chat_model("key-1", purpose="correction", temperature=0.7) is not correction
+    bounded = gemini_clients.get_chat_model("key-1", purpose="correction", temperature=0.3, max_tokens=64)
+    assert bounded is not correction and bounded.max_tokens == 64
+    assert len(sdk.built) == 4
+
+
+def test_a_new_key_rebuilds_the_clients(sdk):
+    model = gemini_clients.get_generative_model("key-1")
+    assert gemini_clients.get_generative_model("key-2") is not model
+    assert sdk.configured == ["key-1", "key-2"]
+
+
+def test_clients_inherited_across_a_fork_are_rebuilt(sdk, monkeypatch):
+    model = gemini_clients.get_generative_model("key-1")
+    # As if the clients had been built by the parent process
+    monkeypatch.setattr(gemini_clients, '_owner_pid', -1)
+    assert gemini_clients.get_generative_model("key-1") is not model
+    assert sdk.configured == ["key-1", "key-1"]
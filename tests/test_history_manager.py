@@ -0,0 +1,47 @@
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from history_manager import HistoryManager
+
+
+def conversation(*lengths):
+    """Alternating learner and tutor messages of the given lengths in characters."""
+    return [(HumanMessage if i % 2 == 0 else AIMessage)(content=f"{i}" + "x" * (length - len(str(i))))
+            for i, length in enumerate(lengths)]
+
+
+def wait_for(condition, timeout=2.0):
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_over_budget_last_turn_is_sent_and_the_rest_summarized():
+    folds = []
+
+    def summarize(previous, messages):
+        folds.append([message.content[0] for message in messages])
+        return "Summary."
+
+    manager = HistoryManager(summarize, token_budget=50, keep_turns=3)
+    # Four turns; the last two turns alone are far over the budget
+    messages = conversation(20, 20, 20, 20, 200, 200, 200, 200)
+
+    summary, selected = manager.window('over-budget', messages)
+    assert summary == ""
+    assert selected == messages[6:]
+    assert wait_for(lambda: folds)
+    # Everything that was not sent verbatim goes into the summary
+    assert folds == [['0', '1', '2', '3', '4', '5']]
+
+    summary, selected = manager.window('over-budget', messages)
+    assert summary == "Summary."
+    assert selected == messages[6:]
+
+
+def test_recent_turns_that_fit_are_sent_verbatim():
+    manager = HistoryManager(lambda previous, messages: "Summary.", token_budget=1000, keep_turns=3)
+    messages = conversation(20, 20, 20, 20)
+    assert manager.window('fits', messages) == ("", messages)
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+import lazy_imports
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Dependencies that must not be imported while the app loads
+DEFERRED = ('google.generativeai', 'langchain', 'langchain_core', 'langchain_google_genai')
+
+
+def imported_after_app_import(lazy):
+    """Deferred dependencies in sys.modules once a fresh interpreter has imported the app."""
+    # os._exit skips waiting for background threads the app may have started
+    script = (
+        "import json, os, sys, app\n"
+        f"deferred = {DEFERRED!r}\n"
+        "print(json.dumps(sorted({name for name in sys.modules for prefix in deferred\n"
+        "                         if name == prefix or name.startswith(prefix + '.')})))\n"
+        "sys.stdout.flush()\n"
+        "os._exit(0)\n"
+    )
+    env = dict(os.environ, LAZY_IMPORTS="1" if lazy else "0")
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_importing_the_app_defers_the_heavy_sdks():
+    assert imported_after_app_import(lazy=True) == []
+
+
+def test_the_sdks_are_imported_at_once_without_lazy_imports():
+    # The fake backend of the tests does not use the Gemini clients
+    imported = imported_after_app_import(lazy=False)
+    assert {'langchain.memory', 'langchain.schema'} <= set(imported)
+
+
+def test_lazy_module_is_imported_on_first_attribute_access():
+    module = lazy_imports.LazyModule('colorsys')
+    assert not module.loaded
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert module.loaded
+    assert module.seconds is not None
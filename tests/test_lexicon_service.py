@@ -0,0 +1,40 @@
+from lexicon_service import Lexicon
+
+ANALYSIS = """Translation: I want coffee.
+
+## Quiero café.
+Translation: I want coffee.
+* **Quiero** verb (1st person present) "want" - Quiero is a form of "querer" (to want).
+* **café** noun "coffee" - café is a hot drink.
+"""
+
+
+def test_analysis_entries_need_one_confirmation(tmp_path):
+    lexicon = Lexicon(str(tmp_path / "lexicon.db"))
+    lexicon.harvest_analysis(ANALYSIS, "Spanish")
+    assert lexicon.lookup("café", "Spanish") is None
+
+    lexicon.harvest_analysis(ANALYSIS, "Spanish")
+    entry = lexicon.lookup("café", "Spanish")
+    assert entry['translation'] == "coffee"
+    assert entry['confidence'] >= lexicon.min_confidence
+
+
+def test_word_translations_are_trusted_at_once(tmp_path):
+    lexicon = Lexicon(str(tmp_path / "lexicon.db"))
+    lexicon.harvest_translation("casa", "Spanish", "Translation: house - a building for living in")
+    assert lexicon.lookup("Casa", "Spanish")['translation'] == "house"
+
+
+def test_unconfirmed_forms_are_answered_from_their_lemma(tmp_path):
+    lexicon = Lexicon(str(tmp_path / "lexicon.db"))
+    lexicon.harvest_analysis(ANALYSIS, "Spanish")
+    assert lexicon.lookup("Quiero", "Spanish") is None
+
+    lexicon.harvest_translation("querer", "Spanish", "Translation: to want - to wish for something")
+    entry = lexicon.lookup("Quiero", "Spanish")
+    assert (entry['surface'], entry['lemma'], entry['translation']) == ("quiero", "querer", "to want")
+    assert entry['explanation'] == 'Form of "querer"; to wish for something'
+    # Words without a lemma of their own are not answered from another entry
+    assert lexicon.lookup("café", "Spanish") is None
+    assert lexicon.stats()['lemmaHits'] == 1
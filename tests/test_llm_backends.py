@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import pytest
+
+from llm_backends import FakeBackend, FakeBackendError
+
+
+def test_simulated_failures_take_their_latency():
+    model = FakeBackend(latency_ms=100, sigma=0, failure_rate=1.0).generative_model(None)
+    started = time.monotonic()
+    with pytest.raises(FakeBackendError):
+        model.generate_content("Hola")
+    assert time.monotonic() - started >= 0.1
+
+
+def test_async_simulated_failures_do_not_block_the_event_loop():
+    model = FakeBackend(latency_ms=200, sigma=0, failure_rate=1.0).generative_model(None)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        with pytest.raises(FakeBackendError):
+            await model.generate_content_async("Hola")
+        elapsed = time.monotonic() - started
+        task.cancel()
+        return ticks, elapsed
+
+    ticks, elapsed = asyncio.run(run())
+    assert elapsed >= 0.2
+    assert ticks >= 5
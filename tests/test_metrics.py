@@ -0,0 +1,59 @@
+import pytest
+
+import app
+import llm_backends
+import metrics
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    return app.app.test_client()
+
+
+def test_metrics_are_rendered_in_the_prometheus_text_format(monkeypatch):
+    monkeypatch.setattr(metrics, '_registry', [])
+    latency = metrics.Histogram('test_latency_seconds', 'Test latency', ('endpoint',), buckets=(0.1, 1.0))
+    calls = metrics.Counter('test_calls', 'Test calls', ('path',))
+    latency.observe(0.05, endpoint='/api/test')
+    latency.observe(0.5, endpoint='/api/test')
+    calls.inc(path='say "hi"\n')
+
+    assert metrics.render().splitlines() == [
+        '# HELP test_latency_seconds Test latency',
+        '# TYPE test_latency_seconds histogram',
+        # Bucket counts are cumulative
+        'test_latency_seconds_bucket{endpoint="/api/test",le="0.1"} 1',
+        'test_latency_seconds_bucket{endpoint="/api/test",le="1.0"} 2',
+        'test_latency_seconds_bucket{endpoint="/api/test",le="+Inf"} 2',
+        'test_latency_seconds_sum{endpoint="/api/test"} 0.55',
+        'test_latency_seconds_count{endpoint="/api/test"} 2',
+        '# HELP test_calls Test calls',
+        '# TYPE test_calls counter',
+        'test_calls_total{path="say \\"hi\\"\\n"} 1',
+    ]
+
+
+def test_api_responses_carry_server_timing_and_reach_metrics(client):
+    response = client.post('/api/translate-word', json={'word': "murciélago", 'language': "Spanish"})
+    assert response.status_code == 200
+    stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert 'upstream-translation' in stages
+    assert stages[-1] == 'total'
+    # The request's latency is recorded once the response is closed
+    response.close()
+
+    scrape = client.get('/metrics')
+    assert scrape.mimetype == 'text/plain'
+    text = scrape.get_data(as_text=True)
+    assert '# TYPE languagepal_request_seconds histogram' in text
+    assert 'languagepal_request_seconds_count{endpoint="/api/translate-word",status="200"}' in text
+    assert 'languagepal_stage_seconds_count{endpoint="/api/translate-word",stage="upstream-translation"}' in text
+    assert 'languagepal_upstream_attempts_total{upstream="translation",path="direct"}' in text
+
+
+def test_server_timing_can_be_turned_off(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'SERVER_TIMING_ENABLED', False)
+    response = client.post('/api/translate-word', json={'word': "ornitorrinco", 'language': "Spanish"})
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response.headers
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+import gemini_service
+from pretranslation import ForegroundLoad, Pretranslator
+
+
+def wait_for(condition, timeout=2.0):
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_only_words_missing_from_the_cache_are_translated():
+    translated = []
+    done = threading.Event()
+
+    def translate(words, language):
+        translated.append((words, language))
+        done.set()
+
+    pretranslator = Pretranslator(translate, is_cached=lambda word, language: word == "hola", workers=1)
+    assert pretranslator.submit(["hola", "gato", "perro"], "Spanish")
+    assert done.wait(2)
+    assert translated == [(["gato", "perro"], "Spanish")]
+    assert wait_for(lambda: pretranslator.stats()['completed'] == 1)
+    assert pretranslator.stats()['wordsTranslated'] == 2
+
+
+def test_replies_are_skipped_when_the_queue_is_full():
+    pretranslator = Pretranslator(lambda words, language: None, lambda word, language: False,
+                                  workers=0, max_queue=1)
+    assert pretranslator.submit(["gato"], "Spanish")
+    assert not pretranslator.submit(["perro"], "Spanish")
+    assert not pretranslator.submit([], "Spanish")
+    stats = pretranslator.stats()
+    assert (stats['queued'], stats['skipped'], stats['queueDepth']) == (1, 1, 1)
+
+
+def test_jobs_wait_while_the_foreground_is_busy_and_expire():
+    load = ForegroundLoad()
+    load.enter()
+    translated = []
+    pretranslator = Pretranslator(lambda words, language: translated.append(words),
+                                  lambda word, language: False, load=load, workers=1,
+                                  busy_requests=0, max_age=0.2)
+    pretranslator.submit(["gato"], "Spanish")
+    assert wait_for(lambda: pretranslator.stats()['expired'] == 1)
+    assert pretranslator.stats()['deferred'] == 1
+    assert translated == []
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    jobs = []
+
+    class Recorder:
+        def submit(self, words, language):
+            jobs.append((words, language))
+
+    monkeypatch.setattr(gemini_service, 'pretranslator', Recorder())
+    monkeypatch.setattr(gemini_service, 'PRETRANSLATE_ENABLED', True)
+    monkeypatch.setattr(gemini_service, 'GEMINI_API_KEY', "test-key")
+    return jobs
+
+
+def test_reply_words_are_queued_once_as_the_client_splits_them(submitted):
+    gemini_service.pretranslate_reply("¡Hola! ¿Tienes un gato? Hola, 42 gatos... -", "Spanish")
+    assert submitted == [(["hola", "tienes", "un", "gato", "gatos"], "Spanish")]
+
+
+def test_error_replies_are_not_queued(submitted):
+    gemini_service.pretranslate_reply("Error: Could not generate response.", "Spanish")
+    assert submitted == []
@@ -0,0 +1,191 @@
+import asyncio
+import time
+
+import pytest
+
+import metrics
+import resilience
+from llm_backends import FakeBackend, FakeBackendError, FakeRateLimitError
+from resilience import CircuitOpenError, DeadlineExceeded, UpstreamPolicy, breaker, is_rate_limited
+from scheduler import UpstreamScheduler
+
+
+@pytest.fixture(autouse=True)
+def in_request():
+    # Outside a request every upstream call is background work
+    metrics.start_request('/api/test')
+    yield
+    metrics.finish_request(200)
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = UpstreamScheduler(concurrency=4)
+    monkeypatch.setattr(resilience, 'scheduler', scheduler)
+    return scheduler
+
+
+def fake_path(backend, prompt="Translate 'hola'"):
+    model = backend.generative_model(None)
+    return lambda: model.generate_content(prompt).text
+
+
+def fake_path_async(backend, prompt="Translate 'hola'"):
+    model = backend.generative_model(None)
+
+    async def run():
+        return (await model.generate_content_async(prompt)).text
+    return run
+
+
+def wait_for(condition, timeout=2.0):
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_slot_is_held_until_an_abandoned_call_finishes(scheduler):
+    backend = FakeBackend(latency_ms=300, sigma=0)
+    policy = UpstreamPolicy('translation', deadline=0.05)
+    with pytest.raises(DeadlineExceeded):
+        policy.call([('slot-direct', fake_path(backend))])
+    # The call is still running upstream
+    assert scheduler.active == 1
+    assert wait_for(lambda: scheduler.active == 0)
+
+
+def test_retry_backoff_does_not_hold_a_slot(scheduler, monkeypatch):
+    backend = FakeBackend(latency_ms=1, sigma=0)
+    policy = UpstreamPolicy('translation', deadline=5.0, max_retries=1)
+    calls = []
+    sleeping = []
+    sleep = time.sleep
+
+    def flaky():
+        calls.append(scheduler.active)
+        if len(calls) == 1:
+            raise FakeRateLimitError("429 (fake backend)", retry_after=0.05)
+        return fake_path(backend)()
+
+    def backoff(seconds):
+        sleeping.append((seconds, scheduler.active))
+        sleep(seconds)
+
+    assert wait_for(lambda: scheduler.active == 0)
+    monkeypatch.setattr(resilience.time, 'sleep', backoff)
+    assert policy.call([('backoff-direct', flaky)])
+    # One slot per attempt, none held across the backoff
+    assert calls == [1, 1]
+    assert sleeping[0] == (0.05, 0)
+
+
+def test_async_slot_is_released_when_the_call_finishes(scheduler):
+    backend = FakeBackend(latency_ms=20, sigma=0)
+    policy = UpstreamPolicy('translation', deadline=5.0)
+    result = asyncio.run(policy.call_async([('slot-async', fake_path_async(backend))]))
+    assert result
+    assert scheduler.active == 0
+
+
+
+def test_breaker_opens_and_lets_a_trial_through_after_the_reset_timeout(scheduler):
+    backend = FakeBackend(latency_ms=1, sigma=0, failure_rate=1.0)
+    policy = UpstreamPolicy('breaker-test', deadline=5.0)
+    path_breaker = breaker('breaker-test', 'direct')
+    path_breaker.reset_timeout = 0.1
+    paths = [('direct', fake_path(backend))]
+
+    for _ in range(path_breaker.failure_threshold):
+        with pytest.raises(FakeBackendError):
+            policy.call(paths)
+    assert path_breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        policy.call(paths)
+    assert backend.counts['calls'] == path_breaker.failure_threshold
+
+    time.sleep(0.1)
+    assert path_breaker.allow()
+    assert path_breaker.state == 'half-open'
+    # A failing trial opens the breaker again
+    path_breaker.failure()
+    assert path_breaker.state == 'open'
+
+    time.sleep(0.1)
+    backend.failure_rate = 0
+    assert policy.call(paths)
+    assert path_breaker.state == 'closed'
+
+
+def test_breakers_are_per_endpoint(scheduler):
+    backend = FakeBackend(latency_ms=1, sigma=0, failure_rate=1.0)
+    failing = UpstreamPolicy('breaker-failing', deadline=5.0)
+    for _ in range(breaker('breaker-failing', 'direct').failure_threshold):
+        with pytest.raises(FakeBackendError):
+            failing.call([('direct', fake_path(backend))])
+    assert breaker('breaker-failing', 'direct').state == 'open'
+
+    backend.failure_rate = 0
+    other = UpstreamPolicy('breaker-other', deadline=5.0)
+    assert other.call([('direct', fake_path(backend))])
+
+
+def test_deadline_expiry(scheduler):
+    backend = FakeBackend(latency_ms=300, sigma=0)
+    policy = UpstreamPolicy('deadline-test', deadline=0.05)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        policy.call([('direct', fake_path(backend))])
+    assert time.monotonic() - started < 0.25
+    assert policy.counts['deadlineExceeded'] == 1
+    # The abandoned call counts by its real outcome once it finishes
+    assert wait_for(lambda: scheduler.active == 0)
+    assert breaker('deadline-test', 'direct').failures == 0
+
+
+def test_async_deadline_expiry(scheduler):
+    backend = FakeBackend(latency_ms=300, sigma=0)
+    policy = UpstreamPolicy('deadline-async-test', deadline=0.05)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(policy.call_async([('direct', fake_path_async(backend))]))
+    assert policy.counts['deadlineExceeded'] == 1
+    assert scheduler.active == 0
+    assert breaker('deadline-async-test', 'direct').failures == 1
+
+
+def test_hedge_fires_after_p95_latency(scheduler):
+    slow = FakeBackend(latency_ms=10, sigma=0)
+    fast = FakeBackend(latency_ms=10, sigma=0)
+    policy = UpstreamPolicy('hedge-test', deadline=5.0, hedge=True)
+    paths = [('direct', fake_path(slow)), ('langchain', fake_path(fast))]
+    for _ in range(resilience.MIN_HEDGE_SAMPLES):
+        policy.call(paths)
+    assert policy.counts['hedges'] == 0
+
+    slow.latency = 0.5
+    started = time.monotonic()
+    assert policy.call(paths)
+    assert time.monotonic() - started < 0.3
+    assert policy.counts['hedges'] == 1
+    assert policy.counts['hedgeWins'] == 1
+    assert fast.counts['calls'] == 1
+
+
+def test_rate_limited_calls_are_retried_after_retry_after(scheduler):
+    backend = FakeBackend(latency_ms=1, sigma=0, rate_limit_rate=1.0)
+    policy = UpstreamPolicy('retry-test', deadline=5.0, max_retries=2)
+    started = time.monotonic()
+    with pytest.raises(FakeRateLimitError):
+        policy.call([('direct', fake_path(backend))])
+    # The fake asks for 0.1s before each retry
+    assert time.monotonic() - started >= 0.2
+    assert backend.counts['calls'] == 3
+    assert policy.counts['retries'] == 2
+    # Rate limits do not count against the path
+    assert breaker('retry-test', 'direct').failures == 0
+
+
+def test_is_rate_limited_checks_codes_not_message_text():
+    assert is_rate_limited(FakeRateLimitError("Resource exhausted"))
+    assert not is_rate_limited(RuntimeError("Word 4291 not found"))
+    assert not is_rate_limited(FakeBackendError("503 after 429 earlier"))
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import pytest
+
+import metrics
+from scheduler import QueueFull, QueueTimeout, UpstreamScheduler
+
+
+@pytest.fixture(autouse=True)
+def in_request():
+    # Outside a request every upstream call is background work
+    metrics.start_request('/api/test')
+    yield
+    metrics.finish_request(200)
+
+
+def in_thread(target, *args):
+    """Run target in a thread that serves a request too."""
+    def run():
+        metrics.start_request('/api/test')
+        target(*args)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_slot_is_bounded_and_handed_over():
+    scheduler = UpstreamScheduler(concurrency=1)
+    scheduler.acquire('translation')
+    granted = threading.Event()
+
+    def waiter():
+        scheduler.acquire('translation')
+        granted.set()
+
+    thread = in_thread(waiter)
+    assert not granted.wait(0.05)
+    scheduler.release()
+    assert granted.wait(1)
+    thread.join()
+    assert scheduler.active == 1
+    scheduler.release()
+    assert scheduler.active == 0
+
+
+def test_higher_priority_class_is_served_first():
+    scheduler = UpstreamScheduler(concurrency=1)
+    scheduler.acquire('analysis')
+    order = []
+
+    def waiter(endpoint):
+        scheduler.acquire(endpoint)
+        order.append(endpoint)
+        scheduler.release()
+
+    threads = [in_thread(waiter, 'analysis')]
+    while scheduler.stats()['classes']['analysis']['waiting'] == 0:
+        pass
+    threads.append(in_thread(waiter, 'translation'))
+    while scheduler.stats()['classes']['translate']['waiting'] == 0:
+        pass
+    scheduler.release()
+    for thread in threads:
+        thread.join()
+    assert order == ['translation', 'analysis']
+
+
+def test_full_queue_and_queue_timeout(monkeypatch):
+    scheduler = UpstreamScheduler(concurrency=1)
+    queue = scheduler._queues['translate']
+    monkeypatch.setattr(queue, 'wait', 0.05)
+    scheduler.acquire('translation')
+    with pytest.raises(QueueTimeout):
+        scheduler.acquire('translation')
+    monkeypatch.setattr(queue, 'depth', 0)
+    with pytest.raises(QueueFull):
+        scheduler.acquire('translation')
+    assert scheduler.active == 1
+
+
+def test_cancelled_waiter_hands_back_a_granted_slot():
+    async def scenario():
+        scheduler = UpstreamScheduler(concurrency=1)
+        scheduler.acquire('translation')
+        task = asyncio.ensure_future(scheduler.acquire_async('translation'))
+        await asyncio.sleep(0.01)
+        # The slot is handed to the waiter, which is cancelled before it runs again
+        scheduler.release()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.active == 0
+
+
+def test_cancelled_waiter_is_not_a_queue_timeout():
+    async def scenario():
+        scheduler = UpstreamScheduler(concurrency=1)
+        scheduler.acquire('translation')
+        task = asyncio.ensure_future(scheduler.acquire_async('translation'))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    stats = scheduler.stats()['classes']['translate']
+    assert stats['waiting'] == 0
+    assert stats['timedOut'] == 0
+    assert scheduler.active == 1
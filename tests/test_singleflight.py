@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import gemini_service
+from resilience import policy
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_the_leaders_result():
+    flight = SingleFlight('test-share')
+    release = threading.Event()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        release.wait(2)
+        return "hola"
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(flight.do, 'key', upstream) for _ in range(3)]
+        while flight.stats()['collapsed'] < 2:
+            time.sleep(0.001)
+        release.set()
+        assert [future.result() for future in futures] == ["hola"] * 3
+    assert calls == [1]
+    assert flight.stats()['inFlight'] == 0
+
+
+def test_leader_failure_reaches_every_waiter_and_is_not_remembered():
+    flight = SingleFlight('test-failure')
+    release = threading.Event()
+
+    def failing():
+        release.wait(2)
+        raise RuntimeError("503 Service Unavailable")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(flight.do, 'key', failing) for _ in range(2)]
+        while flight.stats()['collapsed'] < 1:
+            time.sleep(0.001)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+    assert flight.stats()['errors'] == 1
+    assert flight.do('key', lambda: "recovered") == "recovered"
+
+
+def test_async_callers_share_the_leaders_result():
+    flight = SingleFlight('test-async-share')
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "hola"
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async('key', upstream) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["hola"] * 3
+    assert calls == [1]
+
+
+def test_async_leader_failure_reaches_every_waiter():
+    flight = SingleFlight('test-async-failure')
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("503 Service Unavailable")
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async('key', failing) for _ in range(2)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats()['errors'] == 1
+
+
+def test_cancelled_follower_does_not_cancel_the_shared_call():
+    flight = SingleFlight('test-async-cancel')
+
+    async def upstream():
+        await asyncio.sleep(0.05)
+        return "hola"
+
+    async def run():
+        leader = asyncio.create_task(flight.do_async('key', upstream))
+        follower = asyncio.create_task(flight.do_async('key', upstream))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(run()) == "hola"
+    assert flight.stats()['inFlight'] == 0
+
+
+def test_waiters_outlast_the_leaders_deadline():
+    for flight in (gemini_service.welcome_flight, gemini_service.translation_flight,
+                   gemini_service.analysis_flight):
+        assert flight.timeout > policy(flight.name).deadline
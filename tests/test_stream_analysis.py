@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+import app
+import gemini_service
+import llm_backends
+import metrics
+from admission import AdmissionRejected
+from sse_client import asgi_post, parse_events
+
+
+@pytest.fixture(autouse=True)
+def in_request():
+    metrics.start_request('/api/analyze/stream')
+    yield
+    metrics.finish_request(200)
+
+
+def test_async_full_message_fallback_is_shared(monkeypatch):
+    message = "Hola. ¿Dónde está la estación de tren?"
+    sentences = ["Hola.", "¿Dónde está la estación de tren?"]
+    calls = []
+
+    async def lookup(text, language):
+        return sentences, ['key-0', 'key-1'], ["## Hola.\nTranslation: Hello.", None], [1]
+
+    async def stream_model(endpoint, prompt, api_key, temperature):
+        yield "unrelated text"
+
+    async def generate(prompt, endpoint, temperature, description):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return "Translation: Hello. Where is the train station?"
+
+    monkeypatch.setattr(gemini_service, '_lookup_analysis_sections_async', lookup)
+    monkeypatch.setattr(gemini_service, '_stream_model_async', stream_model)
+    monkeypatch.setattr(gemini_service, '_complete_streamed_analysis', lambda *args: None)
+    monkeypatch.setattr(gemini_service, '_generate_async', generate)
+
+    async def consume():
+        return [event async for event in gemini_service.stream_analysis_async(message, "Spanish")]
+
+    async def run():
+        return await asyncio.gather(consume(), consume())
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert first[-1] == second[-1] and first[-1][0] == 'done'
+
+
+def check_analysis_events(events, sentences):
+    names = [event for event, _ in events]
+    assert names == ['translation'] + ['section'] * len(sentences) + ['done']
+    sections = [payload['section'] for event, payload in events if event == 'section']
+    assert [section.splitlines()[0] for section in sections] == [f"## {sentence}" for sentence in sentences]
+    analysis = events[-1][1]['analysis']
+    assert analysis.startswith(f"Translation: {events[0][1]['translation']}")
+    assert [line for line in analysis.splitlines() if line.startswith("## ")] == \
+        [f"## {sentence}" for sentence in sentences]
+
+
+def test_analyze_stream_endpoint_sends_translation_sections_and_done(monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    client = app.app.test_client()
+    response = client.post('/api/analyze/stream', json={'message': "Nutria parda. Nutria gris.", 'language': "Spanish"})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    check_analysis_events(parse_events(response.get_data(as_text=True)), ["Nutria parda.", "Nutria gris."])
+
+    missing = client.post('/api/analyze/stream', json={'language': "Spanish"})
+    assert missing.status_code == 400
+
+
+def test_async_analyze_stream_endpoint_sends_translation_sections_and_done(monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    status, headers, body = asgi_post('/api/analyze/stream',
+                                      {'message': "Garza blanca. Garza real.", 'language': "Spanish"})
+    assert status == 200
+    assert headers['content-type'].startswith('text/event-stream')
+    check_analysis_events(parse_events(body), ["Garza blanca.", "Garza real."])
+
+
+def test_refused_analysis_stream_ends_with_an_error_event(monkeypatch):
+    def refuse(endpoint, prompt, expected_completion=None):
+        raise AdmissionRejected("Token budget exhausted", retry_after=3.0)
+
+    monkeypatch.setattr(gemini_service.admission, 'admit', refuse)
+    response = app.app.test_client().post('/api/analyze/stream',
+                                          json={'message': "Cigüeña negra.", 'language': "Spanish"})
+    assert parse_events(response.get_data(as_text=True)) == \
+        [('error', {'error': "Token budget exhausted", 'retryAfter': 3.0})]
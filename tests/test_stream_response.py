@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import app
+import gemini_service
+import llm_backends
+import metrics
+from admission import AdmissionRejected
+from resilience import breaker
+from sse_client import asgi_post, parse_events
+
+
+@pytest.fixture(autouse=True)
+def in_request():
+    metrics.start_request('/api/chat/stream')
+    yield
+    metrics.finish_request(200)
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    completions = []
+    settle = gemini_service.admission.settle
+
+    def recording_settle(reservation, completion):
+        completions.append(completion)
+        settle(reservation, completion)
+
+    monkeypatch.setattr(gemini_service.admission, 'settle', recording_settle)
+    return completions
+
+
+def wait_for(condition, timeout=2.0):
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def idle_slots():
+    """Scheduler slots in use once streams closed early by other tests have stopped."""
+    assert wait_for(lambda: not any(thread.name == "conversation-stream" for thread in threading.enumerate()))
+    return gemini_service.scheduler.active
+
+
+@pytest.fixture
+def open_breakers():
+    opened = []
+
+    def open_breaker(path):
+        path_breaker = breaker("conversation", path)
+        opened.append((path_breaker, path_breaker.state, path_breaker.opened_at))
+        path_breaker.state = 'open'
+        path_breaker.opened_at = time.monotonic()
+
+    yield open_breaker
+    for path_breaker, state, opened_at in opened:
+        path_breaker.state, path_breaker.opened_at = state, opened_at
+
+
+def test_stream_stopped_early_is_settled(settled):
+    stream = gemini_service.stream_response("Hola, ¿qué tal?", "Spanish", conversation_id="stream-early")
+    first = next(stream)
+    stream.close()
+    assert settled == [first]
+
+
+def test_async_stream_stopped_early_is_settled(settled):
+    async def run():
+        stream = gemini_service.stream_response_async("Hola, ¿qué tal?", "Spanish",
+                                                      conversation_id="stream-early-async")
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    first = asyncio.run(run())
+    assert settled == [first]
+
+
+def test_direct_fallback_honors_its_breaker(settled, open_breakers, monkeypatch):
+    monkeypatch.setattr(gemini_service, 'get_generative_model',
+                        lambda api_key: pytest.fail("direct path called with its breaker open"))
+    open_breakers('langchain')
+    open_breakers('direct')
+    chunks = list(gemini_service.stream_response("Hola", "Spanish", conversation_id="stream-open"))
+    assert len(chunks) == 1 and chunks[0].startswith("Error: Could not generate response.")
+    assert settled == [""]
+
+
+def test_slot_is_released_before_the_client_has_read_the_reply(idle_slots, monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    stream = gemini_service.stream_response("Hola, ¿qué tal?", "Spanish", conversation_id="stream-slow-reader")
+    first = next(stream)
+    # The client has not read the rest yet, but the model has finished
+    assert wait_for(lambda: gemini_service.scheduler.active <= idle_slots)
+    assert (first + ''.join(stream)).startswith("That is interesting!")
+
+
+def test_async_slot_is_released_before_the_client_has_read_the_reply(idle_slots, monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+
+    async def run():
+        stream = gemini_service.stream_response_async("Hola, ¿qué tal?", "Spanish",
+                                                      conversation_id="stream-slow-reader-async")
+        await stream.__anext__()
+        for _ in range(100):
+            if gemini_service.scheduler.active <= idle_slots:
+                break
+            await asyncio.sleep(0.01)
+        released = gemini_service.scheduler.active <= idle_slots
+        await stream.aclose()
+        return released
+
+    assert asyncio.run(run())
+
+
+def test_direct_fallback_sends_the_history(open_breakers, monkeypatch):
+    prompts = []
+
+    class Model:
+        def generate_content(self, prompt, stream=False):
+            prompts.append(prompt)
+            return [type('Chunk', (), {'text': "¡Muy bien!"})()]
+
+    monkeypatch.setattr(gemini_service, 'get_generative_model', lambda api_key: Model())
+    gemini_service.save_exchange("stream-history", "Me llamo Ana.", "¡Hola, Ana!")
+    open_breakers('langchain')
+    chunks = list(gemini_service.stream_response("Tengo un gato.", "Spanish", conversation_id="stream-history"))
+    assert chunks == ["¡Muy bien!"]
+    prompt, = prompts
+    assert "Learner: Me llamo Ana.\nTutor: ¡Hola, Ana!" in prompt
+    assert prompt.endswith('New message from the learner: "Tengo un gato."')
+
+
+def check_chat_events(events, message):
+    names = [event for event, _ in events]
+    assert names[0] == 'correction' and names[-1] == 'done'
+    assert set(names[1:-1]) == {'chunk'}
+    assert events[0][1]['originalMessage'] == message
+    reply = ''.join(payload['text'] for event, payload in events if event == 'chunk')
+    assert events[-1][1] == {'response': reply.strip()}
+    assert reply.startswith("That is interesting!")
+
+
+def test_chat_stream_endpoint_sends_correction_chunks_and_done(monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    client = app.app.test_client()
+    response = client.post('/api/chat/stream', json={'message': "Tengo un perro.", 'language': "Spanish"})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    check_chat_events(parse_events(response.get_data(as_text=True)), "Tengo un perro.")
+
+    missing = client.post('/api/chat/stream', json={'message': "Hola"})
+    assert missing.status_code == 400
+
+
+def test_async_chat_stream_endpoint_sends_correction_chunks_and_done(monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    status, headers, body = asgi_post('/api/chat/stream', {'message': "Tengo un gato.", 'language': "Spanish"})
+    assert status == 200
+    assert headers['content-type'].startswith('text/event-stream')
+    check_chat_events(parse_events(body), "Tengo un gato.")
+
+
+def test_chat_stream_refused_after_the_correction_ends_with_an_error_event(monkeypatch):
+    monkeypatch.setattr(llm_backends.backend, 'latency', 0.0)
+    admit = gemini_service.admission.admit
+
+    def refuse_replies(endpoint, prompt, expected_completion=None):
+        if endpoint == "conversation":
+            raise AdmissionRejected("Token budget exhausted", retry_after=2.0)
+        return admit(endpoint, prompt, expected_completion)
+
+    monkeypatch.setattr(gemini_service.admission, 'admit', refuse_replies)
+    response = app.app.test_client().post('/api/chat/stream',
+                                          json={'message': "Tengo un pez.", 'language': "Spanish"})
+    assert response.status_code == 200
+    events = parse_events(response.get_data(as_text=True))
+    assert [event for event, _ in events] == ['correction', 'error']
+    assert events[-1][1] == {'error': "Token budget exhausted", 'retryAfter': 2.0}
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+
+import app
+import gemini_service
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def in_request():
+    metrics.start_request('/api/translate/batch')
+    yield
+    metrics.finish_request(200)
+
+
+@pytest.fixture
+def single_calls(monkeypatch):
+    calls = []
+
+    def translate_single_word(word, language):
+        calls.append(word)
+        return f"Translation: single-{word}"
+
+    monkeypatch.setattr(gemini_service, 'translate_single_word', translate_single_word)
+    return calls
+
+
+def test_failed_batch_returns_errors_without_individual_calls(monkeypatch, single_calls):
+    def failing_batch(words, language, api_key):
+        raise RuntimeError("503 Service Unavailable")
+
+    monkeypatch.setattr(gemini_service, '_request_batch_translation', failing_batch)
+    words = [f"zfailed{i}" for i in range(12)]
+    result = gemini_service.translate_words(words, "Spanish")
+    assert single_calls == []
+    assert result == {word: f"Error translating '{word}'. Please try again." for word in words}
+
+
+def test_only_a_few_omitted_words_are_translated_individually(monkeypatch, single_calls):
+    words = [f"zomitted{i}" for i in range(12)]
+    answered = words[:4]
+
+    def partial_batch(batch_words, language, api_key):
+        return {gemini_service.translation_cache_key(word, language): f"Translation: batch-{word}"
+                for word in batch_words if word in answered}
+
+    monkeypatch.setattr(gemini_service, '_request_batch_translation', partial_batch)
+    result = gemini_service.translate_words(words, "Spanish")
+    assert single_calls == words[4:4 + gemini_service.TRANSLATION_FALLBACK_MAX]
+    assert all(result[word] == f"Translation: batch-{word}" for word in answered)
+    assert result[words[-1]] == f"Error translating '{words[-1]}'. Please try again."
+
+
+def test_async_batch_results_are_stored_in_one_worker_thread_call(monkeypatch):
+    words = ["zasync0", "zasync1", "zasync2"]
+    stores = []
+    store = gemini_service._store_translations
+
+    async def batch_response(prompt, purpose, temperature, task, **kwargs):
+        return "{}"
+
+    def recording_store(results, language):
+        stores.append((len(results), threading.current_thread() is threading.main_thread()))
+        store(results, language)
+
+    monkeypatch.setattr(gemini_service, '_generate_async', batch_response)
+    monkeypatch.setattr(gemini_service, '_parse_batch_translations', lambda response, language: {
+        gemini_service.translation_cache_key(word, language): f"Translation: batch - {word}" for word in words
+    })
+    monkeypatch.setattr(gemini_service, '_store_translations', recording_store)
+    result = asyncio.run(gemini_service.translate_words_async(words, "Spanish"))
+    assert result == {word: f"Translation: batch - {word}" for word in words}
+    assert stores == [(3, False)]
+    assert gemini_service.lexicon.lookup("zasync1", "Spanish")['translation'] == "batch"
+
+
+def test_failed_words_are_flagged_so_the_client_retries_them(monkeypatch, single_calls):
+    def failing_batch(words, language, api_key):
+        raise RuntimeError("503 Service Unavailable")
+
+    monkeypatch.setattr(gemini_service, '_request_batch_translation', failing_batch)
+    gemini_service.translation_cache.set(gemini_service.translation_cache_key("zflagged", "Spanish"),
+                                         "Translation: flagged - a cached word")
+    client = app.app.test_client()
+    response = client.post('/api/translate-words',
+                           json={'words': ["zflagged", "zunflagged"], 'language': "Spanish"})
+    data = response.get_json()
+    assert data['translations']['zflagged'] == "Translation: flagged - a cached word"
+    assert data['failed'] == ["zunflagged"]
@@ -0,0 +1,44 @@
+import re
+
+import gemini_service
+from vocabulary_selector import VocabularySelector
+
+FILLER = [f"palabra{i}" for i in range(30)]
+
+
+def test_lists_within_the_budget_are_sent_unchanged():
+    selector = VocabularySelector(budget=10)
+    words = ["gato", "perro", "casa"]
+    assert selector.select('small', words, "Hola") is words
+
+
+def test_related_words_come_first_and_the_budget_holds():
+    selector = VocabularySelector(budget=10)
+    words = FILLER + ["caminar", "gato", "está"]
+    subset = selector.select('related', words, "Mi gato y yo caminamos. ¿Esta bien?")
+    # Exact matches (accents ignored) before stem matches
+    assert subset[:3] == ["gato", "está", "caminar"]
+    assert len(subset) == 10
+
+
+def test_unspaced_words_are_found_inside_the_message():
+    selector = VocabularySelector(budget=2)
+    words = ["狗", "猫", "鸟", "鱼"]
+    assert selector.select('unspaced', words, "我的猫很可爱")[0] == "猫"
+
+
+def test_the_rotating_sample_walks_through_the_whole_list():
+    selector = VocabularySelector(budget=10)
+    seen = set()
+    for _ in range(3):
+        seen.update(selector.select('rotation', FILLER, "Hola"))
+    assert seen == set(FILLER)
+    # Another conversation starts from the beginning of the list
+    assert selector.select('rotation-other', FILLER, "Hola") == FILLER[:10]
+
+
+def test_the_prompt_lists_only_the_turns_subset(monkeypatch):
+    monkeypatch.setattr(gemini_service, 'vocabulary_selector', VocabularySelector(budget=5))
+    messages = gemini_service._prepare_chat_turn("Tengo un gato.", "Spanish", FILLER + ["gato"], 'subset-prompt')
+    listed = re.search(r'ONLY these words/phrases: (.*)\.', messages[0].content).group(1).split(', ')
+    assert listed == ["gato"] + FILLER[:4]
@@ -0,0 +1,24 @@
+import itertools
+import time
+
+from welcome_pool import WelcomePool
+
+
+def wait_for(condition, timeout=2.0):
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_forked_process_refills_languages_its_parent_had_scheduled():
+    counter = itertools.count()
+    pool = WelcomePool(lambda language: f"¡Hola {next(counter)}!", size=2, low_water=1)
+    # State as inherited from a parent whose refill thread did not survive the fork
+    pool._scheduled.add('Spanish')
+    pool._refills.put('Spanish')
+    pool._worker_pid = -1
+
+    assert pool.take('Spanish') is None
+    assert wait_for(lambda: pool.stats()['available'].get('Spanish') == 2)
+    assert pool.take('Spanish') is not None
@@ -0,0 +1,220 @@
+# -------------------------------------------------------------------------
+# vocabulary_selector.py - Per-Turn Vocabulary Subsets
+# -------------------------------------------------------------------------
+# In vocabulary-restricted mode the tutor prompt lists the words the tutor
+# may use. Teachers upload lists of several thousand words, and sending all
+# of them on every turn makes prompts large and slow. This module picks a
+# bounded subset for each turn:
+#
+# 1. Related words: list entries that appear in (or share a stem with) the
+#    learner's message and the recent history, message matches first
+# 2. A rotating sample that walks through the whole list over successive
+#    turns, skipping words the conversation used recently, for coverage
+#
+# Each list gets a precomputed index (token and stem lookups), cached by
+# the list's content, so selecting a subset only touches the words of the
+# current message plus the budget.
+#
+# Configuration (environment variables):
+# - VOCABULARY_WORD_BUDGET: maximum number of words per prompt (default 60)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+# Application-specific imports
+from cache_service import LRUCache
+from history_manager import is_wide_char
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+VOCABULARY_WORD_BUDGET = int(os.environ.get("VOCABULARY_WORD_BUDGET", "60"))
+
+# Share of the budget that related words may take; the rest is the rotating sample
+RELATED_SHARE = 0.5
+# A word used within this many turns is not offered again by the rotation
+RECENT_TURNS = 3
+# Stems are the first STEM_LENGTH characters of tokens at least that long
+STEM_LENGTH = 5
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _normalize(text):
+    """Casefold and strip accents so "Está" and "esta" match."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(_normalize(text))
+
+
+def _stem(token):
+    return token[:STEM_LENGTH] if len(token) >= STEM_LENGTH else None
+
+
+class VocabularyIndex:
+    """
+    Lookup structures for one vocabulary list.
+
+    Args:
+        words (list): The list's words/phrases, in list order
+    """
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.by_token = {}
+        self.by_stem = {}
+        # Unspaced (CJK) entries are found by their first character and a substring check
+        self.by_first_char = {}
+        for position, word in enumerate(self.words):
+            normalized = _normalize(word).strip()
+            if normalized and is_wide_char(normalized[0]):
+                self.by_first_char.setdefault(normalized[0], []).append((position, normalized))
+                continue
+            for token in _TOKEN_RE.findall(normalized):
+                self.by_token.setdefault(token, []).append(position)
+                stem = _stem(token)
+                if stem:
+                    self.by_stem.setdefault(stem, []).append(position)
+
+    def related(self, text):
+        """
+        Positions of list words occurring in a text, exact matches before stem matches.
+
+        Args:
+            text (str): Text to look for list words in
+
+        Returns:
+            list: Word positions without duplicates
+        """
+        exact = []
+        similar = []
+        normalized = _normalize(text)
+        for token in _TOKEN_RE.findall(normalized):
+            exact.extend(self.by_token.get(token, ()))
+            stem = _stem(token)
+            if stem:
+                similar.extend(self.by_stem.get(stem, ()))
+        if self.by_first_char:
+            for ch in set(normalized):
+                for position, word in self.by_first_char.get(ch, ()):
+                    if word in normalized:
+                        exact.append(position)
+        return list(dict.fromkeys(exact + similar))
+
+
+class VocabularySelector:
+    """
+    Chooses the vocabulary subset sent with each restricted-mode prompt.
+
+    Args:
+        budget (int): Maximum number of words per prompt
+        max_indexes (int): Number of list indexes kept in memory
+        max_conversations (int): Number of conversations whose rotation state is kept
+    """
+
+    def __init__(self, budget=VOCABULARY_WORD_BUDGET, max_indexes=64, max_conversations=1000):
+        self.budget = budget
+        self._indexes = LRUCache(max_entries=max_indexes)
+        # conversation_id -> {'turn', 'cursor', 'last_used': {position: turn}, 'list'}
+        self._states = LRUCache(max_entries=max_conversations)
+        self._lock = threading.Lock()
+        self.selections = 0
+        self.total_select_seconds = 0.0
+
+    def get_index(self, words):
+        """Return the (cached) index of a vocabulary list."""
+        key = hashlib.sha1('\n'.join(words).encode('utf-8')).hexdigest()
+        index = self._indexes.get(key)
+        if index is None:
+            started = time.perf_counter()
+            index = VocabularyIndex(words)
+            self._indexes.set(key, index)
+            logger.debug(f"Indexed vocabulary list of {len(words)} words in "
+                         f"{(time.perf_counter() - started) * 1000:.1f} ms")
+        return index, key
+
+    def select(self, conversation_id, words, message, history=()):
+        """
+        Pick the words to include in this turn's prompt.
+
+        Lists within the budget are returned unchanged.
+
+        Args:
+            conversation_id: The conversation's identifier
+            words (list): The full vocabulary list
+            message (str): The learner's new message
+            history (iterable): Texts of the most recent messages, oldest first
+
+        Returns:
+            list: At most `budget` words, related words first
+        """
+        if not words or len(words) <= self.budget:
+            return words
+
+        started = time.perf_counter()
+        index, list_key = self.get_index(words)
+        history = list(history)
+
+        with self._lock:
+            state = self._states.get(conversation_id)
+            if state is None or state['list'] != list_key:
+                state = {'turn': 0, 'cursor': 0, 'last_used': {}, 'list': list_key}
+                self._states.set(conversation_id, state)
+            state['turn'] += 1
+            turn = state['turn']
+
+            # Words that showed up in the recent conversation count as used
+            for text in history:
+                for position in index.related(text):
+                    state['last_used'][position] = turn
+
+            # Related words: the message first, then the recent history (newest first)
+            chosen = {}
+            related_budget = int(self.budget * RELATED_SHARE)
+            for text in [message] + history[::-1]:
+                for position in index.related(text):
+                    if len(chosen) >= related_budget:
+                        break
+                    chosen.setdefault(position, None)
+
+            # Rotating sample over the rest of the list, skipping recently used words
+            size = len(index.words)
+            cursor = state['cursor']
+            scanned = 0
+            while len(chosen) < self.budget and scanned < size:
+                position = (cursor + scanned) % size
+                scanned += 1
+                if turn - state['last_used'].get(position, -RECENT_TURNS) < RECENT_TURNS:
+                    continue
+                chosen.setdefault(position, None)
+            state['cursor'] = (cursor + scanned) % size
+
+            # Forget usage older than the recency window
+            if len(state['last_used']) > self.budget * RECENT_TURNS:
+                state['last_used'] = {position: used for position, used in state['last_used'].items()
+                                      if turn - used < RECENT_TURNS}
+
+            self.selections += 1
+            self.total_select_seconds += time.perf_counter() - started
+
+        return [index.words[position] for position in chosen]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'budget': self.budget,
+                'indexes': len(self._indexes),
+                'selections': self.selections,
+                'avgSelectMs': (self.total_select_seconds / self.selections * 1000
+                                if self.selections else 0.0)
+            }
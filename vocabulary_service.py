@@ -3,11 +3,16 @@
 # -------------------------------------------------------------------------
 # This module provides utilities for working with vocabulary lists in the 
 # LanguagePal application. It includes functions for parsing user input
-# of vocabulary words and providing example vocabulary for different
-# languages.
+# of vocabulary words, providing example vocabulary for different
+# languages, and the server-side store that holds users' vocabulary lists.
 # -------------------------------------------------------------------------
 
+import json
 import logging
+import os
+import sqlite3
+import threading
+import time
 
 # Configure module logger
 logger = logging.getLogger(__name__)
@@ -114,3 +119,115 @@ def get_example_vocabulary(language):
     }
     
     return vocabularies.get(language, ["hello", "goodbye", "please", "thank you", "yes", "no"])
+
+
+class VocabularyStore:
+    """
+    Server-side storage for vocabulary lists, kept in SQLite.
+    
+    Lists belong to an owner key (a random ID carried in the user's session)
+    and are indexed by (owner, id), so lookups no longer scan every list and
+    the session cookie stays small no matter how many words a list has.
+    """
+    
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_vocabulary_list ("
+                "owner TEXT NOT NULL, "
+                "id INTEGER NOT NULL, "
+                "name TEXT NOT NULL, "
+                "language TEXT NOT NULL, "
+                "words TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "PRIMARY KEY (owner, id))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_session_vocabulary_list_owner_name "
+                "ON session_vocabulary_list (owner, name COLLATE NOCASE)"
+            )
+    
+    @staticmethod
+    def _to_dict(row, include_words=True):
+        vocab = {'id': row['id'], 'name': row['name'], 'language': row['language']}
+        if include_words:
+            vocab['words'] = json.loads(row['words'])
+        return vocab
+    
+    def create(self, owner, name, language, words, list_id=None):
+        """
+        Store a new vocabulary list
+        
+        Args:
+            owner (str): The owner key from the user's session
+            name (str): List name
+            language (str): Language of the words
+            words (list): Vocabulary words/phrases
+            list_id (int, optional): ID to use (e.g. when migrating existing lists)
+            
+        Returns:
+            int: The ID of the new list
+        """
+        with self._lock, self._conn:
+            if list_id is None:
+                # Timestamp IDs as before, kept unique per owner
+                row = self._conn.execute(
+                    "SELECT MAX(id) FROM session_vocabulary_list WHERE owner = ?", (owner,)
+                ).fetchone()
+                list_id = max(int(time.time()), (row[0] or 0) + 1)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO session_vocabulary_list "
+                "(owner, id, name, language, words, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (owner, list_id, name, language, json.dumps(words, ensure_ascii=False), time.time())
+            )
+        return list_id
+    
+    def get(self, owner, list_id):
+        """Return a vocabulary list as a dict, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM session_vocabulary_list WHERE owner = ? AND id = ?", (owner, list_id)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+    
+    def update(self, owner, list_id, name, language, words):
+        """Update a vocabulary list. Returns True if it existed."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE session_vocabulary_list SET name = ?, language = ?, words = ? "
+                "WHERE owner = ? AND id = ?",
+                (name, language, json.dumps(words, ensure_ascii=False), owner, list_id)
+            )
+        return cursor.rowcount > 0
+    
+    def delete(self, owner, list_id):
+        """Delete a vocabulary list. Returns True if it existed."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM session_vocabulary_list WHERE owner = ? AND id = ?", (owner, list_id)
+            )
+        return cursor.rowcount > 0
+    
+    def list_page(self, owner, offset=0, limit=20, include_words=True):
+        """
+        Return one page of an owner's vocabulary lists, sorted by name
+        
+        Returns:
+            tuple: (list of vocabulary dicts, total number of lists)
+        """
+        columns = "*" if include_words else "id, name, language"
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM session_vocabulary_list WHERE owner = ?", (owner,)
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM session_vocabulary_list WHERE owner = ? "
+                "ORDER BY name COLLATE NOCASE, id LIMIT ? OFFSET ?",
+                (owner, limit, offset)
+            ).fetchall()
+        return [self._to_dict(row, include_words) for row in rows], total
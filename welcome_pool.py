@@ -0,0 +1,154 @@
+# -------------------------------------------------------------------------
+# welcome_pool.py - Pre-Generated Welcome Messages
+# -------------------------------------------------------------------------
+# Every new chat starts with a short greeting from the tutor. Generating it
+# on demand costs a full model round trip before the learner sees anything.
+# This module keeps a small pool of pre-generated greetings per language:
+# new chats take one instantly, and a background refiller tops the pool up
+# whenever it drops below a low-water mark. Greetings are handed out only
+# once, so the variety of freshly generated greetings is preserved.
+#
+# Configuration (environment variables):
+# - WELCOME_POOL: "0"/"false" to disable (default enabled)
+# - WELCOME_POOL_SIZE: greetings kept per language (default 8)
+# - WELCOME_POOL_LOW_WATER: refill when fewer remain (default 3)
+# -------------------------------------------------------------------------
+
+# Standard library imports
+import logging
+import os
+import queue
+import threading
+from collections import deque
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+WELCOME_POOL_ENABLED = os.environ.get("WELCOME_POOL", "1").lower() in ("1", "true", "yes")
+WELCOME_POOL_SIZE = int(os.environ.get("WELCOME_POOL_SIZE", "8"))
+WELCOME_POOL_LOW_WATER = int(os.environ.get("WELCOME_POOL_LOW_WATER", "3"))
+
+
+class WelcomePool:
+    """
+    Per-language pools of greetings with a background refiller.
+
+    Args:
+        generate (callable): generate(language) -> greeting; may raise
+        size (int): Greetings kept per language
+        low_water (int): A refill is scheduled when fewer greetings remain
+    """
+
+    def __init__(self, generate, size=WELCOME_POOL_SIZE, low_water=WELCOME_POOL_LOW_WATER):
+        self.generate = generate
+        self.size = size
+        self.low_water = low_water
+        self._pools = {}
+        self._lock = threading.Lock()
+        # Languages waiting for a refill (a language is queued at most once)
+        self._refills = queue.Queue()
+        self._scheduled = set()
+        self._worker = None
+        self._worker_pid = None
+        self.served = 0
+        self.empty = 0
+        self.generated = 0
+        self.failures = 0
+
+    def start(self, languages):
+        """Schedule the initial fill of the given languages."""
+        for language in languages:
+            self._schedule(language)
+
+    def take(self, language):
+        """
+        Take a greeting from the pool
+
+        Returns:
+            str: A greeting, or None if the language's pool is empty
+        """
+        with self._lock:
+            pool = self._pools.get(language)
+            greeting = pool.popleft() if pool else None
+            remaining = len(pool) if pool else 0
+            if greeting is None:
+                self.empty += 1
+            else:
+                self.served += 1
+        if remaining < self.low_water:
+            self._schedule(language)
+        return greeting
+
+    def _schedule(self, language):
+        with self._lock:
+            self._check_process()
+            if language in self._scheduled:
+                return
+            self._scheduled.add(language)
+        self._ensure_worker()
+        self._refills.put(language)
+
+    def _check_process(self):
+        """Drop refill state inherited from a parent process. Caller holds _lock."""
+        # Threads do not survive a fork, so the parent's scheduled refills
+        # would never run here and would block rescheduling those languages
+        if self._worker_pid is not None and self._worker_pid != os.getpid():
+            self._scheduled.clear()
+            self._refills = queue.Queue()
+            self._worker = None
+            self._worker_pid = None
+
+    def _ensure_worker(self):
+        # A forked worker process starts its own refill thread
+        with self._lock:
+            self._check_process()
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._refill_loop, name="welcome-refill", daemon=True)
+            self._worker.start()
+
+    def _refill_loop(self):
+        while True:
+            language = self._refills.get()
+            try:
+                self._refill(language)
+            finally:
+                with self._lock:
+                    self._scheduled.discard(language)
+
+    def _refill(self, language):
+        added = 0
+        # Bounded number of attempts, so a failing upstream is not hammered
+        for _ in range(self.size * 2):
+            with self._lock:
+                pool = self._pools.setdefault(language, deque())
+                if len(pool) >= self.size:
+                    break
+            try:
+                greeting = self.generate(language)
+            except Exception as e:
+                logger.warning(f"Failed to generate a {language} greeting: {str(e)}")
+                with self._lock:
+                    self.failures += 1
+                break
+            with self._lock:
+                self.generated += 1
+                # Skip exact repeats to keep the pool varied
+                if greeting and greeting not in pool:
+                    pool.append(greeting)
+                    added += 1
+        logger.debug(f"Refilled {language} welcome pool with {added} greetings")
+
+    def stats(self):
+        with self._lock:
+            taken = self.served + self.empty
+            return {
+                'enabled': WELCOME_POOL_ENABLED,
+                'served': self.served,
+                'empty': self.empty,
+                'hitRate': self.served / taken if taken else 0.0,
+                'generated': self.generated,
+                'failures': self.failures,
+                'available': {language: len(pool) for language, pool in self._pools.items()}
+            }